@@ -0,0 +1,93 @@
+"""
+Microbenchmark for the sheet key index used by upserts.
+
+Compares the previous lookup (linear scan of every row plus `header.index`
+per column) with the per-snapshot hash index, on synthetic sheets of growing
+size. No Google API access is needed.
+
+Usage:
+    pipenv run python bench_sheet_index.py
+"""
+
+import random
+import timeit
+
+from services.sheets_cache import SheetSnapshot
+
+HEADER = [
+    "id",
+    "topic",
+    "id_topic",
+    "category",
+    "type",
+    "content",
+    "title",
+    "subtitle",
+    "caption",
+    "hashtags",
+    "image_url",
+    "published",
+]
+LOOKUPS = 200
+
+
+def build_values(rows: int) -> list[list[str]]:
+    """Builds a header plus `rows` synthetic Generated rows."""
+    values = [list(HEADER)]
+    for i in range(1, rows + 1):
+        values.append([str(i)] + [f"{col}-{i}" for col in HEADER[1:]])
+    return values
+
+
+def linear_lookup(values: list, filter_key: str, filter_value: str, columns: list):
+    """The lookup upsert_row used to perform for every call."""
+    header = [h.strip() for h in values[0]]
+    filter_col_index = header.index(filter_key)
+    row_number = -1
+    for i, row in enumerate(values[1:], start=2):
+        if len(row) > filter_col_index and str(row[filter_col_index]) == str(
+            filter_value
+        ):
+            row_number = i
+            break
+    return row_number, [header.index(col) for col in columns]
+
+
+def indexed_lookup(
+    snapshot: SheetSnapshot, filter_key: str, filter_value: str, columns: list
+):
+    """The lookup upsert_rows performs against a cached snapshot."""
+    column_index = snapshot.column_index()
+    return snapshot.find_row(filter_key, filter_value), [
+        column_index[col] for col in columns
+    ]
+
+
+def main():
+    columns = ["title", "caption", "published"]
+    print(
+        f"{'rows':>8} {'linear (ms/op)':>16} {'indexed (us/op)':>16} {'build (ms)':>12}"
+    )
+    for rows in (1_000, 10_000, 100_000):
+        values = build_values(rows)
+        keys = [str(random.randint(1, rows)) for _ in range(LOOKUPS)]
+
+        linear = timeit.timeit(
+            lambda: [linear_lookup(values, "id", k, columns) for k in keys], number=1
+        )
+
+        snapshot = SheetSnapshot(values, None, 0.0)
+        build = timeit.timeit(lambda: snapshot.key_index("id"), number=1)
+        indexed = timeit.timeit(
+            lambda: [indexed_lookup(snapshot, "id", k, columns) for k in keys],
+            number=1,
+        )
+
+        print(
+            f"{rows:>8} {linear / LOOKUPS * 1e3:>16.3f} "
+            f"{indexed / LOOKUPS * 1e6:>16.3f} {build * 1e3:>12.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
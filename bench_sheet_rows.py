@@ -0,0 +1,50 @@
+"""
+Memory benchmark for the row representation returned by sheet reads.
+
+Compares one dict per row (`dict(zip(header, row))`) with compact `SheetRow`
+mappings sharing one header, on a synthetic 100k-row Generated sheet. Only the
+memory held by the converted rows is measured; the raw values they are built
+from are allocated beforehand. No Google API access is needed.
+
+Usage:
+    pipenv run python bench_sheet_rows.py
+"""
+
+import gc
+import timeit
+import tracemalloc
+
+from bench_sheet_index import build_values
+from services.sheets_rows import compact_rows
+
+ROWS = 100_000
+
+
+def dict_rows(values: list) -> list[dict]:
+    """The representation read_sheet returns by default."""
+    header = [h.strip() for h in values[0]]
+    return [dict(zip(header, row)) for row in values[1:]]
+
+
+def measure(build, values: list) -> tuple[float, float]:
+    """Returns the MiB retained by `build(values)` and the seconds it took."""
+    gc.collect()
+    tracemalloc.start()
+    rows = build(values)
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    seconds = timeit.timeit(lambda: build(values), number=1)
+    del rows
+    return retained / 2**20, seconds
+
+
+def main():
+    values = build_values(ROWS)
+    print(f"{'rows':>8} {'representation':>16} {'MiB':>8} {'build (ms)':>12}")
+    for name, build in (("dict", dict_rows), ("SheetRow", compact_rows)):
+        mib, seconds = measure(build, values)
+        print(f"{ROWS:>8} {name:>16} {mib:>8.1f} {seconds * 1e3:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
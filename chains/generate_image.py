@@ -2,12 +2,10 @@
 Generate Image Chain
 """
 
-from langchain_core.prompts import PromptTemplate
 from langchain_core.runnables import RunnableLambda
 
-from services.openai_client import OpenAIClient
+from services.llm_registry import get_openai_client, get_prompt_template
 from utils.config_loader import load_config
-from utils.file_utils import load_prompt_template
 from utils.logger import setup_logger
 
 logger = setup_logger(__name__)
@@ -35,10 +33,9 @@ def generate_image_logic(post_data: dict) -> dict:
     quality = post_data.get("quality", config.get("quality", "standard"))
     style = post_data.get("style", config.get("style", "vivid"))
 
-    prompt_template_str = load_prompt_template("prompts/image_prompt.txt")
-    prompt_template = PromptTemplate.from_template(prompt_template_str)
+    prompt_template = get_prompt_template("prompts/image_prompt.txt")
 
-    llm_client = OpenAIClient()
+    llm_client = get_openai_client()
 
     formatted_prompt = prompt_template.format(content=post_data.get("content", ""))
 
@@ -2,19 +2,45 @@
 Generate Content Chains
 
 This module creates specialized chains for generating different types of content
-(e.g., REEL, POST, CAROUSEL) based on dedicated prompts.
+(e.g., REEL, POST, CAROUSEL) based on dedicated prompts. Prompts, models and
+chains come from the LLM registry: they are built on first use and rebuilt when
+a prompt file changes.
+
+It also exports `generate_all_content_chain`, which generates the three formats
+with a single JSON-mode call when 'combined_mode' is enabled in the config. Each
+format of the combined answer is validated on its own, and only the formats that
+fail validation are regenerated with their dedicated chain.
+
+With 'streaming' enabled, `generate_all_content_streaming` streams the
+generations and reports every field as soon as its JSON value is complete, so
+later steps can start on partial output.
 """
 
-from langchain_core.output_parsers import JsonOutputParser
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from langchain_core.exceptions import OutputParserException
+from langchain_core.output_parsers import JsonOutputParser, StrOutputParser
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.runnables import Runnable
+from langchain_core.runnables import (
+    Runnable,
+    RunnableConfig,
+    RunnableLambda,
+    RunnableParallel,
+)
+from langchain_core.runnables.config import ContextThreadPoolExecutor
 from langchain_openai import ChatOpenAI
 
+from services.llm_cache import llm_cache_scope
+from services.llm_registry import get_cached, get_chat_model, get_chat_prompt
 from utils.config_loader import load_config
-from utils.file_utils import load_prompt_template
+from utils.json_stream import JsonFieldStream
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
 
 # ----------------------------------------------------------------------------
-# 1. Load Configuration and System Prompt
+# 1. Load Configuration
 # ----------------------------------------------------------------------------
 config = load_config("generate_post")
 SYSTEM_PROMPT_PATH = config.get("system_prompt_template")
@@ -25,42 +51,77 @@ if not SYSTEM_PROMPT_PATH or not USER_PROMPTS_PATHS:
         "Config file must contain 'system_prompt_template' and a 'user_prompts' dictionary."
     )
 
-try:
-    SYSTEM_PROMPT_TEMPLATE = load_prompt_template(SYSTEM_PROMPT_PATH)
-except FileNotFoundError as e:
-    raise RuntimeError(f"Could not find system prompt file: {e}") from e
-
 
 # ----------------------------------------------------------------------------
 # 2. Factory Function for Content Generation Chains
 # ----------------------------------------------------------------------------
+def _create_llm(**kwargs) -> ChatOpenAI:
+    return get_chat_model(config["model"], config.get("temperature", 0.7), **kwargs)
+
+
+def _create_prompt(user_prompt_path: str) -> ChatPromptTemplate:
+    try:
+        return get_chat_prompt(user_prompt_path, SYSTEM_PROMPT_PATH)
+    except FileNotFoundError as e:
+        raise RuntimeError(f"Could not find prompt file: {e}") from e
+
+
+def _usage_step(user_prompt_path: str) -> dict:
+    """Run config naming the step of a prompt for usage accounting."""
+    name = Path(user_prompt_path).stem.removesuffix("_prompt")
+    return {"metadata": {"usage_step": f"generate_post.{name}"}}
+
+
+def _lazy_chain(user_prompt_path: str, build: Callable[[], Runnable]) -> Runnable:
+    """
+    Wraps a chain that is built on its first run and cached in the registry.
+    Its cached LLM answers are keyed on the chain and the topic of the input.
+    """
+    step = _usage_step(user_prompt_path)
+
+    def get_chain() -> Runnable:
+        return get_cached(
+            ("generate_post", user_prompt_path),
+            build,
+            [user_prompt_path, SYSTEM_PROMPT_PATH],
+        )
+
+    def cache_scope(data: dict):
+        return llm_cache_scope(
+            chain=step["metadata"]["usage_step"],
+            id_topic=str(data.get("id_topic") or ""),
+            **_topic_fields(data),
+        )
+
+    def run(data: dict, config: RunnableConfig) -> Any:
+        with cache_scope(data):
+            return get_chain().invoke(data, config)
+
+    async def arun(data: dict, config: RunnableConfig) -> Any:
+        with cache_scope(data):
+            return await get_chain().ainvoke(data, config)
+
+    return RunnableLambda(run, afunc=arun).with_config(step)
+
+
 def create_content_chain(user_prompt_path: str) -> Runnable:
     """
     Factory function to create a content generation chain.
     Args:
         user_prompt_path: The path to the user-specific prompt template.
     Returns:
-        A runnable chain for content generation.
+        A runnable chain for content generation, built on its first run.
     """
-    try:
-        user_prompt_template = load_prompt_template(user_prompt_path)
-    except FileNotFoundError as e:
-        raise RuntimeError(f"Could not find user prompt file: {e}") from e
-
-    llm = ChatOpenAI(
-        model=config["model"],
-        temperature=config.get("temperature", 0.7),
-    )
-
-    prompt = ChatPromptTemplate.from_messages(
-        [
-            ("system", SYSTEM_PROMPT_TEMPLATE),
-            ("user", user_prompt_template),
-        ]
+    return _lazy_chain(
+        user_prompt_path,
+        lambda: (
+            RunnableLambda(_topic_fields)
+            | _create_prompt(user_prompt_path)
+            | _create_llm()
+            | JsonOutputParser()
+        ),
     )
 
-    return prompt | llm | JsonOutputParser()
-
 
 # ----------------------------------------------------------------------------
 # 3. Instantiate and Export Chains
@@ -69,3 +130,293 @@ def create_content_chain(user_prompt_path: str) -> Runnable:
 generate_reel_chain = create_content_chain(USER_PROMPTS_PATHS["reel"])
 generate_post_chain = create_content_chain(USER_PROMPTS_PATHS["post"])
 generate_carousel_chain = create_content_chain(USER_PROMPTS_PATHS["carousel"])
+
+
+# ----------------------------------------------------------------------------
+# 4. Combined Generation of All Content Types
+# ----------------------------------------------------------------------------
+CONTENT_TYPES = ("reel", "post", "carousel")
+CONTENT_FIELDS = ("content", "title", "subtitle", "caption", "hashtags")
+TOPIC_FIELDS = ("topic", "category", "level", "objective")
+
+JSON_RESPONSE_FORMAT = {"type": "json_object"}
+
+FORMAT_CHAINS = {
+    "reel": generate_reel_chain,
+    "post": generate_post_chain,
+    "carousel": generate_carousel_chain,
+}
+
+
+def _topic_fields(data: dict) -> dict:
+    return {field: data.get(field) or "" for field in TOPIC_FIELDS}
+
+
+def create_combined_chain(user_prompt_path: str) -> Runnable:
+    """
+    Creates a chain that returns the three content types in one JSON object,
+    keyed by content type. The topic fields of the input fill the prompt.
+    """
+
+    def build() -> Runnable:
+        # JSON mode guarantees a parseable object; its shape is checked per format.
+        llm = _create_llm(model_kwargs={"response_format": JSON_RESPONSE_FORMAT})
+        return (
+            RunnableLambda(_topic_fields)
+            | _create_prompt(user_prompt_path)
+            | llm
+            | JsonOutputParser()
+        )
+
+    return _lazy_chain(user_prompt_path, build)
+
+
+def _validate_content(content: Any) -> bool:
+    """Checks that a format of the combined answer has every field filled in."""
+    return isinstance(content, dict) and all(
+        isinstance(content.get(field), str) and content[field].strip()
+        for field in CONTENT_FIELDS
+    )
+
+
+def _split_combined(combined: Any) -> Tuple[Dict[str, dict], List[str]]:
+    """Returns the valid formats of a combined answer and the failed ones."""
+    if not isinstance(combined, dict):
+        combined = {}
+    valid = {
+        content_type: combined[content_type]
+        for content_type in CONTENT_TYPES
+        if _validate_content(combined.get(content_type))
+    }
+    failed = [
+        content_type for content_type in CONTENT_TYPES if content_type not in valid
+    ]
+    if failed:
+        logger.warning(
+            f"Combined generation returned invalid content for {failed}; "
+            "regenerating them one by one."
+        )
+    return valid, failed
+
+
+def _fallback_chain(failed: List[str]) -> Runnable:
+    return RunnableParallel(
+        {content_type: FORMAT_CHAINS[content_type] for content_type in failed}
+    )
+
+
+def _generate_all_content_logic(data: dict) -> dict:
+    """
+    Generates every content type for the topic in `data`.
+
+    Args:
+        data: The selected topic row ('topic', 'category', 'level', 'objective').
+
+    Returns:
+        The input dictionary plus 'reel', 'post' and 'carousel'.
+    """
+    if not COMBINED_MODE:
+        return {**data, **_fallback_chain(list(CONTENT_TYPES)).invoke(data)}
+
+    try:
+        combined = generate_combined_chain.invoke(data)
+    except OutputParserException as err:
+        logger.warning(f"Could not parse the combined generation: {err}")
+        combined = None
+    content, failed = _split_combined(combined)
+    if failed:
+        content.update(_fallback_chain(failed).invoke(data))
+    return {**data, **content}
+
+
+async def _agenerate_all_content_logic(data: dict) -> dict:
+    """Async variant of `_generate_all_content_logic`."""
+    if not COMBINED_MODE:
+        return {**data, **await _fallback_chain(list(CONTENT_TYPES)).ainvoke(data)}
+
+    try:
+        combined = await generate_combined_chain.ainvoke(data)
+    except OutputParserException as err:
+        logger.warning(f"Could not parse the combined generation: {err}")
+        combined = None
+    content, failed = _split_combined(combined)
+    if failed:
+        content.update(await _fallback_chain(failed).ainvoke(data))
+    return {**data, **content}
+
+
+COMBINED_MODE = bool(config.get("combined_mode"))
+generate_combined_chain = (
+    create_combined_chain(USER_PROMPTS_PATHS["combined"]) if COMBINED_MODE else None
+)
+
+generate_all_content_chain = RunnableLambda(
+    _generate_all_content_logic, afunc=_agenerate_all_content_logic
+)
+
+
+# ----------------------------------------------------------------------------
+# 5. Batch Generation
+# ----------------------------------------------------------------------------
+_MESSAGE_ROLES = {"system": "system", "human": "user", "ai": "assistant"}
+
+
+def _user_prompt(name: str) -> ChatPromptTemplate:
+    return _create_prompt(USER_PROMPTS_PATHS[name])
+
+
+def render_batch_requests(data: dict) -> Dict[str, dict]:
+    """
+    Renders the chat completion request bodies that generate the content of a
+    topic, for submission to a batch endpoint instead of interactive calls.
+
+    Args:
+        data: The selected topic row ('topic', 'category', 'level', 'objective').
+
+    Returns:
+        The bodies keyed by content type, or a single 'combined' body when
+        'combined_mode' is enabled.
+    """
+    names = ["combined"] if COMBINED_MODE else list(CONTENT_TYPES)
+    bodies = {}
+    for name in names:
+        messages = _user_prompt(name).format_messages(**_topic_fields(data))
+        body = {
+            "model": config["model"],
+            "temperature": config.get("temperature", 0.7),
+            "messages": [
+                {"role": _MESSAGE_ROLES[message.type], "content": message.content}
+                for message in messages
+            ],
+        }
+        if name == "combined":
+            body["response_format"] = JSON_RESPONSE_FORMAT
+        bodies[name] = body
+    return bodies
+
+
+def parse_batch_content(
+    responses: Dict[str, Optional[str]],
+) -> Tuple[Dict[str, dict], List[str]]:
+    """
+    Parses the batch answers of one topic, keyed like `render_batch_requests`
+    (None for a request that failed in the batch).
+
+    Returns:
+        The valid content by content type and the content types that still
+        need to be generated.
+    """
+    parser = JsonOutputParser()
+
+    def parse(text: Optional[str]) -> Any:
+        if not text:
+            return None
+        try:
+            return parser.parse(text)
+        except OutputParserException as err:
+            logger.warning(f"Could not parse a batch generation: {err}")
+            return None
+
+    if "combined" in responses:
+        return _split_combined(parse(responses["combined"]))
+
+    content = {}
+    for content_type in CONTENT_TYPES:
+        parsed = parse(responses.get(content_type))
+        if _validate_content(parsed):
+            content[content_type] = parsed
+    failed = [
+        content_type for content_type in CONTENT_TYPES if content_type not in content
+    ]
+    if failed:
+        logger.warning(f"Batch generation failed for {failed}; regenerating them.")
+    return content, failed
+
+
+def complete_content(data: dict, content: Dict[str, dict], failed: List[str]) -> dict:
+    """Generates the `failed` content types interactively and merges them in."""
+    if failed:
+        content = {**content, **_fallback_chain(failed).invoke(data)}
+    return {**data, **content}
+
+
+# ----------------------------------------------------------------------------
+# 6. Streaming Generation
+# ----------------------------------------------------------------------------
+STREAMING = bool(config.get("streaming"))
+
+# Called with (content type, field, value) as soon as a field is complete.
+FieldCallback = Callable[[str, str, Any], None]
+
+
+def _stream_json(chain: Runnable, data: dict, on_member: Callable) -> Any:
+    """Streams `chain` and parses its text output incrementally."""
+    stream = JsonFieldStream()
+    for chunk in chain.stream(data):
+        for path, value in stream.feed(chunk):
+            on_member(path, value)
+    if not stream.done:
+        raise OutputParserException("Streamed generation ended before its JSON.")
+    return stream.value
+
+
+def _stream_formats(data: dict, content_types: List[str], on_field: FieldCallback):
+    """Streams the dedicated chains of `content_types` in parallel."""
+
+    def stream_format(content_type: str) -> dict:
+        chain = (
+            RunnableLambda(_topic_fields)
+            | _user_prompt(content_type)
+            | _create_llm()
+            | StrOutputParser()
+        ).with_config(_usage_step(USER_PROMPTS_PATHS[content_type]))
+
+        def on_member(path, value):
+            if len(path) == 1:
+                on_field(content_type, path[0], value)
+
+        return _stream_json(chain, data, on_member)
+
+    # Context-aware threads keep the callbacks of the run, e.g. usage accounting.
+    with ContextThreadPoolExecutor(max_workers=len(content_types)) as executor:
+        futures = {ct: executor.submit(stream_format, ct) for ct in content_types}
+        return {ct: future.result() for ct, future in futures.items()}
+
+
+def generate_all_content_streaming(data: dict, on_field: FieldCallback) -> dict:
+    """
+    Streaming variant of `generate_all_content_chain`: `on_field` is called
+    with each field of each content type as soon as its value is complete.
+
+    Streamed calls do not go through the LLM cache.
+
+    Args:
+        data: The selected topic row ('topic', 'category', 'level', 'objective').
+        on_field: Callback receiving (content type, field, value).
+
+    Returns:
+        The input dictionary plus 'reel', 'post' and 'carousel'.
+    """
+    if not COMBINED_MODE:
+        return {**data, **_stream_formats(data, list(CONTENT_TYPES), on_field)}
+
+    chain = (
+        RunnableLambda(_topic_fields)
+        | _user_prompt("combined")
+        | _create_llm(model_kwargs={"response_format": JSON_RESPONSE_FORMAT})
+        | StrOutputParser()
+    ).with_config(_usage_step(USER_PROMPTS_PATHS["combined"]))
+
+    def on_member(path, value):
+        if len(path) == 2 and path[0] in CONTENT_TYPES:
+            on_field(path[0], path[1], value)
+
+    try:
+        combined = _stream_json(chain, data, on_member)
+    except (OutputParserException, ValueError) as err:
+        logger.warning(f"Could not parse the combined generation: {err}")
+        combined = None
+    content, failed = _split_combined(combined)
+    if failed:
+        content.update(_stream_formats(data, failed, on_field))
+    return {**data, **content}
@@ -8,60 +8,183 @@ This chain is responsible for:
 4. Selecting one post randomly to be published.
 """
 
-import random
+from itertools import islice
 from typing import Dict, List, Any
 
-from langchain.schema.runnable import RunnableLambda
+import httpx
+from googleapiclient.errors import HttpError
+from langchain_core.runnables import RunnableLambda
 
-from services.sheets_client import GoogleSheetsClient
+from services.async_sheets_client import get_async_sheets_client
+from services.sheets_client import get_sheets_client
 from utils.logger import setup_logger
+from utils.sampling import areservoir_sample, reservoir_sample
 
 logger = setup_logger(__name__)
 
+# The only columns needed to decide whether a post is ready to be published.
+FILTER_COLUMNS = ["id", "type", "edited", "published", "image_url", "image_ready_url"]
+
+# Posts drawn from the mirror and re-checked against the sheet before giving up.
+MAX_MIRROR_CANDIDATES = 5
+
+
+def _is_ready_to_publish(post: Dict[str, Any]) -> bool:
+    """Applies the n8n workflow criteria for posts ready to be published."""
+    return (
+        post.get("type") == "POST"
+        and post.get("edited") == "x"
+        and not post.get("published")
+        and bool(post.get("image_url"))
+        and not post.get("image_ready_url")
+    )
+
 
 def get_content_to_publish(input_data: Dict[str, Any]) -> Dict[str, Any]:
     """
     Fetches content from Google Sheets, filters for posts ready to be published,
     and selects one at random.
 
+    Selection runs in two phases: only the columns used by the filter are
+    streamed from the 'Generated' sheet and sampled in a single pass, then the
+    full row is fetched for the chosen candidate alone. When the local sheets
+    mirror is enabled, the post is drawn from it with an indexed query instead,
+    and its row is re-read to check it was not published since the last sync.
+
     Args:
-        input_data: A dictionary containing the input. Currently unused,
-                    as the client handles its own config.
+        input_data: A dictionary containing the input. An optional
+                    'max_candidates' stops reading the sheet once that many
+                    ready posts have been found; the draw is then limited to
+                    the first ready posts in sheet order.
 
     Returns:
-        A dictionary representing the selected post's data.
+        A dictionary representing the selected post's data, or an empty
+        dictionary if no post is ready or the sheet could not be read.
     """
     logger.info("Starting content selection process...")
-    client = GoogleSheetsClient()
+    client = get_sheets_client()
+
+    if client.mirror and client.mirror.count("Generated"):
+        for candidate in _mirror_candidates(client.mirror):
+            selected_post = client.read_row(candidate["_row"], range_name="Generated")
+            selected_post = _checked_post(candidate, selected_post)
+            if selected_post:
+                return selected_post
+        return {}
 
     # From n8n workflow, the sheet is 'Generated'
-    all_posts = client.read_sheet(range_name="Generated")
+    all_posts = client.read_columns_iter(
+        FILTER_COLUMNS, range_name="Generated", compact=True
+    )
 
-    if not all_posts:
-        logger.warning("No posts found in the 'Generated' sheet.")
+    # Filter posts based on n8n workflow criteria
+    ready_to_publish = (post for post in all_posts if _is_ready_to_publish(post))
+    max_candidates = input_data.get("max_candidates")
+    if max_candidates:
+        ready_to_publish = islice(ready_to_publish, max_candidates)
+
+    # Select one random post
+    try:
+        sample, candidates = reservoir_sample(ready_to_publish)
+    except HttpError as err:
+        logger.error(f"Could not read the 'Generated' sheet: {err}")
+        return {}
+    candidate = _sampled_candidate(sample, candidates)
+    if candidate is None:
         return {}
 
-    # Filter posts based on n8n workflow criteria
-    ready_to_publish = [
-        post
-        for post in all_posts
-        if post.get("type") == "POST"
-        and post.get("edited") == "x"
-        and not post.get("published")
-        and post.get("image_url")
-        and not post.get("image_ready_url")
-    ]
+    # Fetch the full row of the selected post only
+    selected_post = client.read_row(candidate["_row"], range_name="Generated")
+    return _checked_post(candidate, selected_post)
 
-    if not ready_to_publish:
-        logger.info("No posts are ready to be published at this time.")
+
+async def aget_content_to_publish(input_data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Async version of `get_content_to_publish`, used by `ainvoke`. The sheet is
+    read through the asyncio Sheets client without blocking the event loop.
+    """
+    logger.info("Starting content selection process...")
+    client = get_async_sheets_client()
+
+    if client.mirror and client.mirror.count("Generated"):
+        for candidate in _mirror_candidates(client.mirror):
+            selected_post = await client.read_row(
+                candidate["_row"], range_name="Generated"
+            )
+            selected_post = _checked_post(candidate, selected_post)
+            if selected_post:
+                return selected_post
         return {}
 
-    logger.info(f"Found {len(ready_to_publish)} posts ready to be published.")
+    max_candidates = input_data.get("max_candidates")
+
+    async def ready_to_publish():
+        found = 0
+        async for post in client.read_columns_iter(
+            FILTER_COLUMNS, range_name="Generated", compact=True
+        ):
+            if _is_ready_to_publish(post):
+                yield post
+                found += 1
+                if max_candidates and found >= max_candidates:
+                    return
+
+    try:
+        sample, candidates = await areservoir_sample(ready_to_publish())
+    except (httpx.HTTPError, RuntimeError) as err:
+        logger.error(f"Could not read the 'Generated' sheet: {err}")
+        return {}
+    candidate = _sampled_candidate(sample, candidates)
+    if candidate is None:
+        return {}
+
+    selected_post = await client.read_row(candidate["_row"], range_name="Generated")
+    return _checked_post(candidate, selected_post)
+
+
+def _mirror_candidates(mirror) -> List[Dict[str, Any]]:
+    """
+    Draws posts ready to be published with an indexed mirror query, in random
+    order. The mirror lags behind the sheet, so callers re-check each one
+    against its sheet row.
+    """
+    posts = mirror.select(
+        "Generated",
+        equals={"type": "POST", "edited": "x"},
+        empty=["published", "image_ready_url"],
+        present=["image_url"],
+        random_order=True,
+        limit=MAX_MIRROR_CANDIDATES,
+    )
+    if not posts:
+        logger.info("No posts are ready to be published at this time.")
+    return posts
+
+
+def _sampled_candidate(sample: List[Any], candidates: int) -> Any:
+    if not sample:
+        logger.info("No posts are ready to be published at this time.")
+        return None
+    logger.info(f"Found {candidates} posts ready to be published.")
+    return sample[0]
+
+
+def _checked_post(candidate: Any, selected_post: Dict[str, Any] | None) -> Dict:
+    """Returns the full row of the candidate if it is still ready to publish."""
+    if (
+        not selected_post
+        or selected_post.get("id") != candidate.get("id")
+        or not _is_ready_to_publish(selected_post)
+    ):
+        logger.warning(
+            f"Post in row {candidate['_row']} changed since it was selected. Skipping."
+        )
+        return {}
 
-    # Select one random post
-    selected_post = random.choice(ready_to_publish)
     logger.info(f"Selected post with ID: {selected_post.get('id')}")
     return selected_post
 
 
-get_content_chain = RunnableLambda(get_content_to_publish)
+get_content_chain = RunnableLambda(
+    get_content_to_publish, afunc=aget_content_to_publish
+)
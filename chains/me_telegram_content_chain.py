@@ -4,18 +4,69 @@ MindEssence Telegram Content Generation Chain
 This chain generates content using RAG (Retrieval-Augmented Generation) based on a selected topic.
 """
 
-from typing import Any, Dict
+import json
+from typing import Any, Callable, Dict, Optional, Tuple
 
-from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.output_parsers import StrOutputParser
 from langchain_core.runnables import RunnableLambda
-from langchain_openai import ChatOpenAI
 
+from services.llm_cache import llm_cache_scope
+from services.llm_registry import get_chat_model, get_chat_prompt
 from utils.config_loader import load_config
+from utils.json_stream import JsonFieldStream
 from utils.logger import setup_logger
 
 logger = setup_logger(__name__)
 
 
+def _parse_content(response_content: str) -> Tuple[str, str]:
+    """Extracts 'text' and 'quote' from the JSON answer of the model."""
+    try:
+        content = response_content.strip()
+        # Extract JSON from the response
+        if "```json" in content:
+            json_start = content.find("```json") + 7
+            json_end = content.find("```", json_start)
+            json_str = content[json_start:json_end].strip()
+        else:
+            json_str = content
+
+        parsed_response = json.loads(json_str)
+        return parsed_response.get("text", ""), parsed_response.get("quote", "")
+
+    except json.JSONDecodeError as e:
+        logger.warning(f"Failed to parse JSON response: {e}")
+        # Fallback to raw content
+        return response_content, ""
+
+
+def _stream_content(
+    chain, selected_topic: str, on_field: Optional[Callable[[str, Any], None]]
+) -> Tuple[str, str]:
+    """
+    Streams the answer of the model, calling `on_field` with each top-level
+    JSON field ('text', 'quote') as soon as its value is complete.
+    """
+    stream = JsonFieldStream()
+    response_content = ""
+    fields: Dict[str, Any] = {}
+    try:
+        for chunk in (chain | StrOutputParser()).stream({"question": selected_topic}):
+            response_content += chunk
+            for path, value in stream.feed(chunk):
+                if len(path) == 1:
+                    fields[path[0]] = value
+                    if on_field:
+                        on_field(path[0], value)
+    except json.JSONDecodeError as e:
+        # Fields completed before the malformed part are still usable
+        logger.warning(f"Failed to parse streamed JSON response: {e}")
+
+    if "text" in fields:
+        return fields["text"], fields.get("quote", "")
+    return _parse_content(response_content)
+
+
 def generate_me_telegram_content_logic(data: Dict[str, Any]) -> Dict[str, Any]:
     """
     Generate content using RAG based on the selected topic.
@@ -23,6 +74,9 @@ def generate_me_telegram_content_logic(data: Dict[str, Any]) -> Dict[str, Any]:
     Args:
         data: Dictionary containing:
             - selected_topic: The topic to generate content about
+            - on_field: Optional callback receiving each JSON field (name,
+              value) as soon as it is generated, when 'content_streaming' is
+              enabled in configs/me_telegram.yaml
 
     Returns:
         Dictionary containing the generated content
@@ -39,45 +93,27 @@ def generate_me_telegram_content_logic(data: Dict[str, Any]) -> Dict[str, Any]:
         config = load_config("me_telegram")
 
         # Generate content using LLM
-        llm = ChatOpenAI(
-            model=config.get("content_model", "gpt-4o-mini"),
-            temperature=config.get("content_temperature", 0.4),
+        llm = get_chat_model(
+            config.get("content_model", "gpt-4o-mini"),
+            config.get("content_temperature", 0.4),
         )
 
-        # Load prompt template from file
-        from utils.file_utils import load_prompt_template
-
-        prompt_template_str = load_prompt_template(
-            "prompts/me_telegram_content_prompt.txt"
-        )
-        prompt_template = ChatPromptTemplate.from_template(prompt_template_str)
+        # Compiled once and reloaded when the prompt file changes
+        prompt_template = get_chat_prompt("prompts/me_telegram_content_prompt.txt")
 
         # Generate content
-        chain = prompt_template | llm
-        result = chain.invoke({"question": selected_topic})
-
-        # Parse JSON response
-        import json
-
-        try:
-            response_content = str(result.content).strip()
-            # Extract JSON from the response
-            if "```json" in response_content:
-                json_start = response_content.find("```json") + 7
-                json_end = response_content.find("```", json_start)
-                json_str = response_content[json_start:json_end].strip()
-            else:
-                json_str = response_content
-
-            parsed_response = json.loads(json_str)
-            generated_content = parsed_response.get("text", "")
-            quote = parsed_response.get("quote", "")
-
-        except json.JSONDecodeError as e:
-            logger.warning(f"Failed to parse JSON response: {e}")
-            # Fallback to raw content
-            generated_content = str(result.content)
-            quote = ""
+        chain = (prompt_template | llm).with_config(
+            metadata={"usage_step": "me_telegram.content"}
+        )
+        if config.get("content_streaming"):
+            generated_content, quote = _stream_content(
+                chain, selected_topic, data.get("on_field")
+            )
+        else:
+            # A rerun for the same topic replays the cached answer.
+            with llm_cache_scope(chain="me_telegram.content", topic=selected_topic):
+                result = chain.invoke({"question": selected_topic})
+            generated_content, quote = _parse_content(str(result.content))
 
         logger.info("✅ Content generated successfully")
 
@@ -2,17 +2,135 @@
 Chain to save generated content to Google Sheets.
 """
 
+import asyncio
 import uuid
 from datetime import datetime
 
 from langchain_core.runnables import Runnable, RunnableLambda
 
-from tools.google_sheets_tool import read_from_sheet_chain, upsert_sheet_chain
+from services.async_sheets_client import get_async_sheets_client
+from services.reservations import get_reservation_store
+from services.sheets_client import get_sheets_client
+from services.sheets_journal import get_write_journal
+from services.unposted_index import get_unposted_index
+from tools.google_sheets_tool import (
+    allocate_ids_chain,
+    upsert_rows_sheet_chain,
+    upsert_sheet_chain,
+)
 from utils.logger import setup_logger
 
 logger = setup_logger(__name__)
 
 
+CONTENT_TYPES = ["reel", "post", "carousel"]
+
+
+def _release_topics(topic_ids: list) -> None:
+    """The topics are marked as created and no longer candidates for selection."""
+    client = get_sheets_client()
+    index = get_unposted_index(client, "Topics")
+    for topic_id in topic_ids:
+        index.discard(topic_id)
+    get_reservation_store(client.config).release(topic_ids)
+
+
+def _release_flushed_topics(rows: list) -> None:
+    """Flush listener releasing the topics whose 'created' date was written."""
+    _release_topics([row["id_topic"] for row in rows if row.get("created")])
+
+
+def _enqueue_topic_update(journal, topic_update: dict) -> str:
+    """
+    Journals the 'Topics' update. The topic is only released by the flush
+    that writes it; until then its reservation keeps other runs off it.
+    """
+    journal.add_flush_listener("Topics", _release_flushed_topics)
+    journal.enqueue("Topics", "id_topic", [topic_update])
+    return "queued"
+
+
+def _topic_update_payload(data: dict, topic_update: dict) -> dict:
+    return {
+        "range_name": "Topics",
+        "filter_key": "id_topic",
+        "filter_value": data["id_topic"],
+        "row_data": {"created": topic_update["created"]},
+    }
+
+
+def _save_status(*statuses: str) -> str:
+    """'failed' if a write failed, 'queued' if one is journaled, else 'success'."""
+    for status in ("failed", "queued"):
+        if status in statuses:
+            return status
+    return "success"
+
+
+def _topic_update_failed(data: dict) -> dict:
+    # Without the 'created' mark the topic can be drawn again, so its content
+    # is not saved either; a retry of the run saves both.
+    logger.error(
+        f"   - Could not mark topic '{data['topic']}' as created; "
+        "its content is not saved."
+    )
+    data["save_status"] = "failed"
+    return data
+
+
+def _generated_journal(journal):
+    """
+    The journal to write 'Generated' rows through, or None to write them
+    directly. Without a claim sheet, new ids are seeded from the rows in the
+    sheet, so rows still pending in the journal would be given their ids again.
+    """
+    if journal and get_sheets_client().has_id_counter("Generated"):
+        return journal
+    return None
+
+
+def _topic_update(data: dict) -> dict:
+    """The 'Topics' row update marking the topic of `data` as created."""
+    created = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    return {"id_topic": data["id_topic"], "created": created}
+
+
+def _content_types(data: dict) -> list:
+    return [t for t in CONTENT_TYPES if t in data["content_data"]]
+
+
+def _allocated_ids(allocation: dict) -> list:
+    ids = allocation["ids"]
+    if not ids:
+        raise RuntimeError("Could not allocate ids in the 'Generated' sheet.")
+    return ids
+
+
+def _generated_rows(data: dict, content_types: list, ids: list) -> list:
+    """Builds one 'Generated' row per content type, with its allocated id."""
+    content_data = data["content_data"]
+    rows = []
+    for content_type, row_id in zip(content_types, ids):
+        content_item = content_data[content_type]
+        logger.info(f"     - Adding {content_type} content with id {row_id}")
+        rows.append(
+            {
+                "id": str(row_id),
+                "topic": data["topic"],
+                "id_topic": data["id_topic"],
+                "category": data["category"],
+                "type": content_type,
+                "content": content_item.get("content"),
+                "title": content_item.get("title"),
+                "subtitle": content_item.get("subtitle"),
+                "caption": content_item.get("caption"),
+                "hashtags": content_item.get("hashtags"),
+                "image_url": data.get("image_url") if content_type == "post" else "",
+            }
+        )
+    return rows
+
+
 def _save_content_logic(data: dict) -> dict:
     """
     Orchestrates saving content to Google Sheets.
@@ -20,92 +138,122 @@ def _save_content_logic(data: dict) -> dict:
     This function performs two main actions:
     1.  Updates the 'Topics' sheet to mark the used topic with a 'created' timestamp.
     2.  Appends the generated content for each format (post, reel, carousel)
-        to the 'Generated' sheet with an auto-incrementing ID.
+        to the 'Generated' sheet with ids reserved from the id allocator.
 
     Args:
         data: A dictionary containing topic information at the root level,
               and generated content under the 'content_data' key.
 
     Returns:
-        The original data dictionary, augmented with the status of the save operations.
+        The original data dictionary with 'save_status': 'success' once both
+        sheets are written, 'queued' when a write is journaled and flushed
+        later, or 'failed'. The topic is released from the unposted index and
+        its reservation once its 'created' mark is in the sheet.
     """
     logger.info("--- 💾 Saving content to Google Sheets ---")
 
-    # The topic data is at the root of the input dictionary.
-    topic_id = data["id_topic"]
-    topic_name = data["topic"]
-    category = data["category"]
-
-    # The generated content is in a nested dictionary.
-    content_data = data["content_data"]
+    # With write-behind enabled the rows are journaled and flushed later.
+    journal = get_write_journal()
+    if not journal:
+        # Load both sheets in one request; the upserts below reuse these snapshots.
+        get_sheets_client().read_ranges(["Topics", "Generated"])
 
     # 1. Update the 'Topics' sheet
-    logger.info(f"   - Updating topic '{topic_name}' in Topics sheet.")
-    update_topic_payload = {
-        "range_name": "Topics",
-        "filter_key": "id_topic",
-        "filter_value": topic_id,
-        "row_data": {"created": datetime.now().strftime("%Y-%m-%d %H:%M:%S")},
-    }
-    upsert_sheet_chain.invoke(update_topic_payload)
+    logger.info(f"   - Updating topic '{data['topic']}' in Topics sheet.")
+    topic_update = _topic_update(data)
+    if journal:
+        topic_status = _enqueue_topic_update(journal, topic_update)
+    else:
+        topic_status = upsert_sheet_chain.invoke(
+            _topic_update_payload(data, topic_update)
+        )["upsert_status"]
+        if topic_status == "failed":
+            return _topic_update_failed(data)
+        _release_topics([data["id_topic"]])
 
-    # 2. Add content to the 'Generated' sheet with an auto-incrementing ID
+    # 2. Add content to the 'Generated' sheet with newly allocated IDs
     logger.info("   - Adding generated content to Generated sheet.")
+    content_types = _content_types(data)
 
-    # Get the last ID from the 'Generated' sheet to auto-increment
-    read_payload = {"range_name": "Generated"}
-    read_result = read_from_sheet_chain.invoke(read_payload)
-    sheet_data = read_result.get("sheet_data", [])
-
-    last_id = 0
-    if sheet_data:
-        try:
-            # Filter for valid, numeric IDs before finding the max
-            numeric_ids = [
-                int(row["id"])
-                for row in sheet_data
-                if row.get("id") and row["id"].isdigit()
-            ]
-            if numeric_ids:
-                last_id = max(numeric_ids)
-        except (ValueError, KeyError):
-            logger.warning(
-                "Could not determine last ID from sheet. A new one will be created."
+    # Reserve one id per format from the 'Generated' id allocator
+    ids = []
+    if content_types:
+        ids = _allocated_ids(
+            allocate_ids_chain.invoke(
+                {"range_name": "Generated", "count": len(content_types)}
             )
-            last_id = 0
+        )
+    rows = _generated_rows(data, content_types, ids)
 
-    next_id = last_id + 1
+    # All formats are written with one sheet read and a single append.
+    rows_status = "success"
+    generated_journal = _generated_journal(journal)
+    if rows and generated_journal:
+        generated_journal.enqueue("Generated", "id", rows)
+        rows_status = "queued"
+    elif rows:
+        add_content_payload = {
+            "range_name": "Generated",
+            "filter_key": "id",
+            "rows": rows,
+        }
+        result = upsert_rows_sheet_chain.invoke(add_content_payload)
+        rows_status = result["upsert_status"]
 
-    content_types = ["reel", "post", "carousel"]
-    for content_type in content_types:
-        if content_type in content_data:
-            content_item = content_data[content_type]
-            row_id = next_id
-            logger.info(f"     - Adding {content_type} content with id {row_id}")
-            row_data = {
-                "id": str(row_id),
-                "topic": topic_name,
-                "id_topic": topic_id,
-                "category": category,
-                "type": content_type,
-                "content": content_item.get("content"),
-                "title": content_item.get("title"),
-                "subtitle": content_item.get("subtitle"),
-                "caption": content_item.get("caption"),
-                "hashtags": content_item.get("hashtags"),
-                "image_url": data.get("image_url") if content_type == "post" else "",
-            }
-            add_content_payload = {
-                "range_name": "Generated",
-                "filter_key": "id",
-                "filter_value": str(row_id),
-                "row_data": row_data,
-            }
-            upsert_sheet_chain.invoke(add_content_payload)
-            next_id += 1
+    data["save_status"] = _save_status(topic_status, rows_status)
+    return data
+
+
+async def _asave_content_logic(data: dict) -> dict:
+    """
+    Async version of `_save_content_logic`, used by `ainvoke`/`abatch`. Sheet
+    reads and writes go through the asyncio Sheets client.
+    """
+    logger.info("--- 💾 Saving content to Google Sheets ---")
+
+    journal = get_write_journal()
+    if not journal:
+        await get_async_sheets_client().read_ranges(["Topics", "Generated"])
+
+    logger.info(f"   - Updating topic '{data['topic']}' in Topics sheet.")
+    topic_update = _topic_update(data)
+    if journal:
+        topic_status = _enqueue_topic_update(journal, topic_update)
+    else:
+        result = await upsert_sheet_chain.ainvoke(
+            _topic_update_payload(data, topic_update)
+        )
+        topic_status = result["upsert_status"]
+        if topic_status == "failed":
+            return _topic_update_failed(data)
+        await asyncio.to_thread(_release_topics, [data["id_topic"]])
+
+    logger.info("   - Adding generated content to Generated sheet.")
+    content_types = _content_types(data)
+    ids = []
+    if content_types:
+        ids = _allocated_ids(
+            await allocate_ids_chain.ainvoke(
+                {"range_name": "Generated", "count": len(content_types)}
+            )
+        )
+    rows = _generated_rows(data, content_types, ids)
+
+    rows_status = "success"
+    generated_journal = await asyncio.to_thread(_generated_journal, journal)
+    if rows and generated_journal:
+        generated_journal.enqueue("Generated", "id", rows)
+        rows_status = "queued"
+    elif rows:
+        result = await upsert_rows_sheet_chain.ainvoke(
+            {"range_name": "Generated", "filter_key": "id", "rows": rows}
+        )
+        rows_status = result["upsert_status"]
 
-    data["save_status"] = "success"
+    data["save_status"] = _save_status(topic_status, rows_status)
     return data
 
 
-save_content_chain: Runnable = RunnableLambda(_save_content_logic)
+save_content_chain: Runnable = RunnableLambda(
+    _save_content_logic, afunc=_asave_content_logic
+)
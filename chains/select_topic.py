@@ -3,42 +3,142 @@ Chain to process data read from a Google Sheet.
 It filters for unposted topics, selects one randomly, and prepares it for the next step.
 """
 
-import random
+from itertools import islice
 
+from googleapiclient.errors import HttpError
 from langchain_core.runnables import RunnableLambda
 
+from services.reservations import get_reservation_store
+from services.sheets_client import get_sheets_client
+from services.unposted_index import get_unposted_index
 from utils.logger import setup_logger
+from utils.sampling import reservoir_sample, weighted_group_sample
 
 logger = setup_logger(__name__)
 
+# Index entries tried before falling back to a scan of the sheet.
+MAX_INDEX_ATTEMPTS = 5
+
+
+def _sample_from_index(client, range_name: str, reserved: set) -> dict | None:
+    """
+    Draws an unposted topic from the unposted-topic index and re-checks it
+    against its sheet row. Stale entries are dropped from the index; topics in
+    `reserved` are skipped but kept, as they are still unposted.
+    """
+    store = get_unposted_index(client, range_name)
+    try:
+        index = store.get()
+    except HttpError as err:
+        logger.warning(f"Could not build the unposted-topic index: {err}")
+        return None
+    for _ in range(MAX_INDEX_ATTEMPTS):
+        picked = index.sample()
+        if picked is None:
+            return None
+        id_topic, row_number = picked
+        if id_topic in reserved:
+            logger.info(f"Topic {id_topic} is reserved by a batch run. Skipping.")
+            continue
+        row = client.read_row(row_number, range_name=range_name)
+        if (
+            row
+            and str(row.get("id_topic", "")).strip() == id_topic
+            and not row.get("created", "").strip()
+        ):
+            logger.info(f"Drew topic {id_topic} among {len(index)} unposted topics.")
+            return row
+        logger.info(f"Topic {id_topic} in row {row_number} is stale. Skipping.")
+        store.discard(id_topic)
+    return None
+
 
 def _select_topic_logic(data: dict) -> dict:
     """
     Filters the sheet data for rows where 'created' is empty and selects one at random.
 
+    The rows are consumed in a single pass with reservoir sampling, so 'sheet_data'
+    may be a list or a lazy iterator, of dicts or compact `SheetRow` mappings.
+    When it is not provided, an unposted topic is drawn from the local sheets
+    mirror if it is enabled, otherwise from the unposted-topic index, which costs
+    one row read regardless of the size of the sheet. The Topics sheet is only
+    streamed in windows when the index has no usable entry. Topics reserved by
+    a running batch (see `_select_topics_logic`) are never selected.
+
     Args:
-        data: The input dictionary, expected to contain 'sheet_data'.
+        data: The input dictionary, optionally containing 'sheet_data', a
+              'range_name' to stream from, and 'max_candidates' to stop reading
+              once that many unposted topics have been found. The draw is then
+              uniform over the first 'max_candidates' unposted topics in sheet
+              order only, so topics further down the sheet are never drawn;
+              leave it unset for a uniform draw over all of them.
 
     Returns:
         A dictionary representing the randomly selected row.
 
     Raises:
-        ValueError: If no data is read or no unposted topics are found.
+        ValueError: If the sheet cannot be read or no unposted topics are found.
     """
-    sheet_data = data.get("sheet_data", [])
-    if not sheet_data:
+    sheet_data = data.get("sheet_data")
+    reserved: set = set()
+    if sheet_data is None:
+        client = get_sheets_client()
+        range_name = data.get("range_name") or client.config["range_name"]
+        reserved = get_reservation_store(client.config).reserved_keys()
+        if client.mirror and client.mirror.count(range_name):
+            # One more row than there are reservations holds an unreserved
+            # topic whenever there is one.
+            rows = client.mirror.select(
+                range_name,
+                empty=["created"],
+                random_order=True,
+                limit=len(reserved) + 1,
+            )
+            sheet_data = [{k: v for k, v in row.items() if k != "_row"} for row in rows]
+        else:
+            row = _sample_from_index(client, range_name, reserved)
+            # Compact rows keep the memory of the scan to a tuple per row.
+            sheet_data = (
+                [row] if row else client.read_sheet_iter(range_name, compact=True)
+            )
+
+    rows_seen = 0
+
+    def count_rows(rows):
+        nonlocal rows_seen
+        for row in rows:
+            rows_seen += 1
+            yield row
+
+    # Filter for rows where the 'created' column is empty or does not exist,
+    # and whose topic is not reserved.
+    unposted_topics = (
+        row
+        for row in count_rows(sheet_data)
+        if not row.get("created", "").strip()
+        and str(row.get("id_topic", "")) not in reserved
+    )
+    max_candidates = data.get("max_candidates")
+    if max_candidates:
+        unposted_topics = islice(unposted_topics, max_candidates)
+
+    # Select a random topic from the filtered rows
+    try:
+        sample, candidates = reservoir_sample(unposted_topics)
+    except HttpError as err:
+        logger.error(f"Could not read the Google Sheet: {err}")
+        raise ValueError("No data read from Google Sheet.") from err
+
+    if not rows_seen:
         logger.error("No data received from the previous step.")
         raise ValueError("No data read from Google Sheet.")
 
-    # Filter for rows where the 'created' column is empty or does not exist.
-    unposted_topics = [row for row in sheet_data if not row.get("created", "").strip()]
-
-    if not unposted_topics:
+    if not sample:
         logger.warning("No unposted topics found in the Google Sheet.")
         raise ValueError("No unposted topics found to process.")
 
-    # Select a random topic from the filtered list
-    selected_row = random.choice(unposted_topics)
+    # Hand a plain dict to the next steps of the pipeline.
+    selected_row = dict(sample[0])
     topic_text = selected_row.get("topic")
 
     if not topic_text:
@@ -47,9 +147,94 @@ def _select_topic_logic(data: dict) -> dict:
         logger.error(error_msg)
         raise ValueError(error_msg)
 
-    logger.info(f"Randomly selected row: {selected_row}")
+    logger.info(
+        f"Randomly selected row among {candidates} unposted topics: {selected_row}"
+    )
 
     return selected_row
 
 
+def _select_topics_logic(data: dict) -> dict:
+    """
+    Draws several distinct unposted topics in one read of the Topics sheet, for
+    bulk generation runs.
+
+    The drawn topics are reserved for 'reservations.ttl_seconds', and topics
+    reserved by other workers are skipped, so parallel batch runs never
+    generate the same topic twice. Reservations are released once
+    `save_content_chain` marks a topic as created.
+
+    Args:
+        data: The input dictionary with 'count', the number of topics to draw.
+              Optional keys: 'range_name' (defaults to the configured sheet),
+              'balance_by' (a column to balance the draw across, e.g.
+              'category'; no balancing when empty) and 'category_weights'
+              (relative weight per value of that column, 1.0 by default).
+
+    Returns:
+        A dictionary with 'topics', the list of selected rows.
+
+    Raises:
+        ValueError: If 'count' is missing, the sheet cannot be read or no
+            unreserved unposted topics exist.
+    """
+    count = data.get("count")
+    if not count or count < 1:
+        raise ValueError("Missing a positive 'count' in input.")
+
+    client = get_sheets_client()
+    range_name = data.get("range_name") or client.config["range_name"]
+    balance_by = data.get("balance_by")
+
+    if client.mirror and client.mirror.count(range_name):
+        rows = client.mirror.select(range_name, empty=["created"])
+    else:
+        rows = client.read_sheet_iter(range_name, compact=True)
+    # Only unposted topics are kept, as compact rows.
+    try:
+        candidates = [
+            row
+            for row in rows
+            if not row.get("created", "").strip() and row.get("topic")
+        ]
+    except HttpError as err:
+        logger.error(f"Could not read the Google Sheet: {err}")
+        raise ValueError("No data read from Google Sheet.") from err
+
+    reservations = get_reservation_store(client.config)
+    with reservations.transaction() as reserved:
+        groups: dict[str, list] = {}
+        for row in candidates:
+            if str(row.get("id_topic", "")) in reserved:
+                continue
+            group = str(row.get(balance_by, "")).strip() if balance_by else ""
+            groups.setdefault(group, []).append(row)
+
+        sample = weighted_group_sample(
+            groups, count, weights=data.get("category_weights")
+        )
+        reservations.reserve(reserved, (row.get("id_topic") for row in sample))
+
+    if not sample:
+        logger.warning("No unreserved unposted topics found in the Google Sheet.")
+        raise ValueError("No unposted topics found to process.")
+
+    topics = [{k: v for k, v in dict(row).items() if k != "_row"} for row in sample]
+    available = sum(len(rows) for rows in groups.values())
+    logger.info(
+        f"Selected {len(topics)} of {count} requested topics among {available} "
+        f"unreserved unposted topics."
+    )
+    if balance_by:
+        per_group: dict[str, int] = {}
+        for topic in topics:
+            key = str(topic.get(balance_by, "")).strip()
+            per_group[key] = per_group.get(key, 0) + 1
+        logger.info(f"Topics per '{balance_by}': {per_group}")
+
+    return {"topics": topics}
+
+
 select_topic_chain = RunnableLambda(_select_topic_logic)
+
+select_topics_chain = RunnableLambda(_select_topics_logic)
@@ -1,14 +1,15 @@
 """
 Select Topic RAG Chain
 
-This chain randomly selects a topic from the topics file for content generation.
+This chain selects the next topic of a shuffled, no-repeat rotation over the
+topics file for content generation.
 """
 
-import random
 from typing import Any, Dict
 
 from langchain_core.runnables import RunnableLambda
 
+from services.topic_pool import get_topic_pool
 from utils.config_loader import load_config
 from utils.logger import setup_logger
 
@@ -17,7 +18,8 @@ logger = setup_logger(__name__)
 
 def select_topic_logic(input_data: Dict[str, Any]) -> Dict[str, Any]:
     """
-    Select a random topic from the topics file.
+    Select the next topic of the rotation over the topics file. No topic is
+    repeated until every topic of the file has been used.
 
     Args:
         input_data: Dictionary (not used, but required for chain compatibility)
@@ -26,32 +28,25 @@ def select_topic_logic(input_data: Dict[str, Any]) -> Dict[str, Any]:
         Dictionary containing the selected topic
     """
     try:
-        config = load_config("rag")
+        config = load_config("me_telegram")
         topics_file = config.get("topics_file", "data/topics/topics.txt")
+        ledger_file = config.get("topics_ledger_file", "data/topics/topics_ledger.json")
 
         logger.info("--- 🎯 Selecting random topic ---")
 
-        # Read topics from file
-        topics = []
-        with open(topics_file, "r", encoding="utf-8") as file:
-            for line in file:
-                line = line.strip()
-                # Skip empty lines and comments
-                if line and not line.startswith("#"):
-                    topics.append(line)
+        # The pool caches the parsed file and persists the rotation
+        pool = get_topic_pool(topics_file, ledger_file)
+        selected_topic, remaining, total = pool.next_topic()
 
-        if not topics:
-            raise ValueError("No topics found in topics file")
-
-        # Select random topic
-        selected_topic = random.choice(topics)
-
-        logger.info(f"Selected topic: {selected_topic}")
+        logger.info(
+            f"Selected topic: {selected_topic} ({remaining} left in this rotation)"
+        )
 
         return {
             "status": "success",
             "selected_topic": selected_topic,
-            "total_topics_available": len(topics),
+            "total_topics_available": total,
+            "topics_remaining_in_rotation": remaining,
             "topics_file": topics_file,
         }
 
@@ -0,0 +1,129 @@
+"""
+Bulk social post pipeline, for refilling the content backlog in one run:
+1. Select N unposted topics (reserved against parallel runs).
+2. Render the content prompts of every topic and submit them as one batch job.
+3. Wait for the batch, then generate interactively only what failed in it.
+4. Generate, upload and save the image and content of each topic.
+"""
+
+from typing import Dict, List, Optional
+
+from chains.generate_post import (
+    complete_content,
+    config as generate_config,
+    parse_batch_content,
+    render_batch_requests,
+)
+from chains.select_topic import select_topics_chain
+from pipelines.generate_social_post_pipeline import finish_post_chain
+from services.llm_batch import (
+    DEFAULT_POLL_INTERVAL_SECONDS,
+    DEFAULT_TIMEOUT_SECONDS,
+    BatchBackend,
+    get_batch_backend,
+    wait_for_batch,
+)
+from services.llm_scheduler import llm_priority
+from services.reservations import get_reservation_store
+from services.sheets_client import get_sheets_client
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Scheduler priority of the interactive calls of a bulk run (default is 0).
+BATCH_PRIORITY = -1
+
+
+def _custom_id(topic: dict, name: str) -> str:
+    return f"{topic['id_topic']}:{name}"
+
+
+def run_batch_pipeline(count: int, backend: Optional[BatchBackend] = None) -> Dict:
+    """
+    Generates and saves the content of `count` topics through a batch job.
+
+    Args:
+        count: The number of topics to generate content for.
+        backend: The batch backend to use. Defaults to the one configured under
+                 'batch' in configs/generate_post.yaml.
+
+    Returns:
+        A dictionary with 'batch_id', 'saved' (the final data of every saved
+        topic) and 'failed' (the id and error of every topic that was not).
+    """
+    batch_config = generate_config.get("batch") or {}
+    backend = backend or get_batch_backend(batch_config)
+
+    topics: List[dict] = select_topics_chain.invoke({"count": count})["topics"]
+    topic_ids = [topic["id_topic"] for topic in topics]
+    reservations = get_reservation_store(get_sheets_client().config)
+    saved_ids = set()
+    try:
+        requests = []
+        request_names: Dict[str, List[str]] = {}
+        for topic in topics:
+            bodies = render_batch_requests(topic)
+            request_names[topic["id_topic"]] = list(bodies)
+            for name, body in bodies.items():
+                requests.append({"custom_id": _custom_id(topic, name), "body": body})
+
+        batch_id = backend.submit(requests)
+        # The batch can outlive the reservations; keep them alive while it runs.
+        results = wait_for_batch(
+            backend,
+            batch_id,
+            poll_interval_seconds=batch_config.get(
+                "poll_interval_seconds", DEFAULT_POLL_INTERVAL_SECONDS
+            ),
+            timeout_seconds=batch_config.get(
+                "timeout_seconds", DEFAULT_TIMEOUT_SECONDS
+            ),
+            on_poll=lambda: reservations.refresh(topic_ids),
+        )
+        reservations.refresh(topic_ids)
+
+        # Fallback and image calls queue behind those of interactive pipelines.
+        with llm_priority(BATCH_PRIORITY):
+            items = []
+            for topic in topics:
+                responses = {
+                    name: results.get(_custom_id(topic, name))
+                    for name in request_names[topic["id_topic"]]
+                }
+                content, failed = parse_batch_content(responses)
+                items.append(
+                    {**topic, "content_data": complete_content(topic, content, failed)}
+                )
+
+            outputs = finish_post_chain.batch(
+                items,
+                config={"max_concurrency": batch_config.get("max_concurrency", 4)},
+                return_exceptions=True,
+            )
+
+        saved, failed_topics = [], []
+        for item, output in zip(items, outputs):
+            if isinstance(output, Exception):
+                logger.error(f"Could not finish topic {item['id_topic']}: {output}")
+                failed_topics.append(
+                    {"id_topic": item["id_topic"], "error": str(output)}
+                )
+            elif output.get("save_status") == "failed":
+                failed_topics.append(
+                    {"id_topic": item["id_topic"], "error": "Could not save it."}
+                )
+            else:
+                saved.append(output)
+                saved_ids.add(item["id_topic"])
+    finally:
+        # Let the next run pick the topics that were not saved, including all
+        # of them when the batch could not be submitted or did not complete.
+        unsaved = [id_topic for id_topic in topic_ids if id_topic not in saved_ids]
+        if unsaved:
+            reservations.release(unsaved)
+
+    logger.info(
+        f"Batch {batch_id}: saved {len(saved)} of {len(items)} topics, "
+        f"{len(failed_topics)} failed."
+    )
+    return {"batch_id": batch_id, "saved": saved, "failed": failed_topics}
@@ -6,50 +6,43 @@ Full social post pipeline with the following sequence:
 4. Save the post text and the final image URL to a spreadsheet.
 """
 
+import threading
 from operator import itemgetter
 from typing import Any, Dict
 
-from langchain_core.runnables import RunnableLambda, RunnablePassthrough
+from langchain_core.runnables import (
+    RunnableConfig,
+    RunnableLambda,
+    RunnablePassthrough,
+)
+from langchain_core.runnables.config import ContextThreadPoolExecutor
 
 from chains.generate_image import generate_image_chain
 
 # Import all the building blocks (chains)
 from chains.generate_post import (
-    generate_carousel_chain,
-    generate_post_chain,
-    generate_reel_chain,
+    STREAMING,
+    generate_all_content_chain,
+    generate_all_content_streaming,
 )
 from chains.select_topic import select_topic_chain
 from chains.upload_chain import upload_chain
 from chains.save_content_chain import save_content_chain
-from tools.google_sheets_tool import read_from_sheet_chain
+from services.pending_selections import get_pending_selections
+from utils.logger import setup_logger
 
-# The sequential pipeline definition
-social_post_pipeline = (
-    # Step 1: Read all data from the sheet
-    read_from_sheet_chain
-    # Step 2: Filter for unposted topics and select one randomly
-    | select_topic_chain
-    # Step 3: Generate all content types in parallel using the specialized chains.
-    | RunnablePassthrough.assign(
-        content_data=RunnablePassthrough.assign(
-            reel=generate_reel_chain,
-            post=generate_post_chain,
-            carousel=generate_carousel_chain,
-        )
-    )
-    # The subsequent steps (image generation, upload, save) are commented out
-    # as they need to be adapted to handle the new `content_data` structure.
-    # For example, you might want to generate one image based on the "post" content.
-    #
-    # Step 4: Generate image data from 'post' content, add it as 'image_data'
-    | RunnablePassthrough.assign(
-        image_data_output=(
-            RunnableLambda(lambda x: x["content_data"]["post"]) | generate_image_chain
-        )
+logger = setup_logger(__name__)
+
+# Step 4: Generate image data from 'post' content, add it as 'image_data'
+generate_post_image_chain = RunnablePassthrough.assign(
+    image_data_output=(
+        RunnableLambda(lambda x: x["content_data"]["post"]) | generate_image_chain
     )
+)
+
+upload_and_save_chain = (
     # Step 5: Upload image and assign just the final URL to a new key
-    | RunnablePassthrough.assign(
+    RunnablePassthrough.assign(
         image_url=(
             RunnableLambda(lambda x: x["image_data_output"])
             | upload_chain
@@ -59,3 +52,98 @@ social_post_pipeline = (
     # Step 6: Pass the whole bag to the final saving step.
     | save_content_chain
 )
+
+# Steps 4-6: Turn generated content into an image, upload it and save it all.
+# Shared with the batch pipeline, which generates the content offline.
+finish_post_chain = generate_post_image_chain | upload_and_save_chain
+
+
+def _stream_content_and_image(data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Steps 3-4 with streamed generation: the image generation starts as soon
+    as the 'content' field of the post is complete, while the other fields and
+    formats are still being generated. If that post then fails validation and
+    is generated again, the image is started again from the post that
+    replaced it, so the saved image always matches the saved post.
+    """
+    executor = ContextThreadPoolExecutor(max_workers=2)
+    image_future = None
+    image_source = None
+    lock = threading.Lock()
+
+    def start_image(content: Any) -> None:
+        nonlocal image_future, image_source
+        with lock:
+            if image_future is not None:
+                if content == image_source:
+                    return
+                logger.info("Post content was replaced; starting its image again.")
+                image_future.cancel()
+            else:
+                logger.info("Post content complete; starting image generation.")
+            image_source = content
+            image_future = executor.submit(
+                generate_image_chain.invoke, {"content": content}
+            )
+
+    def on_field(content_type: str, field: str, value: Any) -> None:
+        if content_type == "post" and field == "content":
+            start_image(value)
+
+    try:
+        content_data = generate_all_content_streaming(data, on_field)
+        start_image(content_data["post"].get("content", ""))
+        image_data_output = image_future.result()
+    finally:
+        # An image started from a replaced post is not waited for.
+        executor.shutdown(wait=False, cancel_futures=True)
+    return {
+        **data,
+        "content_data": content_data,
+        "image_data_output": image_data_output,
+    }
+
+
+# Step 3: Generate all content types, in parallel with the specialized chains
+# or with a single combined call ('combined_mode' in the config), then step 4.
+# With 'streaming' enabled, the image starts from the partial post instead.
+generate_content_and_image_chain = (
+    RunnableLambda(_stream_content_and_image)
+    if STREAMING
+    else (
+        RunnablePassthrough.assign(content_data=generate_all_content_chain)
+        | generate_post_image_chain
+    )
+)
+
+# Steps 3-6 for the selected topic: generate the content of every format and
+# the post image, upload the image and save it all.
+generate_and_save_chain = generate_content_and_image_chain | upload_and_save_chain
+
+
+def _run_social_post(data: Dict[str, Any], config: RunnableConfig) -> Dict[str, Any]:
+    """
+    Steps 1-2 select an unposted topic randomly, or retry the topic of the last
+    run when it failed; steps 3-6 run on it. When a step fails, the topic is
+    kept for the next run, which replays the content cached for it.
+    """
+    pending_selections = get_pending_selections()
+    pending = pending_selections.take("social_post")
+    if pending:
+        topic = pending.selection
+        logger.info(f"Retrying topic '{topic.get('topic')}' of a failed run.")
+    else:
+        topic = select_topic_chain.invoke(data, config)
+    retries = pending.retries + 1 if pending else 0
+    try:
+        result = generate_and_save_chain.invoke(topic, config)
+    except Exception:
+        pending_selections.save("social_post", topic, retries)
+        raise
+    if result.get("save_status") == "failed":
+        pending_selections.save("social_post", topic, retries)
+    return result
+
+
+# The sequential pipeline definition
+social_post_pipeline = RunnableLambda(_run_social_post)
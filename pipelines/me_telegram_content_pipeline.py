@@ -9,7 +9,12 @@ The pipeline includes:
 4. Publication to Telegram
 """
 
-from langchain_core.runnables import RunnablePassthrough
+from langchain_core.runnables import (
+    RunnableConfig,
+    RunnableLambda,
+    RunnablePassthrough,
+)
+from langchain_core.runnables.config import ContextThreadPoolExecutor
 
 from chains.apply_overlay_chain import apply_overlay_chain
 from chains.generate_dalle_image import generate_dalle_image_chain
@@ -19,6 +24,8 @@ from chains.telegram_publish_chain import (
     format_telegram_content_chain,
     publish_to_telegram_chain,
 )
+from services.pending_selections import get_pending_selections
+from utils.config_loader import load_config
 from utils.logger import setup_logger
 
 logger = setup_logger(__name__)
@@ -67,25 +74,68 @@ def validate_pipeline_result(result: dict) -> dict:
     return validation_result
 
 
-# Create the complete pipeline
-me_telegram_content_pipeline = (
-    # Step 1: Select random topic
-    RunnablePassthrough.assign(topic_selection=select_topic_telegram_chain)
-    # Step 2: Generate content using RAG
-    | RunnablePassthrough.assign(
-        content_generation=lambda x: me_telegram_content_chain.invoke(
-            {"selected_topic": x["topic_selection"]["selected_topic"]}
+def _stream_content_and_image(data: dict) -> dict:
+    """
+    Steps 2-3 with streamed generation: the image generation starts as soon as
+    the 'text' field is complete, while the quote is still being generated.
+    """
+    topic = data["topic_selection"]["selected_topic"]
+    with ContextThreadPoolExecutor(max_workers=1) as executor:
+        image_future = None
+
+        def on_field(field: str, value) -> None:
+            nonlocal image_future
+            if field == "text" and image_future is None:
+                logger.info("Content text complete; starting image generation.")
+                image_future = executor.submit(
+                    generate_dalle_image_chain.invoke,
+                    {"generated_content": value, "topic": topic},
+                )
+
+        content_generation = me_telegram_content_chain.invoke(
+            {"selected_topic": topic, "on_field": on_field}
         )
-    )
-    # Step 3: Generate image with DALL-E-3
-    | RunnablePassthrough.assign(
-        image_generation=lambda x: generate_dalle_image_chain.invoke(
-            {
-                "generated_content": x["content_generation"]["generated_content"],
-                "topic": x["topic_selection"]["selected_topic"],
-            }
+        if image_future is None:
+            image_future = executor.submit(
+                generate_dalle_image_chain.invoke,
+                {
+                    "generated_content": content_generation.get("generated_content"),
+                    "topic": topic,
+                },
+            )
+        return {
+            **data,
+            "content_generation": content_generation,
+            "image_generation": image_future.result(),
+        }
+
+
+if load_config("me_telegram").get("content_streaming"):
+    generate_content_and_image_chain = RunnableLambda(_stream_content_and_image)
+else:
+    generate_content_and_image_chain = (
+        # Step 2: Generate content using RAG
+        RunnablePassthrough.assign(
+            content_generation=lambda x: me_telegram_content_chain.invoke(
+                {"selected_topic": x["topic_selection"]["selected_topic"]}
+            )
+        )
+        # Step 3: Generate image with DALL-E-3
+        | RunnablePassthrough.assign(
+            image_generation=lambda x: generate_dalle_image_chain.invoke(
+                {
+                    "generated_content": x["content_generation"]["generated_content"],
+                    "topic": x["topic_selection"]["selected_topic"],
+                }
+            )
         )
     )
+
+
+# Steps 2-7 for the topic selected in step 1
+publish_topic_chain = (
+    # Steps 2-3: Generate content using RAG and an image with DALL-E-3
+    generate_content_and_image_chain
     # Step 4: Apply overlay to image
     | RunnablePassthrough.assign(
         overlay_application=lambda x: apply_overlay_chain.invoke(
@@ -116,3 +166,41 @@ me_telegram_content_pipeline = (
     # Step 7: Validate results
     | RunnablePassthrough.assign(validation=validate_pipeline_result)
 )
+
+
+def _run_me_telegram_content(data: dict, config: RunnableConfig) -> dict:
+    """
+    Step 1 selects the next topic of the rotation, or retries the topic of the
+    last run when it failed; steps 2-7 run on it. When a step fails, the topic
+    is kept for the next run instead of being skipped by the rotation, and the
+    rerun replays the content cached for it.
+    """
+    pending_selections = get_pending_selections()
+    pending = pending_selections.take("me_telegram_content")
+    if pending:
+        topic_selection = pending.selection
+        logger.info(
+            f"Retrying topic '{topic_selection['selected_topic']}' of a failed run."
+        )
+    else:
+        topic_selection = select_topic_telegram_chain.invoke(data, config)
+
+    def keep_topic() -> None:
+        if topic_selection.get("status") == "success":
+            retries = pending.retries + 1 if pending else 0
+            pending_selections.save("me_telegram_content", topic_selection, retries)
+
+    try:
+        result = publish_topic_chain.invoke(
+            {**data, "topic_selection": topic_selection}, config
+        )
+    except Exception:
+        keep_topic()
+        raise
+    if result["validation"]["status"] != "success":
+        keep_topic()
+    return result
+
+
+# Create the complete pipeline
+me_telegram_content_pipeline = RunnableLambda(_run_me_telegram_content)
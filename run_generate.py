@@ -1,8 +1,14 @@
 """
 This is an example of how to run the full social post pipeline.
 This script is the "entry point" that triggers the execution.
+
+Usage:
+    python run_generate.py             # one topic, interactive generation
+    python run_generate.py --batch 20  # 20 topics through one batch job
+    python run_generate.py --no-cache  # fresh content instead of cached responses
 """
 
+import argparse
 import os
 
 from dotenv import load_dotenv
@@ -15,13 +21,46 @@ load_dotenv()
 # Setup logger
 logger = setup_logger(__name__)
 
+parser = argparse.ArgumentParser(description="Generate social content.")
+parser.add_argument(
+    "--batch",
+    type=int,
+    metavar="N",
+    help="Generate content for N topics with one offline batch job",
+)
+parser.add_argument(
+    "--no-cache",
+    action="store_true",
+    help="Generate fresh content instead of cached responses",
+)
+args = parser.parse_args()
+
 # We need to check if the API key is set, otherwise, the LLM will fail.
 if not os.getenv("OPENAI_API_KEY"):
     logger.error("OPENAI_API_KEY environment variable not set.")
     logger.error("Please create a .env file and add your OpenAI API key to it.")
+elif args.batch:
+    from pipelines.batch_social_post_pipeline import run_batch_pipeline
+    from services.llm_cache import bypass_llm_cache
+    from services.sheets_journal import flush_write_journal
+    from services.usage_accounting import track_usage
+
+    logger.info(f"--- Starting Batch Pipeline for {args.batch} topics ---")
+    with bypass_llm_cache(args.no_cache), track_usage("batch_social_post"):
+        final_result = run_batch_pipeline(args.batch)
+
+    # Write any journaled sheet updates before exiting
+    flush_write_journal()
+
+    logger.info("--- Batch Pipeline Finished ---")
+    logger.debug("Final Result:")
+    logger.debug(final_result)
 else:
     # Import the pipeline we built
     from pipelines.generate_social_post_pipeline import social_post_pipeline
+    from services.llm_cache import bypass_llm_cache
+    from services.sheets_journal import flush_write_journal
+    from services.usage_accounting import track_usage
 
     logger.info("--- Starting Pipeline ---")
     logger.info(
@@ -32,7 +71,12 @@ else:
     # HERE IS THE INVOKE CALL
     # We call .invoke() on the fully constructed pipeline object
     # An empty dictionary is passed as input because the pipeline is self-sufficient
-    final_result = social_post_pipeline.invoke({})
+    # Token, image and cost usage of the run is logged and saved on exit
+    with bypass_llm_cache(args.no_cache), track_usage("social_post"):
+        final_result = social_post_pipeline.invoke({})
+
+    # Write any journaled sheet updates before exiting
+    flush_write_journal()
 
     logger.info("-" * 20)
     logger.info("--- Pipeline Finished ---")
@@ -14,6 +14,8 @@ from rich.console import Console
 from rich.table import Table
 
 from pipelines.me_telegram_content_pipeline import me_telegram_content_pipeline
+from services.llm_cache import bypass_llm_cache
+from services.usage_accounting import track_usage
 from tools.telegram_tool import test_telegram_connection_chain
 from utils.logger import setup_logger
 
@@ -33,6 +35,9 @@ def generate_and_publish(
     dry_run: bool = typer.Option(
         False, "--dry-run", "-d", help="Run pipeline without publishing to Telegram"
     ),
+    no_cache: bool = typer.Option(
+        False, "--no-cache", help="Generate fresh content instead of cached responses"
+    ),
 ):
     """Generate content using RAG and publish to Telegram."""
 
@@ -57,7 +62,8 @@ def generate_and_publish(
     try:
         # Run the pipeline
         with console.status("[green]Generating content and publishing to Telegram..."):
-            result = me_telegram_content_pipeline.invoke({})
+            with bypass_llm_cache(no_cache), track_usage("me_telegram_content"):
+                result = me_telegram_content_pipeline.invoke({})
 
         # Display results
         display_results(result)
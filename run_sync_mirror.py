@@ -0,0 +1,42 @@
+"""
+Syncs the local SQLite mirror of the Google Sheets used by the pipelines.
+
+Only rows whose content changed since the last sync are written. Enable the
+mirror under 'mirror' in configs/google_sheets.yaml before running it.
+
+Usage:
+    pipenv run python run_sync_mirror.py
+"""
+
+import json
+
+from dotenv import load_dotenv
+
+from services.sheets_client import get_sheets_client
+from utils.logger import setup_logger
+
+# Load environment variables from .env file
+load_dotenv()
+
+logger = setup_logger(__name__)
+
+
+def main():
+    """Downloads the mirrored sheets in one request and applies the changes."""
+    client = get_sheets_client()
+    if not client.mirror:
+        logger.error("The sheets mirror is disabled in configs/google_sheets.yaml.")
+        return
+
+    sheet_names = client.config["mirror"].get("sheets", ["Topics", "Generated"])
+    logger.info(f"Syncing sheets mirror for {sheet_names}...")
+    stats = client.sync_mirror(sheet_names)
+    if stats is None:
+        logger.error("Mirror sync failed.")
+        return
+    logger.info("Mirror sync finished.")
+    print(json.dumps(stats, indent=2))
+
+
+if __name__ == "__main__":
+    main()
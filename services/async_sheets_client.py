@@ -0,0 +1,473 @@
+"""
+Async Google Sheets Client
+
+Native asyncio counterpart of `GoogleSheetsClient` for pipelines driven with
+`ainvoke`/`abatch`. Requests go through a pooled `httpx.AsyncClient` against
+the Sheets REST API, so concurrent pipeline runs overlap their Sheets I/O
+instead of blocking the event loop.
+
+The client shares credentials, the snapshot cache, the upsert planning, the
+column projection and the local mirror with the blocking client, so both can
+be mixed within one run.
+"""
+
+import asyncio
+import weakref
+from datetime import timedelta
+from typing import Any, AsyncIterator, Dict, List, Optional
+from urllib.parse import quote
+
+import httpx
+
+from services.google_token_cache import get_token_cache, utc_now
+from services.sheets_a1 import plan_row_writes, quote_sheet_name
+from services.sheets_cache import (
+    DEFAULT_MAX_AGE_SECONDS,
+    SheetSnapshot,
+    change_marker_of,
+    sheet_name_of,
+    sheet_snapshots,
+    start_row_of,
+    warn_without_change_marker,
+)
+from services.sheets_client import get_sheets_client
+from services.sheets_mirror import SheetsMirror, get_sheets_mirror
+from services.sheets_rate_limit import get_rate_limiter, retryable_statuses
+from services.sheets_rows import ColumnProjection, SheetRow, compact_rows
+from services.sheets_upsert import apply_upsert, initial_rows, plan_upsert
+from utils.config_loader import load_config
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+SHEETS_API_URL = "https://sheets.googleapis.com/v4/spreadsheets"
+REQUEST_TIMEOUT_SECONDS = 60
+# Refresh the access token this long before it actually expires.
+TOKEN_REFRESH_MARGIN = timedelta(minutes=5)
+
+
+class AsyncGoogleSheetsClient:
+    """Asyncio Sheets client exposing the same surface as GoogleSheetsClient."""
+
+    def __init__(self, config_key: str = "google_sheets"):
+        self.config_key = config_key
+        self.config = load_config(config_key)
+        self.mirror: SheetsMirror | None = get_sheets_mirror(self.config)
+        # Shares the quota buckets of the blocking client.
+        self.limiter = get_rate_limiter(self.config)
+        warn_without_change_marker(self.config)
+        self.creds = None
+        self._http: httpx.AsyncClient | None = None
+        self._token_lock = asyncio.Lock()
+
+    def _client(self) -> httpx.AsyncClient:
+        """Returns the pooled HTTP client, creating it on first use."""
+        if self._http is None or self._http.is_closed:
+            self._http = httpx.AsyncClient(
+                base_url=f"{SHEETS_API_URL}/{self.config['spreadsheet_id']}",
+                timeout=REQUEST_TIMEOUT_SECONDS,
+                limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+            )
+        return self._http
+
+    async def aclose(self) -> None:
+        """Closes the pooled HTTP connections."""
+        if self._http is not None:
+            await self._http.aclose()
+
+    async def _access_token(self, force_refresh: bool = False) -> str:
+        """Returns a valid access token, refreshing it without blocking the loop."""
+        async with self._token_lock:
+            if self.creds is None:
+                # Credential discovery may read files or run the local auth flow.
+                self.creds = await asyncio.to_thread(
+                    lambda: get_sheets_client(self.config_key).creds
+                )
+                if not self.creds:
+                    raise RuntimeError("Authentication failed. No Google credentials.")
+
+            expiry = self.creds.expiry
+            expiring = expiry is None or expiry - TOKEN_REFRESH_MARGIN <= utc_now()
+            if force_refresh or not self.creds.token or expiring:
+                await self._refresh_token()
+            return self.creds.token
+
+    async def _refresh_token(self) -> None:
+        creds = self.creds
+        if not (creds.refresh_token and creds.client_id and creds.client_secret):
+            from google.auth.transport.requests import Request
+
+            await asyncio.to_thread(creds.refresh, Request())
+        else:
+            response = await self._client().post(
+                creds.token_uri or "https://oauth2.googleapis.com/token",
+                data={
+                    "grant_type": "refresh_token",
+                    "refresh_token": creds.refresh_token,
+                    "client_id": creds.client_id,
+                    "client_secret": creds.client_secret,
+                },
+            )
+            response.raise_for_status()
+            payload = response.json()
+            creds.token = payload["access_token"]
+            creds.expiry = utc_now() + timedelta(
+                seconds=int(payload.get("expires_in", 3600))
+            )
+        # Let the next process start with this token.
+        await asyncio.to_thread(get_token_cache(self.config).save, creds)
+        logger.info("Refreshed Google access token.")
+
+    async def _request(self, method: str, url: str, **kwargs) -> Dict[str, Any]:
+        """
+        Sends an authorised request within the quota. Retries once with a fresh
+        token on 401, and with backoff on 429/5xx (only 429 for appends).
+        """
+        if method == "GET":
+            kind = "read"
+        else:
+            kind = "append" if url.endswith(":append") else "write"
+        retryable = retryable_statuses(kind)
+        retry = self.limiter.retry
+        refreshed = False
+        attempt = 1
+        while True:
+            await self.limiter.buckets[kind].acquire_async()
+            token = await self._access_token(force_refresh=refreshed)
+            response = await self._client().request(
+                method, url, headers={"Authorization": f"Bearer {token}"}, **kwargs
+            )
+            if response.status_code == 401 and not refreshed:
+                refreshed = True
+                continue
+            if response.status_code not in retryable or attempt == retry.max_attempts:
+                break
+            delay = retry.delay(attempt, response.headers.get("Retry-After"))
+            logger.warning(
+                f"Sheets {kind} rejected with {response.status_code}; retrying in "
+                f"{delay:.1f}s (attempt {attempt}/{retry.max_attempts})."
+            )
+            await asyncio.sleep(delay)
+            attempt += 1
+        response.raise_for_status()
+        return response.json()
+
+    async def _get_values(self, range_name: str) -> List[List[Any]]:
+        result = await self._request("GET", f"/values/{quote(range_name, safe='')}")
+        return result.get("values", [])
+
+    async def _batch_get(self, ranges: List[str], **params) -> List[dict]:
+        """Reads several ranges in one `values:batchGet` request."""
+        result = await self._request(
+            "GET",
+            "/values:batchGet",
+            params=[("ranges", r) for r in ranges] + list(params.items()),
+        )
+        return result.get("valueRanges", [])
+
+    async def _change_marker(self) -> str | None:
+        """Async version of `GoogleSheetsClient._change_marker`."""
+        marker_range = self.config.get("change_marker_range")
+        if not marker_range:
+            return None
+        return change_marker_of(await self._get_values(marker_range))
+
+    def _max_age(self) -> float:
+        return self.config.get("snapshot_max_age_seconds", DEFAULT_MAX_AGE_SECONDS)
+
+    async def _read_snapshot(self, range_name: str) -> SheetSnapshot:
+        """Reads a range through the snapshot cache shared with the sync client."""
+        spreadsheet_id = self.config["spreadsheet_id"]
+        snapshot = sheet_snapshots.peek(spreadsheet_id, range_name, self._max_age())
+        if snapshot is None:
+            marker = await self._change_marker()
+            values = await self._get_values(range_name)
+            snapshot = sheet_snapshots.put(spreadsheet_id, range_name, values, marker)
+        return snapshot
+
+    async def _row_count(self, sheet_name: str) -> int:
+        """Returns the number of rows of a sheet's grid, blank rows included."""
+        result = await self._request(
+            "GET",
+            "",
+            params={
+                "ranges": quote_sheet_name(sheet_name),
+                "fields": "sheets.properties.gridProperties.rowCount",
+            },
+        )
+        sheets = result.get("sheets", [])
+        return sheets[0]["properties"]["gridProperties"]["rowCount"] if sheets else 0
+
+    async def read_sheet(self, range_name: str | None = None, compact: bool = False):
+        try:
+            current_range = range_name if range_name else self.config["range_name"]
+            values = (await self._read_snapshot(current_range)).values
+
+            if not values:
+                logger.warning("No data found in the sheet.")
+                return []
+
+            if compact:
+                return compact_rows(values)
+
+            # Assume the first row is the header, strip whitespace from each header
+            header = [h.strip() for h in values[0]]
+            return [dict(zip(header, row)) for row in values[1:]]
+
+        except (httpx.HTTPError, RuntimeError) as err:
+            logger.error(f"An API error occurred: {err}")
+            return None
+
+    async def read_columns_iter(
+        self,
+        columns: List[str],
+        range_name: str | None = None,
+        window_rows: int | None = None,
+        compact: bool = False,
+    ) -> AsyncIterator[dict | SheetRow]:
+        """
+        Async version of `GoogleSheetsClient.read_columns_iter`: yields the
+        named columns of every row plus '_row', one batchGet per window.
+
+        Raises:
+            httpx.HTTPError: If a window cannot be read.
+        """
+        current_range = range_name if range_name else self.config["range_name"]
+        sheet_name = sheet_name_of(current_range)
+        quoted_name = quote_sheet_name(sheet_name)
+        window_rows = window_rows or self.config.get("read_window_rows", 2000)
+
+        snapshot = sheet_snapshots.peek(
+            self.config["spreadsheet_id"], sheet_name, self._max_age()
+        )
+        if snapshot is not None:
+            header = snapshot.header
+        else:
+            header = (await self._read_snapshot(f"{quoted_name}!1:1")).header
+        projection = ColumnProjection(header, columns, compact)
+        if projection.missing:
+            logger.warning(
+                f"Columns {projection.missing} not found in header: {header}"
+            )
+        if not projection.projected:
+            return
+
+        if snapshot is not None:
+            for row in projection.snapshot_rows(snapshot.values):
+                yield row
+            return
+
+        start = 2
+        row_count = None
+        while True:
+            end = start + window_rows - 1
+            value_ranges = await self._batch_get(
+                projection.window_ranges(quoted_name, start, end),
+                majorDimension="COLUMNS",
+            )
+            rows = projection.window_rows(value_ranges, start)
+            for row in rows:
+                yield row
+
+            if len(rows) < window_rows:
+                # A short window may end in a blank gap, not the sheet.
+                if row_count is None:
+                    row_count = await self._row_count(sheet_name)
+                if end >= row_count:
+                    return
+            start = end + 1
+
+    async def read_row(
+        self, row_number: int, range_name: str | None = None
+    ) -> dict | None:
+        """Async version of `GoogleSheetsClient.read_row`."""
+        current_range = range_name if range_name else self.config["range_name"]
+        sheet_name = sheet_name_of(current_range)
+        quoted_name = quote_sheet_name(sheet_name)
+        header_range = f"{quoted_name}!1:1"
+        row_range = f"{quoted_name}!{row_number}:{row_number}"
+
+        snapshot = sheet_snapshots.peek(
+            self.config["spreadsheet_id"], sheet_name, self._max_age()
+        )
+        if snapshot is not None:
+            header = snapshot.header
+            row = (
+                snapshot.values[row_number - 1]
+                if row_number <= len(snapshot.values)
+                else []
+            )
+        else:
+            ranges = await self.read_ranges([header_range, row_range])
+            if ranges is None:
+                return None
+            header_values = ranges[header_range]
+            header = [h.strip() for h in header_values[0]] if header_values else []
+            row = ranges[row_range][0] if ranges[row_range] else []
+        return dict(zip(header, row)) if row else None
+
+    async def read_ranges(self, ranges: List[str]) -> Optional[Dict[str, list]]:
+        """
+        Async version of `GoogleSheetsClient.read_ranges`: ranges with a fresh
+        cached snapshot are served from memory, the rest are fetched with one
+        `values:batchGet` and stored in the snapshot cache.
+        """
+        spreadsheet_id = self.config["spreadsheet_id"]
+        results, missing = sheet_snapshots.peek_many(
+            spreadsheet_id, ranges, self._max_age()
+        )
+        if not missing:
+            return results
+
+        try:
+            marker = await self._change_marker()
+            value_ranges = await self._batch_get(missing)
+        except (httpx.HTTPError, RuntimeError) as err:
+            logger.error(f"An API error occurred: {err}")
+            return None
+
+        for range_name, value_range in zip(missing, value_ranges):
+            values = value_range.get("values", [])
+            sheet_snapshots.put(spreadsheet_id, range_name, values, marker)
+            results[range_name] = values
+        logger.debug(f"Fetched {len(missing)} ranges in one batchGet: {missing}")
+        return results
+
+    async def upsert_row(
+        self,
+        filter_key: str,
+        filter_value: str,
+        row_data: dict,
+        range_name: str | None = None,
+    ):
+        """
+        Updates a row if a matching filter_value is found in the filter_key column.
+        Otherwise, appends a new row with the provided data.
+        """
+        return await self.upsert_rows(
+            filter_key, [{**row_data, filter_key: filter_value}], range_name=range_name
+        )
+
+    async def upsert_rows(
+        self,
+        filter_key: str,
+        rows: List[dict],
+        range_name: str | None = None,
+    ):
+        """Async version of `GoogleSheetsClient.upsert_rows`."""
+        if any(filter_key not in row for row in rows):
+            raise ValueError(f"Every row must contain the filter key '{filter_key}'.")
+
+        current_range = range_name if range_name else self.config["range_name"]
+        sheet_name = sheet_name_of(current_range)
+        quoted_name = quote(quote_sheet_name(sheet_name), safe="")
+        writing = False
+
+        try:
+            snapshot = await self._read_snapshot(sheet_name)
+
+            if not snapshot.values:
+                logger.warning("Sheet is empty. Will write the header and new rows.")
+                values = initial_rows(rows)
+                writing = True
+                result = await self._request(
+                    "PUT",
+                    f"/values/{quoted_name}!A1",
+                    params={"valueInputOption": "USER_ENTERED"},
+                    json={"values": values},
+                )
+                return {
+                    "status": "success",
+                    "updated_rows": [],
+                    "inserted_rows": len(values) - 1,
+                    "responses": [result],
+                }
+
+            try:
+                plan = plan_upsert(snapshot, filter_key, rows)
+            except KeyError:
+                logger.error(
+                    f"Filter key '{filter_key}' not found in header: {snapshot.header}"
+                )
+                return None
+
+            if plan.is_empty:
+                logger.warning("No valid columns to update found in sheet header.")
+                return {"status": "no_op", "reason": "No valid columns to update"}
+
+            data_to_update = plan_row_writes(sheet_name, plan.cell_updates)
+            writing = True
+            update_request = append_request = None
+            if data_to_update:
+                update_request = self._request(
+                    "POST",
+                    "/values:batchUpdate",
+                    json={"valueInputOption": "USER_ENTERED", "data": data_to_update},
+                )
+            if plan.new_rows:
+                append_request = self._request(
+                    "POST",
+                    f"/values/{quoted_name}:append",
+                    params={
+                        "valueInputOption": "USER_ENTERED",
+                        "insertDataOption": "INSERT_ROWS",
+                    },
+                    json={"values": list(plan.new_rows.values())},
+                )
+            # Updates and inserts touch different rows, so they can run together.
+            responses = await asyncio.gather(
+                *(r for r in (update_request, append_request) if r is not None)
+            )
+
+            appended_at = None
+            if append_request is not None:
+                appended_at = start_row_of(
+                    responses[-1].get("updates", {}).get("updatedRange", "")
+                )
+            logger.info(
+                f"Upserted rows {plan.updated_rows} and appended "
+                f"{len(plan.new_rows)} new rows by '{filter_key}'."
+            )
+
+            written_rows = apply_upsert(snapshot, plan, appended_at)
+            if self.mirror:
+                self.mirror.apply_rows(
+                    sheet_name,
+                    snapshot.header,
+                    {r: snapshot.values[r - 1] for r in written_rows},
+                )
+            if not plan.new_rows or appended_at is not None:
+                sheet_snapshots.invalidate(
+                    self.config["spreadsheet_id"], sheet_name, keep=sheet_name
+                )
+                writing = False
+
+            return {
+                "status": "success",
+                "updated_rows": plan.updated_rows,
+                "inserted_rows": len(plan.new_rows),
+                "responses": list(responses),
+            }
+
+        except (httpx.HTTPError, RuntimeError) as err:
+            logger.error(f"An API error occurred during upsert: {err}")
+            return None
+
+        finally:
+            if writing:
+                sheet_snapshots.invalidate(self.config["spreadsheet_id"], sheet_name)
+
+
+# One client per event loop, since pooled httpx connections are bound to a loop.
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, AsyncGoogleSheetsClient]]" = (weakref.WeakKeyDictionary())
+
+
+def get_async_sheets_client(
+    config_key: str = "google_sheets",
+) -> AsyncGoogleSheetsClient:
+    """Returns the shared AsyncGoogleSheetsClient of the running event loop."""
+    clients = _async_clients.setdefault(asyncio.get_running_loop(), {})
+    client = clients.get(config_key)
+    if client is None:
+        client = clients[config_key] = AsyncGoogleSheetsClient(config_key)
+    return client
@@ -0,0 +1,194 @@
+"""
+Google Access Token Cache
+
+Persists the short-lived Google access token with its expiry, so processes
+started by cron reuse the token of an earlier run instead of spending an OAuth
+refresh round-trip before their first Sheets call. Long-running servers can
+also refresh the token in the background shortly before it expires, keeping
+the refresh off the request path.
+
+The cache is a small JSON file written with owner-only permissions. It is
+bound to the refresh token (by hash) and scopes it was issued for, so rotating
+credentials never picks up a stale token.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Optional
+
+from google.auth.exceptions import RefreshError, TransportError
+from google.auth.transport.requests import Request
+from google.oauth2.credentials import Credentials
+
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+DEFAULT_TOKEN_CACHE_PATH = "data/google_access_token.json"
+DEFAULT_REFRESH_MARGIN_SECONDS = 300
+# Wait before retrying a failed background refresh, doubled after every
+# consecutive failure up to the maximum.
+RETRY_INTERVAL_SECONDS = 60
+MAX_RETRY_INTERVAL_SECONDS = 900
+
+
+def utc_now() -> datetime:
+    """
+    Returns the current UTC time as a naive datetime, the way google-auth
+    keeps `Credentials.expiry`, so the two can be compared.
+    """
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _owner_key(creds: Credentials) -> str:
+    """Identifies the refresh token and scopes a cached access token belongs to."""
+    payload = json.dumps(
+        [creds.refresh_token, creds.client_id, sorted(creds.scopes or [])]
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class GoogleTokenCache:
+    """File-backed store for the access token of refresh-token credentials."""
+
+    def __init__(
+        self,
+        path: str = DEFAULT_TOKEN_CACHE_PATH,
+        refresh_margin_seconds: float = DEFAULT_REFRESH_MARGIN_SECONDS,
+    ):
+        self.path = Path(path)
+        self.refresh_margin = timedelta(seconds=refresh_margin_seconds)
+        self._lock = threading.Lock()
+        self._refresher: Optional[threading.Thread] = None
+
+    def _expires_soon(self, expiry: Optional[datetime]) -> bool:
+        return expiry is None or expiry - self.refresh_margin <= utc_now()
+
+    def restore(self, creds: Credentials) -> bool:
+        """
+        Loads a cached access token into `creds` if it was issued for the same
+        credentials and is not about to expire.
+
+        Returns:
+            True if a cached token was restored.
+        """
+        try:
+            with self.path.open(encoding="utf-8") as cache_file:
+                cached = json.load(cache_file)
+            expiry = datetime.fromisoformat(cached["expiry"])
+        except (OSError, ValueError, KeyError):
+            return False
+        if expiry.tzinfo is not None:
+            expiry = expiry.astimezone(timezone.utc).replace(tzinfo=None)
+
+        if cached.get("owner") != _owner_key(creds) or self._expires_soon(expiry):
+            return False
+        creds.token = cached["token"]
+        creds.expiry = expiry
+        logger.info(f"Reusing cached Google access token (expires {expiry} UTC).")
+        return True
+
+    def save(self, creds: Credentials) -> None:
+        """Persists the current access token of `creds`."""
+        if not creds.token or not creds.expiry:
+            return
+        payload = {
+            "owner": _owner_key(creds),
+            "token": creds.token,
+            "expiry": creds.expiry.isoformat(),
+        }
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.path.parent, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as cache_file:
+                    json.dump(payload, cache_file)
+                os.chmod(tmp_path, 0o600)
+                os.replace(tmp_path, self.path)
+            except OSError as err:
+                logger.warning(f"Could not persist Google access token: {err}")
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+
+    def refresh(self, creds: Credentials) -> None:
+        """Refreshes the access token and persists the new one."""
+        creds.refresh(Request())
+        self.save(creds)
+
+    def ensure_valid(self, creds: Credentials) -> None:
+        """Restores a cached token, or refreshes when none is usable."""
+        if self.restore(creds):
+            return
+        if not creds.valid or self._expires_soon(creds.expiry):
+            self.refresh(creds)
+
+    def start_background_refresh(self, creds: Credentials) -> None:
+        """
+        Refreshes `creds` in a daemon thread shortly before each expiry, so
+        requests of a long-running server never wait on a token refresh.
+        """
+        with self._lock:
+            if self._refresher is not None:
+                return
+            self._refresher = threading.Thread(
+                target=self._refresh_loop,
+                args=(creds,),
+                name="google-token-refresh",
+                daemon=True,
+            )
+            self._refresher.start()
+
+    def _refresh_loop(self, creds: Credentials) -> None:
+        failures = 0
+        while True:
+            if creds.expiry is None:
+                wait = 0.0
+            else:
+                refresh_at = creds.expiry - self.refresh_margin
+                wait = max(0.0, (refresh_at - utc_now()).total_seconds())
+            time.sleep(wait)
+            try:
+                self.refresh(creds)
+                failures = 0
+                logger.info(
+                    f"Refreshed Google access token in the background "
+                    f"(expires {creds.expiry} UTC)."
+                )
+            except (RefreshError, TransportError, OSError) as err:
+                # Network errors surface as TransportError; the thread must
+                # outlive them, or the token is never refreshed again.
+                retry_in = min(
+                    MAX_RETRY_INTERVAL_SECONDS, RETRY_INTERVAL_SECONDS * 2**failures
+                )
+                failures += 1
+                logger.error(
+                    f"Background token refresh failed: {err}. "
+                    f"Retrying in {retry_in}s."
+                )
+                time.sleep(retry_in)
+
+
+_caches: dict[str, GoogleTokenCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_token_cache(config: dict) -> GoogleTokenCache:
+    """Returns the process-wide token cache configured under 'token_cache'."""
+    cache_config = config.get("token_cache") or {}
+    path = cache_config.get("path", DEFAULT_TOKEN_CACHE_PATH)
+    with _caches_lock:
+        cache = _caches.get(path)
+        if cache is None:
+            cache = _caches[path] = GoogleTokenCache(
+                path,
+                refresh_margin_seconds=cache_config.get(
+                    "refresh_margin_seconds", DEFAULT_REFRESH_MARGIN_SECONDS
+                ),
+            )
+        return cache
@@ -0,0 +1,223 @@
+"""
+LLM Batch Backends
+
+Submit many chat completion requests as one offline batch job instead of
+issuing them as interactive calls, at a lower price and without per-request
+latency. A backend takes a list of requests (a 'custom_id' plus the chat
+completion body), returns a batch id, reports the status of the job and, once
+it is completed, the text of the answer of each request.
+
+Two backends are available, selected with 'batch.backend' in
+configs/generate_post.yaml:
+- 'openai': the OpenAI Batch API (answers within its completion window).
+- 'local': a file-based stand-in for tests and dry runs. Submitting writes the
+  requests to '<batch_id>.input.jsonl' in its directory; the job completes once
+  '<batch_id>.output.jsonl' exists, in the Batch API output format. When a
+  responder is given, the output file is written right away with its answers.
+"""
+
+import json
+import time
+import uuid
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from openai import OpenAI
+
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+CHAT_COMPLETIONS_ENDPOINT = "/v1/chat/completions"
+DEFAULT_LOCAL_DIR = "data/llm_batches"
+DEFAULT_POLL_INTERVAL_SECONDS = 60
+DEFAULT_TIMEOUT_SECONDS = 24 * 3600
+
+# Statuses after which a batch job will not change anymore.
+FINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+
+class BatchBackend(ABC):
+    """Interface of the batch job backends."""
+
+    @abstractmethod
+    def submit(self, requests: List[Dict]) -> str:
+        """Submits requests ({'custom_id', 'body'}) and returns the batch id."""
+
+    @abstractmethod
+    def status(self, batch_id: str) -> str:
+        """Returns the status of a batch, e.g. 'in_progress' or 'completed'."""
+
+    @abstractmethod
+    def results(self, batch_id: str) -> Dict[str, Optional[str]]:
+        """
+        Returns the answer text of each request of a completed batch by
+        custom id, or None for the requests that failed.
+        """
+
+
+def _request_line(request: Dict) -> Dict:
+    return {
+        "custom_id": request["custom_id"],
+        "method": "POST",
+        "url": CHAT_COMPLETIONS_ENDPOINT,
+        "body": request["body"],
+    }
+
+
+def _parse_output(lines: List[str]) -> Dict[str, Optional[str]]:
+    """Extracts the answer text of each line of a Batch API output file."""
+    results: Dict[str, Optional[str]] = {}
+    for line in lines:
+        if not line.strip():
+            continue
+        entry = json.loads(line)
+        response = entry.get("response") or {}
+        text = None
+        if not entry.get("error") and response.get("status_code") == 200:
+            choices = response.get("body", {}).get("choices") or [{}]
+            text = choices[0].get("message", {}).get("content")
+        else:
+            logger.warning(
+                f"Batch request {entry.get('custom_id')} failed: "
+                f"{entry.get('error') or response.get('body')}"
+            )
+        results[entry["custom_id"]] = text
+    return results
+
+
+class OpenAIBatchBackend(BatchBackend):
+    """Runs batch jobs through the OpenAI Batch API."""
+
+    def __init__(self, client: Optional[OpenAI] = None):
+        self.client = client or OpenAI()
+
+    def submit(self, requests: List[Dict]) -> str:
+        payload = "\n".join(
+            json.dumps(_request_line(request), ensure_ascii=False)
+            for request in requests
+        )
+        input_file = self.client.files.create(
+            file=("batch_input.jsonl", payload.encode("utf-8")), purpose="batch"
+        )
+        batch = self.client.batches.create(
+            input_file_id=input_file.id,
+            endpoint=CHAT_COMPLETIONS_ENDPOINT,
+            completion_window="24h",
+        )
+        logger.info(f"Submitted batch {batch.id} with {len(requests)} requests.")
+        return batch.id
+
+    def status(self, batch_id: str) -> str:
+        return self.client.batches.retrieve(batch_id).status
+
+    def results(self, batch_id: str) -> Dict[str, Optional[str]]:
+        batch = self.client.batches.retrieve(batch_id)
+        lines: List[str] = []
+        # Failed requests are reported in the error file, not the output file.
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if file_id:
+                lines.extend(self.client.files.content(file_id).text.splitlines())
+        return _parse_output(lines)
+
+
+class LocalBatchBackend(BatchBackend):
+    """File-based stand-in for the Batch API."""
+
+    def __init__(
+        self,
+        directory: str = DEFAULT_LOCAL_DIR,
+        responder: Optional[Callable[[Dict], str]] = None,
+    ):
+        self.directory = Path(directory)
+        self.responder = responder
+
+    def _path(self, batch_id: str, kind: str) -> Path:
+        return self.directory / f"{batch_id}.{kind}.jsonl"
+
+    def submit(self, requests: List[Dict]) -> str:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        batch_id = f"batch_{uuid.uuid4().hex}"
+        with self._path(batch_id, "input").open("w", encoding="utf-8") as file:
+            for request in requests:
+                file.write(json.dumps(_request_line(request), ensure_ascii=False))
+                file.write("\n")
+        if self.responder:
+            with self._path(batch_id, "output").open("w", encoding="utf-8") as file:
+                for request in requests:
+                    entry = {
+                        "custom_id": request["custom_id"],
+                        "response": {
+                            "status_code": 200,
+                            "body": {
+                                "choices": [
+                                    {
+                                        "message": {
+                                            "role": "assistant",
+                                            "content": self.responder(request["body"]),
+                                        }
+                                    }
+                                ]
+                            },
+                        },
+                        "error": None,
+                    }
+                    file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        logger.info(f"Wrote local batch {batch_id} with {len(requests)} requests.")
+        return batch_id
+
+    def status(self, batch_id: str) -> str:
+        if self._path(batch_id, "output").exists():
+            return "completed"
+        if self._path(batch_id, "input").exists():
+            return "in_progress"
+        return "failed"
+
+    def results(self, batch_id: str) -> Dict[str, Optional[str]]:
+        with self._path(batch_id, "output").open(encoding="utf-8") as file:
+            return _parse_output(file.readlines())
+
+
+def wait_for_batch(
+    backend: BatchBackend,
+    batch_id: str,
+    poll_interval_seconds: float = DEFAULT_POLL_INTERVAL_SECONDS,
+    timeout_seconds: float = DEFAULT_TIMEOUT_SECONDS,
+    on_poll: Optional[Callable[[], None]] = None,
+) -> Dict[str, Optional[str]]:
+    """
+    Polls a batch until it reaches a final status and returns its results.
+    `on_poll` is called at every poll, e.g. to keep reservations alive while
+    the batch runs.
+
+    Raises:
+        RuntimeError: If the batch ends without completing.
+        TimeoutError: If the batch is still running after `timeout_seconds`.
+    """
+    deadline = time.monotonic() + timeout_seconds
+    while True:
+        if on_poll:
+            on_poll()
+        status = backend.status(batch_id)
+        if status in FINAL_STATUSES:
+            break
+        if time.monotonic() >= deadline:
+            raise TimeoutError(f"Batch {batch_id} still '{status}' after timeout.")
+        logger.info(f"Batch {batch_id} is '{status}'; checking again later.")
+        time.sleep(poll_interval_seconds)
+
+    if status != "completed":
+        raise RuntimeError(f"Batch {batch_id} ended with status '{status}'.")
+    logger.info(f"Batch {batch_id} completed.")
+    return backend.results(batch_id)
+
+
+def get_batch_backend(batch_config: dict) -> BatchBackend:
+    """Returns the batch backend configured under 'batch'."""
+    backend = batch_config.get("backend", "openai")
+    if backend == "openai":
+        return OpenAIBatchBackend()
+    if backend == "local":
+        return LocalBatchBackend(batch_config.get("local_dir", DEFAULT_LOCAL_DIR))
+    raise ValueError(f"Unknown batch backend '{backend}'.")
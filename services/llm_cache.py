@@ -0,0 +1,223 @@
+"""
+LLM Response Cache
+
+Persistent LangChain cache for chat model calls, so rerunning a pipeline after
+a downstream failure (image upload, Sheets save, Telegram publish) replays the
+generated content instead of paying for it again.
+
+Entries are keyed by a hash of the model parameters LangChain reports for the
+call (model, temperature, ...), the rendered prompt and the chain inputs set
+with `llm_cache_scope()` (e.g. the content format and the topic), so a cached
+answer is only replayed for the inputs it was generated for. They live in
+SQLite, expire after a TTL, and the least recently used ones are evicted once
+the cache grows past its size budget.
+
+A run can bypass lookups (e.g. to force fresh content) with
+`bypass_llm_cache()` or the LLM_CACHE_BYPASS environment variable; the fresh
+responses still replace the cached ones.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional, Sequence
+
+from langchain_core.caches import RETURN_VAL_TYPE, BaseCache
+from langchain_core.messages import message_to_dict, messages_from_dict
+from langchain_core.outputs import ChatGeneration, Generation
+
+from utils.config_loader import load_config
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+DEFAULT_CACHE_PATH = "data/llm_cache.sqlite3"
+DEFAULT_MAX_SIZE_MB = 50
+DEFAULT_TTL_SECONDS = 7 * 24 * 3600
+
+_bypass: ContextVar[bool] = ContextVar("llm_cache_bypass", default=False)
+_scope: ContextVar[Dict[str, Any]] = ContextVar("llm_cache_scope", default={})
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS llm_cache (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_llm_cache_accessed ON llm_cache (accessed_at);
+"""
+
+
+@contextmanager
+def bypass_llm_cache(enabled: bool = True) -> Iterator[None]:
+    """Skips cache lookups for LLM calls made inside the block."""
+    token = _bypass.set(enabled)
+    try:
+        yield
+    finally:
+        _bypass.reset(token)
+
+
+@contextmanager
+def llm_cache_scope(**inputs: Any) -> Iterator[None]:
+    """
+    Adds `inputs` to the cache keys of the LLM calls made inside the block,
+    on top of those of enclosing scopes.
+    """
+    token = _scope.set({**_scope.get(), **inputs})
+    try:
+        yield
+    finally:
+        _scope.reset(token)
+
+
+def _is_bypassed() -> bool:
+    return _bypass.get() or os.environ.get("LLM_CACHE_BYPASS", "") not in ("", "0")
+
+
+def _serialize(generations: Sequence[Generation]) -> str:
+    entries = []
+    for generation in generations:
+        if isinstance(generation, ChatGeneration):
+            entries.append(
+                {
+                    "message": message_to_dict(generation.message),
+                    "info": generation.generation_info,
+                }
+            )
+        else:
+            entries.append(
+                {"text": generation.text, "info": generation.generation_info}
+            )
+    return json.dumps(entries, ensure_ascii=False)
+
+
+def _deserialize(value: str) -> list[Generation]:
+    generations: list[Generation] = []
+    for entry in json.loads(value):
+        if "message" in entry:
+            (message,) = messages_from_dict([entry["message"]])
+            generations.append(
+                ChatGeneration(message=message, generation_info=entry.get("info"))
+            )
+        else:
+            generations.append(
+                Generation(text=entry["text"], generation_info=entry.get("info"))
+            )
+    return generations
+
+
+class SQLiteLLMCache(BaseCache):
+    """SQLite-backed LangChain cache with TTL expiry and LRU size eviction."""
+
+    def __init__(
+        self,
+        path: str = DEFAULT_CACHE_PATH,
+        max_size_mb: float = DEFAULT_MAX_SIZE_MB,
+        ttl_seconds: float = DEFAULT_TTL_SECONDS,
+    ):
+        self.path = path
+        if path != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.max_size_bytes = int(max_size_mb * 1024 * 1024)
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(_SCHEMA)
+
+    @staticmethod
+    def _key(prompt: str, llm_string: str) -> str:
+        scope = _scope.get()
+        payload = json.dumps([llm_string, prompt, scope], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        if _is_bypassed():
+            return None
+        key = self._key(prompt, llm_string)
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, created_at = row
+            if now - created_at > self.ttl_seconds:
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                return None
+            self._conn.execute(
+                "UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (now, key)
+            )
+        logger.info("Serving LLM response from cache.")
+        return _deserialize(value)
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        value = _serialize(return_val)
+        size = len(value.encode("utf-8"))
+        if size > self.max_size_bytes:
+            return
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache "
+                "(key, value, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (self._key(prompt, llm_string), value, size, now, now),
+            )
+            self._evict(now)
+
+    def _evict(self, now: float) -> None:
+        """Drops expired entries, then the least recently used over budget."""
+        self._conn.execute(
+            "DELETE FROM llm_cache WHERE created_at < ?", (now - self.ttl_seconds,)
+        )
+        (total,) = self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM llm_cache"
+        ).fetchone()
+        if total <= self.max_size_bytes:
+            return
+        evicted = 0
+        for key, size in self._conn.execute(
+            "SELECT key, size FROM llm_cache ORDER BY accessed_at"
+        ).fetchall():
+            if total <= self.max_size_bytes:
+                break
+            self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+            total -= size
+            evicted += 1
+        logger.info(f"Evicted {evicted} least recently used LLM cache entries.")
+
+    def clear(self, **kwargs: Any) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM llm_cache")
+
+
+_cache: Optional[SQLiteLLMCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_llm_cache() -> Optional[SQLiteLLMCache]:
+    """
+    Returns the process-wide LLM cache configured in 'configs/llm_cache.yaml',
+    or None when the cache is disabled.
+    """
+    global _cache
+    config = load_config("llm_cache")
+    if not config.get("enabled"):
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = SQLiteLLMCache(
+                path=config.get("path", DEFAULT_CACHE_PATH),
+                max_size_mb=config.get("max_size_mb", DEFAULT_MAX_SIZE_MB),
+                ttl_seconds=config.get("ttl_seconds", DEFAULT_TTL_SECONDS),
+            )
+        return _cache
@@ -0,0 +1,119 @@
+"""
+LLM Registry
+
+Process-wide registry of compiled prompt templates, chat models and chains, so
+they are built once on first use instead of at import time or on every call.
+
+Entries built from prompt files are keyed by the files' modification time and
+size as well: editing a prompt file rebuilds the entries that depend on it on
+their next use, without restarting the process. Chat models are shared per
+model parameters, use the LLM cache of `services.llm_cache` and go through the
+LLM scheduler of `services.llm_scheduler`.
+"""
+
+import json
+import os
+import threading
+from typing import Any, Callable, Dict, Hashable, Iterable, Optional, Tuple
+
+from langchain_core.prompts import ChatPromptTemplate, PromptTemplate
+from langchain_openai import ChatOpenAI
+
+from services.llm_cache import get_llm_cache
+from services.llm_scheduler import ScheduledChatOpenAI
+from services.openai_client import OpenAIClient
+from utils.file_utils import load_prompt_template
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Reentrant, since builders look up the entries they are made of.
+_lock = threading.RLock()
+_entries: Dict[Hashable, Tuple[Tuple, Any]] = {}
+
+
+def _signature(paths: Iterable[str]) -> Tuple:
+    signature = []
+    for path in paths:
+        stat = os.stat(path)
+        signature.append((path, stat.st_mtime_ns, stat.st_size))
+    return tuple(signature)
+
+
+def get_cached(key: Hashable, build: Callable[[], Any], paths: Iterable[str] = ()):
+    """
+    Returns the entry registered under `key`, building it with `build` on first
+    use and again whenever one of the files in `paths` changed.
+
+    Raises:
+        FileNotFoundError: If one of `paths` does not exist.
+    """
+    signature = _signature(paths)
+    with _lock:
+        entry = _entries.get(key)
+        if entry is not None and entry[0] == signature:
+            return entry[1]
+        value = build()
+        _entries[key] = (signature, value)
+        if entry is not None:
+            logger.info(f"Rebuilt {key} after its prompt files changed.")
+        return value
+
+
+def get_prompt_template(path: str) -> PromptTemplate:
+    """Returns the compiled string prompt template of a prompt file."""
+    return get_cached(
+        ("prompt", path),
+        lambda: PromptTemplate.from_template(load_prompt_template(path)),
+        [path],
+    )
+
+
+def get_chat_prompt(
+    user_prompt_path: str, system_prompt_path: Optional[str] = None
+) -> ChatPromptTemplate:
+    """
+    Returns the compiled chat prompt of a user prompt file, preceded by a system
+    prompt file when one is given.
+    """
+
+    def build() -> ChatPromptTemplate:
+        user_prompt = load_prompt_template(user_prompt_path)
+        if system_prompt_path is None:
+            return ChatPromptTemplate.from_template(user_prompt)
+        return ChatPromptTemplate.from_messages(
+            [
+                ("system", load_prompt_template(system_prompt_path)),
+                ("user", user_prompt),
+            ]
+        )
+
+    paths = [user_prompt_path]
+    if system_prompt_path is not None:
+        paths.append(system_prompt_path)
+    return get_cached(
+        ("chat_prompt", user_prompt_path, system_prompt_path), build, paths
+    )
+
+
+def get_chat_model(model: str, temperature: float, **kwargs) -> ChatOpenAI:
+    """
+    Returns the shared chat model for these parameters. Its requests are
+    admitted by the LLM scheduler of the model.
+    """
+    key = ("chat_model", model, temperature, json.dumps(kwargs, sort_keys=True))
+    return get_cached(
+        key,
+        lambda: ScheduledChatOpenAI(
+            model=model,
+            temperature=temperature,
+            # Reruns replay cached generations for the same prompt and model
+            cache=get_llm_cache(),
+            **kwargs,
+        ),
+    )
+
+
+def get_openai_client() -> OpenAIClient:
+    """Returns the shared OpenAI client, e.g. for image generation."""
+    return get_cached("openai_client", OpenAIClient)
@@ -0,0 +1,390 @@
+"""
+LLM Scheduler
+
+Keeps concurrent pipelines inside the OpenAI per-minute limits of the account
+instead of bursting into 429 storms. Every chat completion and image request
+is admitted by the scheduler of its model first: a request bucket (RPM) and,
+for chat models, a token bucket (TPM) configured in 'configs/llm_scheduler.yaml'.
+
+Chat requests are charged their prompt tokens, counted up front, plus the
+expected completion ('max_tokens' or 'default_completion_tokens'). Once the
+answer arrives, the difference with the tokens actually used is settled.
+Requests that cannot be admitted yet wait in a priority queue, served highest
+priority first and in arrival order within a priority, so a large request is
+not starved by smaller ones behind it. Callers set the priority of their calls
+with `llm_priority()`; e.g. bulk backfills run below interactive pipelines.
+
+A dispatcher thread admits the queued requests as the buckets refill, which
+serves blocking and asyncio callers alike. A 429 that gets through anyway
+pauses admissions for its Retry-After.
+
+Scheduled clients are built with the retries of the OpenAI SDK turned off, as
+those would resend a rejected request without admission. Failed requests are
+retried here instead, up to 'max_attempts', and every attempt is admitted
+again.
+"""
+
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional
+
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
+from langchain_openai import ChatOpenAI
+from openai import (
+    APIConnectionError,
+    InternalServerError,
+    OpenAIError,
+    RateLimitError,
+)
+
+from services.sheets_rate_limit import TokenBucket
+from utils.config_loader import load_config
+from utils.logger import setup_logger
+from utils.tokens import count_message_tokens, count_tokens
+
+logger = setup_logger(__name__)
+
+DEFAULT_BURST_SECONDS = 10
+DEFAULT_COMPLETION_TOKENS = 1000
+DEFAULT_RETRY_AFTER_SECONDS = 5
+DEFAULT_MAX_ATTEMPTS = 3
+MAX_RETRY_DELAY_SECONDS = 30
+
+# Failures the OpenAI SDK would retry itself.
+RETRYABLE_ERRORS = (RateLimitError, APIConnectionError, InternalServerError)
+
+_priority: ContextVar[int] = ContextVar("llm_priority", default=0)
+
+
+@contextmanager
+def llm_priority(priority: int) -> Iterator[None]:
+    """Queues the LLM and image calls made inside the block at `priority`."""
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class _Waiter:
+    __slots__ = ("tokens", "event", "loop", "future", "cancelled", "admitted")
+
+    def __init__(self, tokens: float):
+        self.tokens = tokens
+        self.event: Optional[threading.Event] = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.future: Optional[asyncio.Future] = None
+        self.cancelled = False
+        self.admitted = False
+
+    def admit(self) -> None:
+        if self.event is not None:
+            self.event.set()
+        elif self.loop is not None and self.future is not None:
+            self.loop.call_soon_threadsafe(_resolve, self.future)
+
+
+def _resolve(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+class LLMScheduler:
+    """Priority admission of the requests of one model against RPM/TPM buckets."""
+
+    def __init__(
+        self,
+        name: str,
+        requests_per_minute: float,
+        tokens_per_minute: Optional[float] = None,
+        burst_seconds: float = DEFAULT_BURST_SECONDS,
+        max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+    ):
+        self.name = name
+        self.max_attempts = max_attempts
+        self.requests = TokenBucket(
+            requests_per_minute, max(1.0, requests_per_minute / 60 * burst_seconds)
+        )
+        self.tokens = (
+            TokenBucket(
+                tokens_per_minute, max(1.0, tokens_per_minute / 60 * burst_seconds)
+            )
+            if tokens_per_minute
+            else None
+        )
+        self._queue: List = []
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._paused_until = 0.0
+        self._dispatcher: Optional[threading.Thread] = None
+
+    def _enqueue(self, waiter: _Waiter) -> None:
+        with self._condition:
+            heapq.heappush(
+                self._queue, (-_priority.get(), next(self._sequence), waiter)
+            )
+            if self._dispatcher is None:
+                self._dispatcher = threading.Thread(
+                    target=self._dispatch,
+                    name=f"llm-scheduler-{self.name}",
+                    daemon=True,
+                )
+                self._dispatcher.start()
+            self._condition.notify()
+
+    def _wait_time(self, tokens: float) -> float:
+        wait = max(self._paused_until - time.monotonic(), self.requests.wait_time())
+        if self.tokens is not None:
+            wait = max(wait, self.tokens.wait_time(tokens))
+        return wait
+
+    def _dispatch(self) -> None:
+        """Admits the head of the queue whenever the buckets can take it."""
+        with self._condition:
+            while True:
+                while not self._queue:
+                    self._condition.wait()
+                waiter = self._queue[0][2]
+                if waiter.cancelled:
+                    heapq.heappop(self._queue)
+                    continue
+                wait = self._wait_time(waiter.tokens)
+                if wait > 0:
+                    # Woken early when a request with a higher priority arrives.
+                    self._condition.wait(wait)
+                    continue
+                heapq.heappop(self._queue)
+                self.requests.take()
+                if self.tokens is not None:
+                    self.tokens.take(waiter.tokens)
+                waiter.admitted = True
+                waiter.admit()
+
+    def admit(self, tokens: float = 0) -> None:
+        """Blocks until a request of `tokens` estimated tokens may be sent."""
+        waiter = _Waiter(tokens)
+        waiter.event = threading.Event()
+        self._enqueue(waiter)
+        waiter.event.wait()
+
+    async def admit_async(self, tokens: float = 0) -> None:
+        """Waits until a request of `tokens` estimated tokens may be sent."""
+        waiter = _Waiter(tokens)
+        waiter.loop = asyncio.get_running_loop()
+        waiter.future = waiter.loop.create_future()
+        self._enqueue(waiter)
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            with self._condition:
+                waiter.cancelled = True
+                admitted = waiter.admitted
+            if admitted:
+                # Cancelled after the dispatcher took its share of the buckets.
+                self.requests.take(-1)
+                self.settle(tokens, 0)
+            raise
+
+    def settle(self, estimated: float, actual: float) -> None:
+        """Charges or refunds the difference between estimated and used tokens."""
+        if self.tokens is not None and actual != estimated:
+            self.tokens.take(actual - estimated)
+
+    def pause(self, seconds: float) -> None:
+        """Holds admissions after a rate limit error got through."""
+        with self._condition:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        logger.warning(f"Rate limited on {self.name}; pausing for {seconds:.1f}s.")
+
+    def retry_delay(self, err: Exception, attempt: int) -> Optional[float]:
+        """
+        Handles the failure of the `attempt`-th try of a request: a rate limit
+        error pauses admissions for its Retry-After. Returns the seconds to wait
+        before the request is admitted again, or None if it is not retried.
+        """
+        if isinstance(err, RateLimitError):
+            self.pause(retry_after(err))
+        if attempt >= self.max_attempts or not isinstance(err, RETRYABLE_ERRORS):
+            return None
+        logger.warning(f"Retrying a failed request to {self.name}: {err}")
+        if isinstance(err, RateLimitError):
+            # The paused admission already makes it wait.
+            return 0.0
+        return min(2.0 ** (attempt - 1), MAX_RETRY_DELAY_SECONDS)
+
+
+def retry_after(err: RateLimitError) -> float:
+    """Returns the seconds a rate limit error asks to wait."""
+    try:
+        return float(err.response.headers.get("retry-after"))
+    except (AttributeError, TypeError, ValueError):
+        return DEFAULT_RETRY_AFTER_SECONDS
+
+
+_schedulers: Dict[str, Optional[LLMScheduler]] = {}
+_schedulers_lock = threading.Lock()
+
+
+def get_llm_scheduler(model: str) -> Optional[LLMScheduler]:
+    """
+    Returns the process-wide scheduler of a chat or image model, or None when
+    scheduling is disabled or the model has no configured limits.
+    """
+    with _schedulers_lock:
+        if model in _schedulers:
+            return _schedulers[model]
+        config = load_config("llm_scheduler")
+        limits = config.get("limits") or {}
+        # Dated model names ('gpt-4o-mini-2024-07-18') use their family's limits.
+        matches = [name for name in limits if model.startswith(name)]
+        scheduler = None
+        if config.get("enabled") and matches:
+            model_limits = limits[max(matches, key=len)]
+            scheduler = LLMScheduler(
+                model,
+                model_limits["requests_per_minute"],
+                model_limits.get("tokens_per_minute"),
+                config.get("burst_seconds", DEFAULT_BURST_SECONDS),
+                config.get("max_attempts", DEFAULT_MAX_ATTEMPTS),
+            )
+        _schedulers[model] = scheduler
+        return scheduler
+
+
+def _completion_budget(max_tokens: Optional[int]) -> int:
+    if max_tokens:
+        return max_tokens
+    return load_config("llm_scheduler").get(
+        "default_completion_tokens", DEFAULT_COMPLETION_TOKENS
+    )
+
+
+def _used_tokens(result: ChatResult) -> Optional[int]:
+    usage = (result.llm_output or {}).get("token_usage") or {}
+    total = usage.get("total_tokens")
+    if total is None and result.generations:
+        metadata = getattr(result.generations[0].message, "usage_metadata", None)
+        total = (metadata or {}).get("total_tokens")
+    return total
+
+
+class ScheduledChatOpenAI(ChatOpenAI):
+    """ChatOpenAI whose API requests are admitted by the LLM scheduler."""
+
+    def __init__(self, **kwargs):
+        model = kwargs.get("model") or kwargs.get("model_name")
+        if model and get_llm_scheduler(model) is not None:
+            # Failed requests are retried by the scheduler, through admission.
+            kwargs.setdefault("max_retries", 0)
+        super().__init__(**kwargs)
+
+    @classmethod
+    def lc_id(cls) -> List[str]:
+        # Cache entries and traces see the same model as a plain ChatOpenAI.
+        return ChatOpenAI.lc_id()
+
+    def _estimate(self, messages) -> int:
+        return count_message_tokens(self.model_name, messages) + _completion_budget(
+            self.max_tokens
+        )
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        scheduler = get_llm_scheduler(self.model_name)
+        # Streaming models generate through `_stream`, which is scheduled.
+        if scheduler is None or self.streaming:
+            return super()._generate(messages, stop, run_manager, **kwargs)
+        estimate = self._estimate(messages)
+        for attempt in itertools.count(1):
+            scheduler.admit(estimate)
+            try:
+                result = super()._generate(messages, stop, run_manager, **kwargs)
+            except OpenAIError as err:
+                delay = scheduler.retry_delay(err, attempt)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                continue
+            scheduler.settle(estimate, _used_tokens(result) or estimate)
+            return result
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        scheduler = get_llm_scheduler(self.model_name)
+        if scheduler is None or self.streaming:
+            return await super()._agenerate(messages, stop, run_manager, **kwargs)
+        estimate = self._estimate(messages)
+        for attempt in itertools.count(1):
+            await scheduler.admit_async(estimate)
+            try:
+                result = await super()._agenerate(messages, stop, run_manager, **kwargs)
+            except OpenAIError as err:
+                delay = scheduler.retry_delay(err, attempt)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                continue
+            scheduler.settle(estimate, _used_tokens(result) or estimate)
+            return result
+
+    def _stream(
+        self, messages, stop=None, run_manager=None, **kwargs
+    ) -> Iterator[ChatGenerationChunk]:
+        scheduler = get_llm_scheduler(self.model_name)
+        if scheduler is None:
+            yield from super()._stream(messages, stop, run_manager, **kwargs)
+            return
+        estimate = self._estimate(messages)
+        prompt_tokens = estimate - _completion_budget(self.max_tokens)
+        for attempt in itertools.count(1):
+            scheduler.admit(estimate)
+            streamed = False
+            text = ""
+            try:
+                for chunk in super()._stream(messages, stop, run_manager, **kwargs):
+                    streamed = True
+                    text += chunk.text
+                    yield chunk
+                return
+            except OpenAIError as err:
+                delay = scheduler.retry_delay(err, attempt)
+                # Chunks already handed out cannot be taken back.
+                if delay is None or streamed:
+                    raise
+            finally:
+                # Also settled when the stream fails or the caller stops early.
+                used = prompt_tokens + count_tokens(self.model_name, text)
+                scheduler.settle(estimate, used)
+            time.sleep(delay)
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        scheduler = get_llm_scheduler(self.model_name)
+        if scheduler is None:
+            async for chunk in super()._astream(messages, stop, run_manager, **kwargs):
+                yield chunk
+            return
+        estimate = self._estimate(messages)
+        prompt_tokens = estimate - _completion_budget(self.max_tokens)
+        for attempt in itertools.count(1):
+            await scheduler.admit_async(estimate)
+            streamed = False
+            text = ""
+            try:
+                async for chunk in super()._astream(
+                    messages, stop, run_manager, **kwargs
+                ):
+                    streamed = True
+                    text += chunk.text
+                    yield chunk
+                return
+            except OpenAIError as err:
+                delay = scheduler.retry_delay(err, attempt)
+                if delay is None or streamed:
+                    raise
+            finally:
+                used = prompt_tokens + count_tokens(self.model_name, text)
+                scheduler.settle(estimate, used)
+            await asyncio.sleep(delay)
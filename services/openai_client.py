@@ -1,7 +1,13 @@
-from langchain_openai import ChatOpenAI
-from openai import OpenAI
+import itertools
+import time
 from typing import Literal
 
+from langchain_openai import ChatOpenAI
+from openai import OpenAI, OpenAIError
+
+from services.llm_scheduler import get_llm_scheduler
+from services.usage_accounting import record_image_usage
+
 
 class OpenAIClient:
     def __init__(self, temperature=0.7, model="gpt-3.5-turbo"):
@@ -54,7 +60,41 @@ class OpenAIClient:
         if style:
             request_params["style"] = style
 
-        response = self.client.images.generate(**request_params)
+        # Stay within the images-per-minute limit of the model. Failed requests
+        # are retried by the scheduler instead of the SDK, so every attempt is
+        # admitted.
+        scheduler = get_llm_scheduler(model)
+        client = self.client.with_options(max_retries=0) if scheduler else self.client
+
+        started = time.monotonic()
+        for attempt in itertools.count(1):
+            if scheduler:
+                scheduler.admit()
+            try:
+                response = client.images.generate(**request_params)
+                break
+            except Exception as err:
+                delay = (
+                    scheduler.retry_delay(err, attempt)
+                    if scheduler and isinstance(err, OpenAIError)
+                    else None
+                )
+                if delay is None:
+                    record_image_usage(
+                        "generate_image",
+                        model,
+                        time.monotonic() - started,
+                        error=str(err),
+                    )
+                    raise
+                time.sleep(delay)
+        record_image_usage(
+            "generate_image",
+            model,
+            time.monotonic() - started,
+            images=len(response.data or []),
+            quality=quality,
+        )
 
         if not response.data:
             raise ValueError("Image generation failed, no data returned.")
@@ -0,0 +1,105 @@
+"""
+Pending Topic Selections
+
+Remembers the topic of a pipeline run that failed, so the next run of the
+same pipeline retries that topic instead of drawing a new one. The LLM cache
+is keyed on the topic, so the retry replays the content generated by the
+failed run, and rotations such as the Telegram topic ledger do not skip the
+topic that failed.
+
+Selections are kept per pipeline in a small JSON file guarded by an exclusive
+`flock`. They expire with the LLM cache entries they would replay, and are
+dropped after 'max_retries' retries so a topic that always fails does not
+block its pipeline.
+"""
+
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from utils.config_loader import load_config
+from utils.file_utils import locked_json_store
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+DEFAULT_PENDING_PATH = "data/pending_selections.json"
+DEFAULT_MAX_RETRIES = 3
+DEFAULT_TTL_SECONDS = 7 * 24 * 3600
+
+
+@dataclass
+class PendingSelection:
+    """The topic of a failed run and how often it was retried already."""
+
+    selection: Dict[str, Any]
+    retries: int = 0
+
+
+class PendingSelectionStore:
+    """File-backed map of pipeline names to the selection of their failed run."""
+
+    def __init__(
+        self,
+        path: str = DEFAULT_PENDING_PATH,
+        ttl_seconds: float = DEFAULT_TTL_SECONDS,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+    ):
+        self.path = Path(path)
+        self.ttl_seconds = ttl_seconds
+        self.max_retries = max_retries
+        self._lock = threading.Lock()
+
+    def _update(self, pipeline: str, entry: Optional[dict]) -> Optional[dict]:
+        """Replaces the entry of `pipeline` and returns the previous one."""
+        with locked_json_store(self.path, self._lock) as stored:
+            previous = stored.pop(pipeline, None)
+            if entry is not None:
+                stored[pipeline] = entry
+        return previous
+
+    def take(self, pipeline: str) -> Optional[PendingSelection]:
+        """
+        Removes and returns the selection left by a failed run of `pipeline`,
+        or None when there is none or it expired.
+        """
+        entry = self._update(pipeline, None)
+        if entry is None or time.time() - entry["failed_at"] > self.ttl_seconds:
+            return None
+        return PendingSelection(entry["selection"], entry.get("retries", 0))
+
+    def save(self, pipeline: str, selection: Dict[str, Any], retries: int = 0) -> None:
+        """Keeps the selection of a failed run for the next run of `pipeline`."""
+        if retries >= self.max_retries:
+            logger.warning(
+                f"Topic of '{pipeline}' failed again after {retries} retries; "
+                "the next run draws a new one."
+            )
+            return
+        entry = {"selection": selection, "failed_at": time.time(), "retries": retries}
+        self._update(pipeline, entry)
+        logger.info(f"The next run of '{pipeline}' retries the same topic.")
+
+
+_store: Optional[PendingSelectionStore] = None
+_store_lock = threading.Lock()
+
+
+def get_pending_selections() -> PendingSelectionStore:
+    """
+    Returns the process-wide store configured under 'pending_selections' in
+    'configs/llm_cache.yaml'.
+    """
+    global _store
+    config = load_config("llm_cache")
+    store_config = config.get("pending_selections") or {}
+    with _store_lock:
+        if _store is None:
+            _store = PendingSelectionStore(
+                path=store_config.get("path", DEFAULT_PENDING_PATH),
+                ttl_seconds=config.get("ttl_seconds", DEFAULT_TTL_SECONDS),
+                max_retries=store_config.get("max_retries", DEFAULT_MAX_RETRIES),
+            )
+        return _store
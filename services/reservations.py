@@ -0,0 +1,87 @@
+"""
+Key Reservations
+
+Short-lived claims on sheet keys (e.g. topic ids) so parallel workers on the
+same host do not pick the same rows before either has written its result back
+to the sheet. Reservations live in a small JSON file guarded by an exclusive
+`flock`, which serialises workers across threads and processes, and expire
+after a TTL so a crashed worker never blocks a key for good.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, Set
+
+from utils.file_utils import locked_json_store
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+DEFAULT_RESERVATIONS_PATH = "data/topic_reservations.json"
+DEFAULT_TTL_SECONDS = 3600
+
+
+class ReservationStore:
+    """File-backed map of reserved keys to their expiry time."""
+
+    def __init__(
+        self,
+        path: str = DEFAULT_RESERVATIONS_PATH,
+        ttl_seconds: float = DEFAULT_TTL_SECONDS,
+    ):
+        self.path = Path(path)
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def transaction(self) -> Iterator[Dict[str, float]]:
+        """
+        Yields the active reservations (key -> expiry timestamp) under an
+        exclusive lock. Changes made to the dict are saved when the block exits.
+        """
+        with locked_json_store(self.path, self._lock) as active:
+            now = time.time()
+            for key in [key for key, expiry in active.items() if expiry <= now]:
+                del active[key]
+            yield active
+
+    def reserved_keys(self) -> Set[str]:
+        """Returns the keys with an active reservation."""
+        with self.transaction() as active:
+            return set(active)
+
+    def reserve(self, active: Dict[str, float], keys: Iterable[str]) -> None:
+        """Adds `keys` to the reservations of an open transaction."""
+        expires_at = time.time() + self.ttl_seconds
+        for key in keys:
+            active[str(key)] = expires_at
+
+    def refresh(self, keys: Iterable[str]) -> None:
+        """Extends the reservations of `keys` by a full TTL from now."""
+        with self.transaction() as active:
+            self.reserve(active, keys)
+
+    def release(self, keys: Iterable[str]) -> None:
+        """Drops the reservations of `keys`, e.g. once their rows are marked."""
+        with self.transaction() as active:
+            for key in keys:
+                active.pop(str(key), None)
+
+
+_stores: Dict[str, ReservationStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_reservation_store(config: dict) -> ReservationStore:
+    """Returns the process-wide store configured under 'reservations'."""
+    store_config = config.get("reservations") or {}
+    path = store_config.get("path", DEFAULT_RESERVATIONS_PATH)
+    with _stores_lock:
+        store = _stores.get(path)
+        if store is None:
+            store = _stores[path] = ReservationStore(
+                path, store_config.get("ttl_seconds", DEFAULT_TTL_SECONDS)
+            )
+        return store
@@ -0,0 +1,95 @@
+"""
+A1 Notation Helpers
+
+Builds A1 ranges for the Sheets API and plans row writes so that adjacent
+cells of a row are sent as one contiguous range instead of one range per cell.
+"""
+
+import re
+from typing import Any, Dict, List
+
+_PLAIN_SHEET_NAME = re.compile(r"^[A-Za-z0-9_]+$")
+
+
+def column_letter(index: int) -> str:
+    """Returns the A1 column letters for a 0-based column index (0 -> A, 26 -> AA)."""
+    if index < 0:
+        raise ValueError(f"Column index must be non-negative, got {index}.")
+    letters = ""
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(ord("A") + remainder) + letters
+    return letters
+
+
+def column_index(letters: str) -> int:
+    """Returns the 0-based column index for A1 column letters (A -> 0, AA -> 26)."""
+    if not letters or not letters.isalpha():
+        raise ValueError(f"Invalid column letters: '{letters}'.")
+    index = 0
+    for char in letters.upper():
+        index = index * 26 + (ord(char) - ord("A") + 1)
+    return index - 1
+
+
+def quote_sheet_name(sheet_name: str) -> str:
+    """Quotes a sheet name for use in a range when it contains special characters."""
+    if _PLAIN_SHEET_NAME.match(sheet_name):
+        return sheet_name
+    return "'" + sheet_name.replace("'", "''") + "'"
+
+
+def row_range(sheet_name: str, row_number: int, start_col: int, end_col: int) -> str:
+    """Returns the A1 range covering columns start_col..end_col of one row."""
+    start = f"{column_letter(start_col)}{row_number}"
+    end = f"{column_letter(end_col)}{row_number}"
+    cells = start if start_col == end_col else f"{start}:{end}"
+    return f"{quote_sheet_name(sheet_name)}!{cells}"
+
+
+def plan_row_writes(
+    sheet_name: str, cell_updates: Dict[int, Dict[int, Any]]
+) -> List[Dict[str, Any]]:
+    """
+    Turns per-cell updates into the fewest `ValueRange`s for `values.batchUpdate`.
+
+    Adjacent columns of the same row are merged into one range. Columns that
+    are not being written are never included, so gaps split a row into
+    several segments rather than overwriting untouched cells.
+
+    Args:
+        sheet_name: The sheet (tab) the rows belong to.
+        cell_updates: Row number -> {0-based column index -> value}.
+
+    Returns:
+        A list of {"range": ..., "values": [[...]]} dictionaries.
+    """
+    data = []
+    for row_number in sorted(cell_updates):
+        cells = cell_updates[row_number]
+        segment: List[Any] = []
+        segment_start = prev_col = None
+        for col in sorted(cells):
+            if segment and col != prev_col + 1:
+                data.append(
+                    {
+                        "range": row_range(
+                            sheet_name, row_number, segment_start, prev_col
+                        ),
+                        "values": [segment],
+                    }
+                )
+                segment = []
+            if not segment:
+                segment_start = col
+            segment.append(cells[col])
+            prev_col = col
+        if segment:
+            data.append(
+                {
+                    "range": row_range(sheet_name, row_number, segment_start, prev_col),
+                    "values": [segment],
+                }
+            )
+    return data
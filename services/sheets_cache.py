@@ -0,0 +1,286 @@
+"""
+Sheet Snapshot Cache
+
+Process-wide read-through cache for raw sheet values, keyed by spreadsheet
+and range. Several chains read the same `Topics`/`Generated` ranges within
+seconds of each other; this cache serves those repeated reads from memory.
+
+A cached snapshot is served as-is while it is younger than `max_age`. Once it
+is older, the cache asks for a cheap change marker (e.g. a hash of a small
+metadata range) and only re-downloads the range if the marker moved.
+
+Each snapshot also carries hash indexes (column name -> index, key value ->
+row number) so upserts do not scan the sheet. Writes made by this process are
+applied to the cached snapshot and its indexes; failed writes invalidate it.
+"""
+
+import hashlib
+import json
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+DEFAULT_MAX_AGE_SECONDS = 30.0
+
+
+def sheet_name_of(range_name: str) -> str:
+    """Returns the sheet (tab) name of an A1 range such as 'Topics!A1:D'."""
+    return range_name.split("!")[0].strip("'")
+
+
+def change_marker_of(values: List[List[Any]]) -> str:
+    """Returns the change marker of the values of a 'change_marker_range'."""
+    payload = json.dumps(values, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+_warned_without_marker: set = set()
+_warned_lock = threading.Lock()
+
+
+def warn_without_change_marker(config: Dict[str, Any]) -> None:
+    """
+    Logs once per spreadsheet that no 'change_marker_range' is configured, so
+    expired snapshots are always downloaded again in full.
+    """
+    if config.get("change_marker_range"):
+        return
+    spreadsheet_id = config.get("spreadsheet_id")
+    with _warned_lock:
+        if spreadsheet_id in _warned_without_marker:
+            return
+        _warned_without_marker.add(spreadsheet_id)
+    logger.warning(
+        "No 'change_marker_range' is configured: sheet snapshots older than "
+        "'snapshot_max_age_seconds' are downloaded again in full instead of "
+        "being revalidated."
+    )
+
+
+def start_row_of(range_name: str) -> Optional[int]:
+    """Returns the first row number of an A1 range such as 'Generated!A5:K7'."""
+    match = re.search(r"![A-Z]*(\d+)", range_name)
+    return int(match.group(1)) if match else None
+
+
+@dataclass
+class SheetSnapshot:
+    """
+    Raw values of one range, as returned by `values.get`, plus lazily built
+    lookup indexes. Row numbers are 1-based sheet rows; the first row of the
+    range is the header.
+    """
+
+    values: List[List[Any]]
+    marker: Optional[str]
+    fetched_at: float
+    _column_index: Optional[Dict[str, int]] = field(default=None, repr=False)
+    _key_indexes: Dict[str, Dict[str, int]] = field(default_factory=dict, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    @property
+    def header(self) -> List[str]:
+        """The header row with surrounding whitespace stripped."""
+        return [str(h).strip() for h in self.values[0]] if self.values else []
+
+    def column_index(self) -> Dict[str, int]:
+        """Maps each column name to its index (first occurrence wins)."""
+        if self._column_index is None:
+            index: Dict[str, int] = {}
+            for i, name in enumerate(self.header):
+                index.setdefault(name, i)
+            self._column_index = index
+        return self._column_index
+
+    def key_index(self, column: str) -> Dict[str, int]:
+        """
+        Maps each value of `column` to the first row number holding it.
+        Built once per snapshot and column, then kept up to date by writes.
+        """
+        index = self._key_indexes.get(column)
+        if index is not None:
+            return index
+
+        with self._lock:
+            index = self._key_indexes.get(column)
+            if index is None:
+                col = self.column_index().get(column)
+                if col is None:
+                    raise KeyError(f"Column '{column}' not found in header.")
+                index = {}
+                for row_number, row in enumerate(self.values[1:], start=2):
+                    if len(row) > col:
+                        index.setdefault(str(row[col]), row_number)
+                self._key_indexes[column] = index
+        return index
+
+    def find_row(self, column: str, value: Any) -> Optional[int]:
+        """Returns the row number whose `column` equals `value`, if any."""
+        return self.key_index(column).get(str(value))
+
+    def update_cells(self, row_number: int, cells: Dict[int, Any]) -> None:
+        """Applies written cell values (column index -> value) to a row."""
+        with self._lock:
+            row = self.values[row_number - 1]
+            for col, value in cells.items():
+                if len(row) <= col:
+                    row.extend([""] * (col + 1 - len(row)))
+                old = row[col]
+                row[col] = "" if value is None else str(value)
+                for column, index in self._key_indexes.items():
+                    if self.column_index()[column] == col:
+                        if index.get(str(old)) == row_number:
+                            del index[str(old)]
+                        index.setdefault(row[col], row_number)
+
+    def append_rows(self, start_row: int, rows: List[List[Any]]) -> None:
+        """Applies rows appended at `start_row` to the values and indexes."""
+        with self._lock:
+            # Pad any gap the server left between the table and the new rows.
+            while len(self.values) < start_row - 1:
+                self.values.append([])
+            for offset, row in enumerate(rows):
+                cells = ["" if value is None else str(value) for value in row]
+                row_number = start_row + offset
+                if len(self.values) >= row_number:
+                    self.values[row_number - 1] = cells
+                else:
+                    self.values.append(cells)
+                for column, index in self._key_indexes.items():
+                    col = self.column_index()[column]
+                    if len(cells) > col:
+                        index.setdefault(cells[col], row_number)
+
+
+class SheetSnapshotCache:
+    """Thread-safe, revision-aware cache of sheet snapshots."""
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic):
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries: Dict[Tuple[str, str], SheetSnapshot] = {}
+
+    def get(
+        self,
+        spreadsheet_id: str,
+        range_name: str,
+        fetch: Callable[[], List[List[Any]]],
+        marker: Optional[Callable[[], Optional[str]]] = None,
+        max_age: float = DEFAULT_MAX_AGE_SECONDS,
+    ) -> SheetSnapshot:
+        """
+        Returns the snapshot of `range_name`, calling `fetch` only on a miss.
+
+        Args:
+            spreadsheet_id: The spreadsheet the range belongs to.
+            range_name: The A1 range, used verbatim as part of the cache key.
+            fetch: Downloads the range and returns its raw values.
+            marker: Optional callable returning a change marker for the
+                spreadsheet. When it returns the same value as at fetch time,
+                an expired snapshot is revalidated instead of re-downloaded.
+            max_age: Seconds a snapshot is served without revalidation.
+        """
+        key = (spreadsheet_id, range_name)
+        now = self._clock()
+
+        with self._lock:
+            entry = self._entries.get(key)
+
+        if entry is not None:
+            if now - entry.fetched_at < max_age:
+                logger.debug(f"Snapshot cache hit for '{range_name}'.")
+                return entry
+
+            if marker is not None and entry.marker is not None:
+                current_marker = marker()
+                if current_marker == entry.marker:
+                    logger.debug(f"Snapshot for '{range_name}' revalidated.")
+                    entry.fetched_at = now
+                    return entry
+
+        # The marker is taken before the download so that a change racing with
+        # it is picked up by the next revalidation rather than hidden.
+        current_marker = marker() if marker is not None else None
+        values = fetch()
+        entry = SheetSnapshot(values, current_marker, self._clock())
+        with self._lock:
+            self._entries[key] = entry
+        logger.debug(f"Snapshot for '{range_name}' downloaded ({len(values)} rows).")
+        return entry
+
+    def put(
+        self,
+        spreadsheet_id: str,
+        range_name: str,
+        values: List[List[Any]],
+        marker: Optional[str] = None,
+    ) -> SheetSnapshot:
+        """Stores values downloaded outside `get`, e.g. by a batched read."""
+        entry = SheetSnapshot(values, marker, self._clock())
+        with self._lock:
+            self._entries[(spreadsheet_id, range_name)] = entry
+        return entry
+
+    def peek(
+        self,
+        spreadsheet_id: str,
+        range_name: str,
+        max_age: float = DEFAULT_MAX_AGE_SECONDS,
+    ) -> Optional[SheetSnapshot]:
+        """Returns the snapshot of `range_name` only if it is cached and fresh."""
+        with self._lock:
+            entry = self._entries.get((spreadsheet_id, range_name))
+        if entry is not None and self._clock() - entry.fetched_at < max_age:
+            return entry
+        return None
+
+    def peek_many(
+        self,
+        spreadsheet_id: str,
+        ranges: List[str],
+        max_age: float = DEFAULT_MAX_AGE_SECONDS,
+    ) -> Tuple[Dict[str, List[List[Any]]], List[str]]:
+        """
+        Splits `ranges` into the values of those with a fresh snapshot and the
+        ranges that still have to be fetched. Duplicated ranges appear once.
+        """
+        cached: Dict[str, List[List[Any]]] = {}
+        missing = []
+        for range_name in dict.fromkeys(ranges):
+            snapshot = self.peek(spreadsheet_id, range_name, max_age)
+            if snapshot is not None:
+                cached[range_name] = snapshot.values
+            else:
+                missing.append(range_name)
+        return cached, missing
+
+    def invalidate(
+        self,
+        spreadsheet_id: str,
+        sheet_name: str | None = None,
+        keep: str | None = None,
+    ) -> None:
+        """
+        Drops every snapshot of `sheet_name`, or of the whole spreadsheet.
+        The snapshot of the range `keep`, if given, is left in place.
+        """
+        with self._lock:
+            for key in list(self._entries):
+                if key[0] != spreadsheet_id or key[1] == keep:
+                    continue
+                if sheet_name is None or sheet_name_of(key[1]) == sheet_name:
+                    del self._entries[key]
+
+    def clear(self) -> None:
+        """Drops all snapshots."""
+        with self._lock:
+            self._entries.clear()
+
+
+sheet_snapshots = SheetSnapshotCache()
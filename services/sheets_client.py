@@ -1,13 +1,34 @@
-import json
 import os.path
-from typing import Any
+import threading
+from typing import Any, Iterator
 
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 
+from services.google_token_cache import get_token_cache
+from services.sheets_a1 import plan_row_writes, quote_sheet_name
+from services.sheets_cache import (
+    DEFAULT_MAX_AGE_SECONDS,
+    change_marker_of,
+    SheetSnapshot,
+    sheet_name_of,
+    sheet_snapshots,
+    start_row_of,
+    warn_without_change_marker,
+)
+from services.sheets_ids import (
+    IdAllocationError,
+    IdAllocator,
+    InMemoryCounterBackend,
+    SheetCounterBackend,
+)
+from services.sheets_mirror import SheetsMirror, get_sheets_mirror
+from services.sheets_rate_limit import get_rate_limiter
+from services.sheets_rows import ColumnProjection, RowHeader, SheetRow, compact_rows
+from services.sheets_service import sheets_registry
+from services.sheets_upsert import apply_upsert, initial_rows, plan_upsert
 from utils.config_loader import load_config
 from utils.logger import setup_logger
 
@@ -16,8 +37,74 @@ logger = setup_logger(__name__)
 
 class GoogleSheetsClient:
     def __init__(self, config_key="google_sheets"):
+        self.config_key = config_key
         self.config = load_config(config_key)
-        self.creds = self._get_credentials()
+        # Credentials are resolved once per process and shared by all clients.
+        self.creds = sheets_registry.get_credentials(config_key, self._get_credentials)
+        self._allocators: dict[str, IdAllocator] = {}
+        self._allocators_lock = threading.Lock()
+        # Optional local SQLite mirror; None unless enabled in the config.
+        self.mirror: SheetsMirror | None = get_sheets_mirror(self.config)
+        # Process-wide quota buckets and retry policy for this spreadsheet.
+        self.limiter = get_rate_limiter(self.config)
+        warn_without_change_marker(self.config)
+
+    def _service(self):
+        """Returns the pooled Sheets service for this thread."""
+        return sheets_registry.get_service(self.config_key, self.creds)
+
+    def _execute(self, request, kind: str = "read") -> dict:
+        """Executes a Sheets request within the quota, retrying rejected attempts."""
+        return self.limiter.execute(request, kind)
+
+    def _change_marker(self) -> str | None:
+        """
+        Returns a hash of the configured 'change_marker_range', used to check
+        whether cached snapshots are still current without re-downloading them.
+        """
+        marker_range = self.config.get("change_marker_range")
+        if not marker_range:
+            return None
+        return change_marker_of(self._get_values(marker_range))
+
+    def _get_values(self, range_name: str) -> list:
+        """Reads the raw values of a range directly, bypassing the cache."""
+        request = (
+            self._service()
+            .spreadsheets()
+            .values()
+            .get(spreadsheetId=self.config["spreadsheet_id"], range=range_name)
+        )
+        return self._execute(request).get("values", [])
+
+    def _append_values(self, range_name: str, values: list) -> dict:
+        """Appends raw values as new rows below the table of a range."""
+        request = (
+            self._service()
+            .spreadsheets()
+            .values()
+            .append(
+                spreadsheetId=self.config["spreadsheet_id"],
+                range=range_name,
+                valueInputOption="RAW",
+                insertDataOption="INSERT_ROWS",
+                body={"values": values},
+            )
+        )
+        return self._execute(request, "append")
+
+    def _read_snapshot(self, range_name: str) -> SheetSnapshot:
+        """Reads a range through the snapshot cache."""
+
+        return sheet_snapshots.get(
+            self.config["spreadsheet_id"],
+            range_name,
+            lambda: self._get_values(range_name),
+            marker=self._change_marker,
+            max_age=self.config.get(
+                "snapshot_max_age_seconds", DEFAULT_MAX_AGE_SECONDS
+            ),
+        )
 
     def _get_credentials(self):
         creds = None
@@ -44,6 +131,12 @@ class GoogleSheetsClient:
                 },
                 scopes=scopes,
             )
+            # Reuse the access token of an earlier run instead of refreshing.
+            token_cache = get_token_cache(self.config)
+            token_cache.ensure_valid(creds)
+            if self.config.get("token_cache", {}).get("background_refresh"):
+                token_cache.start_background_refresh(creds)
+            return creds
 
         # --- Fallback to local file for development ---
         elif os.path.exists(token_file):
@@ -71,31 +164,27 @@ class GoogleSheetsClient:
                 token.write(creds.to_json())
         return creds
 
-    def read_sheet(self, range_name: str | None = None):
+    def read_sheet(self, range_name: str | None = None, compact: bool = False):
+        """
+        Reads a whole sheet as a list of rows keyed by the header. With
+        `compact=True` the rows are `SheetRow` mappings sharing one header
+        instead of dicts, which takes a fraction of the memory on large sheets.
+        """
         if not self.creds:
             logger.error("Authentication failed. Cannot read from sheet.")
             return None
 
         try:
-            service = build("sheets", "v4", credentials=self.creds)
-            sheet = service.spreadsheets()
-
             current_range = range_name if range_name else self.config["range_name"]
-
-            result = (
-                sheet.values()
-                .get(
-                    spreadsheetId=self.config["spreadsheet_id"],
-                    range=current_range,
-                )
-                .execute()
-            )
-            values = result.get("values", [])
+            values = self._read_snapshot(current_range).values
 
             if not values:
                 logger.warning("No data found in the sheet.")
                 return []
 
+            if compact:
+                return compact_rows(values)
+
             # Assume the first row is the header, strip whitespace from each header
             header = [h.strip() for h in values[0]]
             data = [dict(zip(header, row)) for row in values[1:]]
@@ -105,6 +194,346 @@ class GoogleSheetsClient:
             logger.error(f"An API error occurred: {err}")
             return None
 
+    def read_sheet_iter(
+        self,
+        range_name: str | None = None,
+        window_rows: int | None = None,
+        compact: bool = False,
+    ) -> Iterator[dict | SheetRow]:
+        """
+        Yields the rows of a sheet one by one, as dicts keyed by the header, or
+        as `SheetRow` mappings sharing one header with `compact=True`.
+
+        Rows are fetched in windows of `window_rows` rows (one `values.get`
+        each), so memory stays bounded and callers that stop iterating early
+        never download the rest of the sheet. A fresh cached snapshot of the
+        sheet is iterated instead when one is available.
+
+        Raises:
+            HttpError: If a window cannot be read.
+        """
+        if not self.creds:
+            logger.error("Authentication failed. Cannot read from sheet.")
+            return
+
+        current_range = range_name if range_name else self.config["range_name"]
+        sheet_name = sheet_name_of(current_range)
+        quoted_name = quote_sheet_name(sheet_name)
+        window_rows = window_rows or self.config.get("read_window_rows", 2000)
+
+        snapshot = self._fresh_snapshot(sheet_name)
+        try:
+            if snapshot is not None:
+                values = snapshot.values
+                header = [h.strip() for h in values[0]] if values else []
+                windows = iter([values[1:]])
+            else:
+                header_values = self._get_values(f"{quoted_name}!1:1")
+                header = [h.strip() for h in header_values[0]] if header_values else []
+                windows = self._iter_windows(sheet_name, quoted_name, window_rows)
+
+            if not header:
+                logger.warning("No data found in the sheet.")
+                return
+
+            if compact:
+                row_header = RowHeader(header)
+                for window in windows:
+                    for row in window:
+                        yield SheetRow(row_header, tuple(row))
+                return
+
+            for window in windows:
+                for row in window:
+                    yield dict(zip(header, row))
+
+        except HttpError as err:
+            logger.error(f"An API error occurred while streaming the sheet: {err}")
+            raise
+
+    def _row_count(self, sheet_name: str) -> int:
+        """Returns the number of rows of a sheet's grid, blank rows included."""
+        request = (
+            self._service()
+            .spreadsheets()
+            .get(
+                spreadsheetId=self.config["spreadsheet_id"],
+                ranges=[quote_sheet_name(sheet_name)],
+                fields="sheets.properties.gridProperties.rowCount",
+            )
+        )
+        sheets = self._execute(request).get("sheets", [])
+        return sheets[0]["properties"]["gridProperties"]["rowCount"] if sheets else 0
+
+    def _iter_windows(
+        self, sheet_name: str, quoted_name: str, window_rows: int
+    ) -> Iterator[list]:
+        """Yields the data rows of a sheet in windows of `window_rows` rows."""
+        start = 2
+        row_count = None
+        while True:
+            end = start + window_rows - 1
+            rows = self._get_values(f"{quoted_name}!{start}:{end}")
+            if rows:
+                yield rows
+            if len(rows) < window_rows:
+                # values.get drops trailing empty rows, so a short window may
+                # end in a blank gap rather than at the end of the sheet.
+                if row_count is None:
+                    row_count = self._row_count(sheet_name)
+                if end >= row_count:
+                    return
+            start = end + 1
+
+    def _fresh_snapshot(self, sheet_name: str) -> SheetSnapshot | None:
+        """Returns the cached whole-sheet snapshot if it is still fresh."""
+        return sheet_snapshots.peek(
+            self.config["spreadsheet_id"],
+            sheet_name,
+            max_age=self.config.get(
+                "snapshot_max_age_seconds", DEFAULT_MAX_AGE_SECONDS
+            ),
+        )
+
+    def _read_header(self, sheet_name: str) -> list[str]:
+        """Returns the header row of a sheet, reading only row 1 on a miss."""
+        snapshot = self._fresh_snapshot(sheet_name)
+        if snapshot is None:
+            snapshot = self._read_snapshot(f"{quote_sheet_name(sheet_name)}!1:1")
+        return snapshot.header
+
+    def read_columns_iter(
+        self,
+        columns: list[str],
+        range_name: str | None = None,
+        window_rows: int | None = None,
+        compact: bool = False,
+    ) -> Iterator[dict | SheetRow]:
+        """
+        Yields a narrow projection of every row of a sheet.
+
+        Only the named columns are downloaded: each window of `window_rows` rows
+        is one `values.batchGet` of the column ranges (adjacent columns share a
+        range). Every yielded row holds the projected columns plus '_row', the
+        sheet row number, which can be passed to `read_row` to fetch the rest.
+        Rows are dicts, or `SheetRow` mappings with `compact=True`.
+
+        Raises:
+            HttpError: If a window cannot be read.
+        """
+        if not self.creds:
+            logger.error("Authentication failed. Cannot read from sheet.")
+            return
+
+        current_range = range_name if range_name else self.config["range_name"]
+        sheet_name = sheet_name_of(current_range)
+        quoted_name = quote_sheet_name(sheet_name)
+        window_rows = window_rows or self.config.get("read_window_rows", 2000)
+
+        try:
+            snapshot = self._fresh_snapshot(sheet_name)
+            header = snapshot.header if snapshot else self._read_header(sheet_name)
+            projection = ColumnProjection(header, columns, compact)
+            if projection.missing:
+                logger.warning(
+                    f"Columns {projection.missing} not found in header: {header}"
+                )
+            if not projection.projected:
+                return
+
+            if snapshot is not None:
+                yield from projection.snapshot_rows(snapshot.values)
+                return
+
+            start = 2
+            row_count = None
+            while True:
+                end = start + window_rows - 1
+                value_ranges = self._batch_get(
+                    projection.window_ranges(quoted_name, start, end),
+                    majorDimension="COLUMNS",
+                )
+                rows = projection.window_rows(value_ranges, start)
+                yield from rows
+
+                if len(rows) < window_rows:
+                    # A short window may end in a blank gap, not the sheet.
+                    if row_count is None:
+                        row_count = self._row_count(sheet_name)
+                    if end >= row_count:
+                        return
+                start = end + 1
+
+        except HttpError as err:
+            logger.error(f"An API error occurred while reading columns: {err}")
+            raise
+
+    def read_row(self, row_number: int, range_name: str | None = None) -> dict | None:
+        """Returns a single sheet row as a dict keyed by the header."""
+        if not self.creds:
+            logger.error("Authentication failed. Cannot read from sheet.")
+            return None
+
+        current_range = range_name if range_name else self.config["range_name"]
+        sheet_name = sheet_name_of(current_range)
+        quoted_name = quote_sheet_name(sheet_name)
+        try:
+            snapshot = self._fresh_snapshot(sheet_name)
+            if snapshot is not None:
+                header = snapshot.header
+                row = (
+                    snapshot.values[row_number - 1]
+                    if row_number <= len(snapshot.values)
+                    else []
+                )
+            else:
+                # Header and row come back in one request unless the header is cached.
+                header_range = f"{quoted_name}!1:1"
+                row_range = f"{quoted_name}!{row_number}:{row_number}"
+                ranges = self._read_ranges([header_range, row_range])
+                header_values = ranges[header_range]
+                header = [h.strip() for h in header_values[0]] if header_values else []
+                row = ranges[row_range][0] if ranges[row_range] else []
+            return dict(zip(header, row)) if row else None
+
+        except HttpError as err:
+            logger.error(f"An API error occurred: {err}")
+            return None
+
+    def read_ranges(self, ranges: list[str]) -> dict[str, list] | None:
+        """
+        Reads several ranges, possibly from different sheets, in one round-trip.
+
+        Ranges with a fresh cached snapshot are served from memory and the rest
+        are fetched with a single `values.batchGet`. Fetched ranges are stored
+        in the snapshot cache, so later reads and upserts of the same ranges
+        (e.g. whole sheets such as 'Topics' and 'Generated') reuse them.
+
+        Returns:
+            A dict mapping each requested range to its raw row lists (the first
+            row of a whole-sheet range is its header), or None on API errors.
+        """
+        if not self.creds:
+            logger.error("Authentication failed. Cannot read from sheet.")
+            return None
+
+        try:
+            return self._read_ranges(ranges)
+        except HttpError as err:
+            logger.error(f"An API error occurred: {err}")
+            return None
+
+    def _read_ranges(self, ranges: list[str]) -> dict[str, list]:
+        spreadsheet_id = self.config["spreadsheet_id"]
+        max_age = self.config.get("snapshot_max_age_seconds", DEFAULT_MAX_AGE_SECONDS)
+
+        results, missing = sheet_snapshots.peek_many(spreadsheet_id, ranges, max_age)
+
+        if missing:
+            marker = self._change_marker()
+            value_ranges = self._batch_get(missing)
+            for range_name, value_range in zip(missing, value_ranges):
+                values = value_range.get("values", [])
+                sheet_snapshots.put(spreadsheet_id, range_name, values, marker)
+                results[range_name] = values
+            logger.debug(f"Fetched {len(missing)} ranges in one batchGet: {missing}")
+
+        return results
+
+    def sync_mirror(self, sheet_names: list[str]) -> dict[str, dict] | None:
+        """
+        Downloads the given sheets in one request and applies the changed rows
+        to the local mirror. Returns per-sheet sync stats, or None on failure.
+        """
+        if not self.mirror:
+            logger.error("The sheets mirror is not enabled in the configuration.")
+            return None
+
+        range_values = self.read_ranges(sheet_names)
+        if range_values is None:
+            return None
+        return {
+            sheet_name: self.mirror.sync(sheet_name, range_values[sheet_name])
+            for sheet_name in sheet_names
+        }
+
+    def _batch_get(self, ranges: list[str], **kwargs) -> list[dict]:
+        """Reads several ranges in one `values.batchGet` call."""
+        request = (
+            self._service()
+            .spreadsheets()
+            .values()
+            .batchGet(
+                spreadsheetId=self.config["spreadsheet_id"], ranges=ranges, **kwargs
+            )
+        )
+        return self._execute(request).get("valueRanges", [])
+
+    def allocate_ids(
+        self, range_name: str, count: int, id_key: str = "id"
+    ) -> list[int] | None:
+        """
+        Reserves `count` consecutive ids for new rows of a sheet.
+
+        When the sheet has a claim sheet under 'id_counters' in the config,
+        ids are claimed from it with a single append, whatever their number.
+        Otherwise ids follow the highest numeric `id_key` of the sheet snapshot
+        and the ids already handed out by this process.
+        """
+        if not self.creds:
+            logger.error("Authentication failed. Cannot allocate ids.")
+            return None
+
+        sheet_name = sheet_name_of(range_name)
+        try:
+            return self._id_allocator(sheet_name, id_key).allocate(count)
+        except HttpError as err:
+            logger.error(f"An API error occurred while allocating ids: {err}")
+            return None
+        except IdAllocationError as err:
+            logger.error(str(err))
+            return None
+
+    def has_id_counter(self, sheet_name: str) -> bool:
+        """Whether new ids of a sheet are claimed from a claim sheet."""
+        return bool((self.config.get("id_counters") or {}).get(sheet_name))
+
+    def _id_allocator(self, sheet_name: str, id_key: str) -> IdAllocator:
+        """Returns the id allocator for a sheet, creating it on first use."""
+
+        def seed() -> int:
+            # Read from the sheet itself: the mirror may lag behind the sheet
+            # and only knows the rows synced on this host.
+            snapshot = self._read_snapshot(sheet_name)
+            if id_key not in snapshot.column_index():
+                return 0
+            numeric_ids = [
+                int(value) for value in snapshot.key_index(id_key) if value.isdigit()
+            ]
+            return max(numeric_ids, default=0)
+
+        claim_sheet = (self.config.get("id_counters") or {}).get(sheet_name)
+        with self._allocators_lock:
+            allocator = self._allocators.get(sheet_name)
+            if allocator is None:
+                if claim_sheet:
+                    backend = SheetCounterBackend(
+                        self._get_values, self._append_values, claim_sheet
+                    )
+                else:
+                    logger.warning(
+                        f"No claim sheet is configured for '{sheet_name}' under "
+                        "'id_counters'; new ids are derived from the highest id "
+                        "in the sheet, which is re-read on every claim and not "
+                        "safe with concurrent writers on other hosts."
+                    )
+                    # Kept between calls, so concurrent saves of this process
+                    # never get the ids of rows the sheet does not show yet.
+                    backend = InMemoryCounterBackend()
+                allocator = IdAllocator(backend, seed=seed)
+                self._allocators[sheet_name] = allocator
+            return allocator
+
     def upsert_row(
         self,
         filter_key: str,
@@ -116,98 +545,162 @@ class GoogleSheetsClient:
         Updates a row if a matching filter_value is found in the filter_key column.
         Otherwise, appends a new row with the provided data.
         """
+        return self.upsert_rows(
+            filter_key, [{**row_data, filter_key: filter_value}], range_name=range_name
+        )
+
+    def upsert_rows(
+        self,
+        filter_key: str,
+        rows: list[dict],
+        range_name: str | None = None,
+    ):
+        """
+        Upserts several rows with a single read of the sheet.
+
+        Every dict in `rows` must contain `filter_key`. Rows whose key is found in
+        the sheet are updated through one `values.batchUpdate`; the remaining rows
+        are added through one `values.append`.
+
+        Returns a summary with the updated row numbers and the number of inserted
+        rows, or None if the sheet could not be read or written.
+        """
         if not self.creds:
             logger.error("Authentication failed. Cannot upsert row.")
             return None
 
-        try:
-            service = build("sheets", "v4", credentials=self.creds)
-            sheet_values = service.spreadsheets().values()
+        if any(filter_key not in row for row in rows):
+            raise ValueError(f"Every row must contain the filter key '{filter_key}'.")
 
-            current_range = range_name if range_name else self.config["range_name"]
-            sheet_name = current_range.split("!")[0]
+        current_range = range_name if range_name else self.config["range_name"]
+        sheet_name = sheet_name_of(current_range)
+        # Set while writes are in flight; the cached snapshots of the sheet are
+        # dropped if they cannot be brought in step with what was written.
+        writing = False
 
-            # Read the sheet to find the row and get headers
-            read_result = sheet_values.get(
-                spreadsheetId=self.config["spreadsheet_id"],
-                range=sheet_name,  # Read the whole sheet
-            ).execute()
-            values = read_result.get("values", [])
+        try:
+            sheet_values = self._service().spreadsheets().values()
 
-            if not values:
-                logger.warning("Sheet is empty. Will append a new row.")
-                header = list(row_data.keys())
-                new_row_values = list(row_data.values())
-                body = {"values": [header, new_row_values]}
-                return sheet_values.update(
-                    spreadsheetId=self.config["spreadsheet_id"],
-                    range=f"{sheet_name}!A1",
-                    valueInputOption="USER_ENTERED",
-                    body=body,
-                ).execute()
+            # Read the whole sheet to find the rows and get headers
+            snapshot = self._read_snapshot(sheet_name)
+
+            if not snapshot.values:
+                logger.warning("Sheet is empty. Will write the header and new rows.")
+                values = initial_rows(rows)
+                writing = True
+                result = self._execute(
+                    sheet_values.update(
+                        spreadsheetId=self.config["spreadsheet_id"],
+                        range=f"{quote_sheet_name(sheet_name)}!A1",
+                        valueInputOption="USER_ENTERED",
+                        body={"values": values},
+                    ),
+                    "write",
+                )
+                return {
+                    "status": "success",
+                    "updated_rows": [],
+                    "inserted_rows": len(values) - 1,
+                    "responses": [result],
+                }
 
-            header = [h.strip() for h in values[0]]
             try:
-                filter_col_index = header.index(filter_key)
-            except ValueError:
-                logger.error(f"Filter key '{filter_key}' not found in header: {header}")
+                plan = plan_upsert(snapshot, filter_key, rows)
+            except KeyError:
+                logger.error(
+                    f"Filter key '{filter_key}' not found in header: {snapshot.header}"
+                )
                 return None
 
-            row_number_to_update = -1
-            for i, row in enumerate(values[1:], start=2):
-                if len(row) > filter_col_index and str(row[filter_col_index]) == str(
-                    filter_value
-                ):
-                    row_number_to_update = i
-                    break
-
-            if row_number_to_update != -1:
-                # --- UPDATE PATH ---
-                data_to_update = []
-                for col_name, value in row_data.items():
-                    if col_name in header:
-                        col_index = header.index(col_name)
-                        col_letter = chr(ord("A") + col_index)
-                        range_spec = f"{sheet_name}!{col_letter}{row_number_to_update}"
-                        data_to_update.append(
-                            {"range": range_spec, "values": [[value]]}
-                        )
-
-                if not data_to_update:
-                    logger.warning("No valid columns to update found in sheet header.")
-                    return {"status": "no_op", "reason": "No valid columns to update"}
+            if plan.is_empty:
+                logger.warning("No valid columns to update found in sheet header.")
+                return {"status": "no_op", "reason": "No valid columns to update"}
 
+            # Adjacent cells of a row are written as one contiguous range.
+            data_to_update = plan_row_writes(sheet_name, plan.cell_updates)
+            responses = []
+            writing = True
+            if data_to_update:
                 body = {"valueInputOption": "USER_ENTERED", "data": data_to_update}
-                result = sheet_values.batchUpdate(
-                    spreadsheetId=self.config["spreadsheet_id"], body=body
-                ).execute()
+                responses.append(
+                    self._execute(
+                        sheet_values.batchUpdate(
+                            spreadsheetId=self.config["spreadsheet_id"], body=body
+                        ),
+                        "write",
+                    )
+                )
+                cells = sum(len(row_cells) for row_cells in plan.cell_updates.values())
                 logger.info(
-                    f"Successfully updated {len(data_to_update)} cells in row {row_number_to_update}."
+                    f"Successfully updated {cells} cells in rows {plan.updated_rows} "
+                    f"using {len(data_to_update)} ranges."
+                )
+
+            appended_at = None
+            if plan.new_rows:
+                append_result = self._execute(
+                    sheet_values.append(
+                        spreadsheetId=self.config["spreadsheet_id"],
+                        range=quote_sheet_name(sheet_name),
+                        valueInputOption="USER_ENTERED",
+                        insertDataOption="INSERT_ROWS",
+                        body={"values": list(plan.new_rows.values())},
+                    ),
+                    "append",
+                )
+                responses.append(append_result)
+                appended_at = start_row_of(
+                    append_result.get("updates", {}).get("updatedRange", "")
                 )
-                return result
-            else:
-                # --- INSERT PATH ---
-                new_row: list[Any] = [None] * len(header)
-                # Place filter value in its column
-                new_row[filter_col_index] = filter_value
-                for col_name, value in row_data.items():
-                    if col_name in header:
-                        col_index = header.index(col_name)
-                        new_row[col_index] = value
-
-                body = {"values": [new_row]}
-                result = sheet_values.append(
-                    spreadsheetId=self.config["spreadsheet_id"],
-                    range=sheet_name,
-                    valueInputOption="USER_ENTERED",
-                    insertDataOption="INSERT_ROWS",
-                    body=body,
-                ).execute()
                 logger.info(
-                    f"Appended a new row as '{filter_key}={filter_value}' was not found."
+                    f"Appended {len(plan.new_rows)} new rows for '{filter_key}' "
+                    f"values {list(plan.new_rows)} that were not found."
+                )
+
+            # Keep the cached snapshot and its indexes in step with the writes.
+            written_rows = apply_upsert(snapshot, plan, appended_at)
+            if self.mirror:
+                self.mirror.apply_rows(
+                    sheet_name,
+                    snapshot.header,
+                    {r: snapshot.values[r - 1] for r in written_rows},
+                )
+            if not plan.new_rows or appended_at is not None:
+                sheet_snapshots.invalidate(
+                    self.config["spreadsheet_id"], sheet_name, keep=sheet_name
                 )
-                return result
+                writing = False
+
+            return {
+                "status": "success",
+                "updated_rows": plan.updated_rows,
+                "inserted_rows": len(plan.new_rows),
+                "responses": responses,
+            }
 
         except HttpError as err:
             logger.error(f"An API error occurred during upsert: {err}")
             return None
+
+        finally:
+            if writing:
+                sheet_snapshots.invalidate(self.config["spreadsheet_id"], sheet_name)
+
+
+_clients: dict[str, GoogleSheetsClient] = {}
+_clients_lock = threading.Lock()
+
+
+def get_sheets_client(config_key: str = "google_sheets") -> GoogleSheetsClient:
+    """
+    Returns the process-wide GoogleSheetsClient for `config_key`.
+
+    Chains should use this instead of constructing a new client per step, so a
+    pipeline run pays for configuration loading and authentication only once.
+    """
+    with _clients_lock:
+        client = _clients.get(config_key)
+        if client is None or not client.creds:
+            client = GoogleSheetsClient(config_key)
+            _clients[config_key] = client
+        return client
@@ -0,0 +1,139 @@
+"""
+Sheet ID Allocator
+
+Allocates blocks of row ids from a counter instead of scanning a sheet for its
+highest id. The counter is a dedicated claim sheet of the spreadsheet, or
+lives in memory per process for sheets without one.
+
+Google Sheets has no compare-and-set, but it does serialise appends: every
+`values.append` lands below the rows of all appends before it. The sheet
+backend claims a block by appending one row per id and derives the ids from
+the row numbers it was given (the `updatedRange` of the response), offset by
+a base id stored in the first row of the claim sheet. Concurrent allocators
+can never be given the same rows, so their blocks never overlap. A block of
+any size costs one request, plus one read of the base per process.
+"""
+
+import threading
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Protocol
+
+from services.sheets_a1 import quote_sheet_name
+from services.sheets_cache import start_row_of
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+BASE_LABEL = "base"
+
+
+class IdAllocationError(RuntimeError):
+    """Raised when a claim does not report the rows it was given."""
+
+
+class CounterBackend(Protocol):
+    """Storage for a counter that hands out blocks of ids atomically."""
+
+    def claim(self, count: int, seed: Callable[[], int]) -> int:
+        """
+        Reserves `count` consecutive ids and returns the first one. `seed`
+        returns the highest id already in use, for a counter never used before.
+        """
+        ...
+
+
+class InMemoryCounterBackend:
+    """
+    Process-local counter backend, used when a sheet has no claim sheet. The
+    highest id in use is read again on every claim, so ids written by other
+    processes are skipped, and the counter never goes back below the ids it
+    already handed out in this process.
+    """
+
+    def __init__(self, value: Optional[int] = None):
+        self._value = value
+        self._lock = threading.Lock()
+
+    def claim(self, count: int, seed: Callable[[], int]) -> int:
+        with self._lock:
+            self._value = max(self._value or 0, seed())
+            first = self._value + 1
+            self._value += count
+            return first
+
+
+class SheetCounterBackend:
+    """
+    Counter kept in a claim sheet of the spreadsheet, e.g. 'GeneratedIds'.
+    Its first row holds the base id ('base', <highest id when it was set up>);
+    every following row is one claimed id: row `r` is id `base + r - 1`.
+    """
+
+    def __init__(
+        self,
+        get_values: Callable[[str], List[List[Any]]],
+        append_values: Callable[[str, List[List[Any]]], Dict[str, Any]],
+        claim_sheet: str,
+    ):
+        self._get_values = get_values
+        self._append_values = append_values
+        self._claim_range = f"{quote_sheet_name(claim_sheet)}!A:B"
+        self._base_range = f"{quote_sheet_name(claim_sheet)}!A1:B1"
+        self._base: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def _read_base(self) -> Optional[int]:
+        values = self._get_values(self._base_range)
+        row = values[0] if values else []
+        raw_value = str(row[1]).strip() if len(row) > 1 else ""
+        return int(raw_value) if raw_value.isdigit() else None
+
+    def _get_base(self, seed: Callable[[], int]) -> int:
+        with self._lock:
+            if self._base is None:
+                base = self._read_base()
+                if base is None:
+                    # Racing set-ups append several base rows; the one that
+                    # landed in row 1 wins and the others are unused claims.
+                    self._append_values(self._claim_range, [[BASE_LABEL, seed()]])
+                    base = self._read_base()
+                    if base is None:
+                        raise IdAllocationError(
+                            f"Could not set up the base id in {self._base_range}."
+                        )
+                    logger.info(f"Set up id claims in {self._claim_range} at {base}.")
+                self._base = base
+            return self._base
+
+    def claim(self, count: int, seed: Callable[[], int]) -> int:
+        base = self._get_base(seed)
+        claimed_at = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        result = self._append_values(self._claim_range, [[claimed_at]] * count)
+        updates = result.get("updates", {})
+        first_row = start_row_of(updates.get("updatedRange", ""))
+        if first_row is None or updates.get("updatedRows") != count:
+            raise IdAllocationError(
+                f"Claim of {count} ids in {self._claim_range} returned {updates}."
+            )
+        return base + first_row - 1
+
+
+class IdAllocator:
+    """Hands out contiguous blocks of integer ids from a counter backend."""
+
+    def __init__(self, backend: CounterBackend, seed: Callable[[], int] = lambda: 0):
+        """
+        Args:
+            backend: Where the allocated ids are claimed.
+            seed: Returns the highest id already in use. The sheet backend only
+                calls it to set up a new claim sheet.
+        """
+        self._backend = backend
+        self._seed = seed
+
+    def allocate(self, count: int = 1) -> List[int]:
+        """Reserves `count` consecutive ids and returns them."""
+        if count < 1:
+            raise ValueError(f"Cannot allocate {count} ids.")
+        first = self._backend.claim(count, self._seed)
+        return list(range(first, first + count))
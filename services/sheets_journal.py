@@ -0,0 +1,265 @@
+"""
+Sheets Write-Behind Journal
+
+Takes sheet status writes off the critical path of the pipelines. Updates are
+appended to a durable local journal (one JSON line per update), coalesced per
+row when they are read back, and flushed in the background with one
+`upsert_rows` call per sheet and key column, i.e. one batchUpdate plus one
+append.
+
+The journal file is the only record of what is pending, shared by every
+process of the host: appends and rewrites hold an exclusive `flock` on it, and
+flushes hold a second one for their whole duration, so two processes never
+write the same rows. A flush reads every entry of the file, wherever it was
+enqueued, and rewrites the file to hold only the rows it could not write plus
+the entries appended meanwhile. Entries left by a crashed process are written
+by the next flush of any process.
+"""
+
+import atexit
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from services.sheets_client import get_sheets_client
+from utils.config_loader import load_config
+from utils.file_utils import exclusive_lock
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+DEFAULT_JOURNAL_PATH = "data/sheets_journal.jsonl"
+DEFAULT_FLUSH_INTERVAL_SECONDS = 10
+
+# Pending rows per (sheet, filter key), keyed by filter value.
+PendingRows = Dict[Tuple[str, str], Dict[str, dict]]
+
+# Called with the rows of a sheet once a flush has written them.
+FlushListener = Callable[[List[dict]], None]
+
+
+def _merge(pending: PendingRows, sheet: str, filter_key: str, row: dict) -> None:
+    rows = pending.setdefault((sheet, filter_key), {})
+    filter_value = str(row[filter_key])
+    rows[filter_value] = {**rows.get(filter_value, {}), **row}
+
+
+def _entry_lines(pending: PendingRows) -> str:
+    return "".join(
+        json.dumps({"sheet": sheet, "filter_key": filter_key, "row": row}) + "\n"
+        for (sheet, filter_key), rows in pending.items()
+        for row in rows.values()
+    )
+
+
+class SheetsWriteJournal:
+    """Durable, coalescing write-behind queue for sheet upserts."""
+
+    def __init__(
+        self,
+        path: str = DEFAULT_JOURNAL_PATH,
+        flush_interval_seconds: float = DEFAULT_FLUSH_INTERVAL_SECONDS,
+        config_key: str = "google_sheets",
+    ):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.flush_interval_seconds = flush_interval_seconds
+        self.config_key = config_key
+        # Guards the journal file; held briefly by appends and rewrites.
+        self._lock = threading.Lock()
+        self._lock_path = self.path.with_name(self.path.name + ".lock")
+        # Serialises flushes, so rows are never written by two flushes at once.
+        self._flush_lock = threading.Lock()
+        self._flush_lock_path = self.path.with_name(self.path.name + ".flush.lock")
+        self._listeners: Dict[str, List[FlushListener]] = {}
+        self._stop = threading.Event()
+        self._timer: Optional[threading.Thread] = None
+        pending = self.pending_count()
+        if pending:
+            logger.info(f"Found {pending} unflushed sheet writes in {self.path}.")
+
+    def _read(self) -> Tuple[PendingRows, int]:
+        """
+        Reads the pending rows and the size of the journal. Caller holds the
+        journal lock.
+        """
+        pending: PendingRows = {}
+        try:
+            with self.path.open("rb") as journal:
+                content = journal.read()
+        except FileNotFoundError:
+            return pending, 0
+        for line in content.decode("utf-8").splitlines():
+            if not line.strip():
+                continue
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                # A torn last line from a crash mid-write.
+                logger.warning(f"Skipping unreadable journal line: {line!r}")
+                continue
+            _merge(pending, entry["sheet"], entry["filter_key"], entry["row"])
+        return pending, len(content)
+
+    def enqueue(self, sheet: str, filter_key: str, rows: List[dict]) -> None:
+        """
+        Records rows to upsert into `sheet` by `filter_key`. Later updates of the
+        same row are merged into the earlier ones.
+        """
+        if any(filter_key not in row for row in rows):
+            raise ValueError(f"Every row must contain the filter key '{filter_key}'.")
+
+        lines = "".join(
+            json.dumps({"sheet": sheet, "filter_key": filter_key, "row": row}) + "\n"
+            for row in rows
+        )
+        with exclusive_lock(self._lock_path, self._lock):
+            with self.path.open("a", encoding="utf-8") as journal:
+                journal.write(lines)
+                journal.flush()
+                os.fsync(journal.fileno())
+        self._ensure_timer()
+
+    def add_flush_listener(self, sheet: str, listener: FlushListener) -> None:
+        """
+        Calls `listener` with the rows of `sheet` every time a flush of this
+        process has written them, e.g. to act once a status is in the sheet.
+        """
+        listeners = self._listeners.setdefault(sheet, [])
+        if listener not in listeners:
+            listeners.append(listener)
+
+    def pending_count(self) -> int:
+        with exclusive_lock(self._lock_path, self._lock):
+            pending, _ = self._read()
+        return sum(len(rows) for rows in pending.values())
+
+    def _rewrite(self, failed: PendingRows, flushed_size: int) -> None:
+        """
+        Replaces the first `flushed_size` bytes of the journal, which a flush
+        has just handled, with the rows it failed to write. Caller holds the
+        journal lock.
+        """
+        with self.path.open("rb") as journal:
+            journal.seek(flushed_size)
+            appended = journal.read()
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        with tmp_path.open("wb") as journal:
+            # Failed rows go first, so later updates of them still win.
+            journal.write(_entry_lines(failed).encode("utf-8"))
+            journal.write(appended)
+            journal.flush()
+            os.fsync(journal.fileno())
+        os.replace(tmp_path, self.path)
+
+    def _notify(self, sheet: str, rows: List[dict]) -> None:
+        for listener in self._listeners.get(sheet, []):
+            try:
+                listener(rows)
+            except Exception as e:
+                logger.error(f"Flush listener of '{sheet}' failed: {e}")
+
+    def flush(self) -> bool:
+        """
+        Writes all pending rows of the journal to the sheets.
+
+        Returns:
+            True if everything was written, False if some rows stay pending.
+        """
+        with exclusive_lock(self._flush_lock_path, self._flush_lock):
+            with exclusive_lock(self._lock_path, self._lock):
+                batch, flushed_size = self._read()
+            if not batch:
+                return True
+
+            failed: PendingRows = {}
+            for (sheet, filter_key), rows in batch.items():
+                try:
+                    client = get_sheets_client(self.config_key)
+                    result = client.upsert_rows(
+                        filter_key, list(rows.values()), range_name=sheet
+                    )
+                except Exception as e:
+                    # A raised error must not drop the batch: the rewrite
+                    # below would erase it from the journal.
+                    logger.error(f"Error flushing rows to '{sheet}': {e}")
+                    result = None
+                if result is None:
+                    logger.error(
+                        f"Flushing {len(rows)} rows to '{sheet}' failed; "
+                        "they stay in the journal."
+                    )
+                    failed[(sheet, filter_key)] = rows
+                else:
+                    logger.info(f"Flushed {len(rows)} journaled rows to '{sheet}'.")
+                    self._notify(sheet, list(rows.values()))
+
+            with exclusive_lock(self._lock_path, self._lock):
+                self._rewrite(failed, flushed_size)
+            return not failed
+
+    def _ensure_timer(self) -> None:
+        if self.flush_interval_seconds <= 0 or self._timer is not None:
+            return
+        self._timer = threading.Thread(
+            target=self._run_timer, name="sheets-journal-flush", daemon=True
+        )
+        self._timer.start()
+
+    def _run_timer(self) -> None:
+        while not self._stop.wait(self.flush_interval_seconds):
+            if not self.pending_count():
+                continue
+            try:
+                self.flush()
+            except Exception as e:
+                # Keep the timer alive; the rows stay pending for the next tick.
+                logger.error(f"Background journal flush failed: {e}")
+
+    def close(self) -> bool:
+        """Stops the background flush and writes whatever is still pending."""
+        self._stop.set()
+        if self._timer is not None:
+            self._timer.join()
+        return self.flush()
+
+
+_journal: Optional[SheetsWriteJournal] = None
+_journal_lock = threading.Lock()
+
+
+def get_write_journal(
+    config_key: str = "google_sheets",
+) -> Optional[SheetsWriteJournal]:
+    """
+    Returns the process-wide journal configured under 'write_behind' in the
+    Sheets config, or None when write-behind is disabled. The journal is
+    flushed when the process exits.
+    """
+    global _journal
+    config = load_config(config_key).get("write_behind") or {}
+    if not config.get("enabled"):
+        return None
+    with _journal_lock:
+        if _journal is None:
+            _journal = SheetsWriteJournal(
+                path=config.get("journal_path", DEFAULT_JOURNAL_PATH),
+                flush_interval_seconds=config.get(
+                    "flush_interval_seconds", DEFAULT_FLUSH_INTERVAL_SECONDS
+                ),
+                config_key=config_key,
+            )
+            atexit.register(_journal.close)
+            # Write entries left by a crashed run before new ids are allocated
+            # on top of rows that only exist in the journal.
+            if _journal.pending_count():
+                _journal.flush()
+        return _journal
+
+
+def flush_write_journal(config_key: str = "google_sheets") -> bool:
+    """Flushes the journal at the end of a pipeline run, if write-behind is on."""
+    journal = get_write_journal(config_key)
+    return journal.flush() if journal else True
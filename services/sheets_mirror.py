@@ -0,0 +1,206 @@
+"""
+Sheets Mirror
+
+Optional local SQLite mirror of the Google Sheets used by the pipelines
+(`Topics`, `Generated`). A sync job downloads the sheets and applies only the
+rows whose content hash changed; the client writes through to the mirror after
+every successful upsert. Selection and max-id queries can then run as indexed
+local queries, and keep working when the Sheets quota is exhausted.
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Columns copied out of the row JSON so they can be indexed. They are stored
+# trimmed, with '' for missing values, so filters can use the indexes directly.
+INDEXED_COLUMNS = ["id", "id_topic", "type", "published", "created"]
+
+_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS rows (
+    sheet TEXT NOT NULL,
+    row_number INTEGER NOT NULL,
+    row_hash TEXT NOT NULL,
+    data TEXT NOT NULL,
+    {", ".join(f"{col} TEXT" for col in INDEXED_COLUMNS)},
+    PRIMARY KEY (sheet, row_number)
+);
+CREATE INDEX IF NOT EXISTS idx_rows_id ON rows (sheet, id);
+CREATE INDEX IF NOT EXISTS idx_rows_id_topic ON rows (sheet, id_topic);
+CREATE INDEX IF NOT EXISTS idx_rows_type ON rows (sheet, type);
+CREATE INDEX IF NOT EXISTS idx_rows_published ON rows (sheet, published);
+CREATE INDEX IF NOT EXISTS idx_rows_created ON rows (sheet, created);
+"""
+
+
+def _row_hash(header: List[str], row: List[Any]) -> str:
+    payload = json.dumps([header, row], ensure_ascii=False)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+class SheetsMirror:
+    """SQLite copy of sheet rows, keyed by sheet name and row number."""
+
+    def __init__(self, path: str):
+        self.path = path
+        if path != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.executescript(_SCHEMA)
+
+    def _record(
+        self, sheet: str, header: List[str], row_number: int, row: List[Any]
+    ) -> tuple:
+        data = dict(zip(header, row))
+        return (
+            sheet,
+            row_number,
+            _row_hash(header, row),
+            json.dumps(data, ensure_ascii=False),
+            *(str(data.get(col) or "").strip() for col in INDEXED_COLUMNS),
+        )
+
+    def _upsert(self, records: List[tuple]) -> None:
+        columns = ["sheet", "row_number", "row_hash", "data", *INDEXED_COLUMNS]
+        placeholders = ", ".join("?" for _ in columns)
+        self._conn.executemany(
+            f"INSERT OR REPLACE INTO rows ({', '.join(columns)}) VALUES ({placeholders})",
+            records,
+        )
+
+    def sync(self, sheet: str, values: List[List[Any]]) -> Dict[str, int]:
+        """
+        Brings the mirror of `sheet` in line with its raw values (header first),
+        writing only rows whose hash changed and deleting rows that are gone.
+        """
+        header = [str(h).strip() for h in values[0]] if values else []
+        rows = values[1:]
+
+        with self._lock, self._conn:
+            known = dict(
+                self._conn.execute(
+                    "SELECT row_number, row_hash FROM rows WHERE sheet = ?", (sheet,)
+                ).fetchall()
+            )
+            changed = []
+            for row_number, row in enumerate(rows, start=2):
+                if not any(row):
+                    continue
+                if known.pop(row_number, None) != _row_hash(header, row):
+                    changed.append(self._record(sheet, header, row_number, row))
+            self._upsert(changed)
+            self._conn.executemany(
+                "DELETE FROM rows WHERE sheet = ? AND row_number = ?",
+                [(sheet, row_number) for row_number in known],
+            )
+
+        stats = {"changed": len(changed), "deleted": len(known), "rows": len(rows)}
+        logger.info(f"Mirror sync of '{sheet}': {stats}")
+        return stats
+
+    def apply_rows(
+        self, sheet: str, header: List[str], rows: Dict[int, List[Any]]
+    ) -> None:
+        """Writes through rows (row number -> raw values) after a sheet write."""
+        with self._lock, self._conn:
+            self._upsert(
+                [
+                    self._record(sheet, header, row_number, row)
+                    for row_number, row in rows.items()
+                ]
+            )
+
+    @staticmethod
+    def _column_expr(column: str, params: List[Any]) -> str:
+        if column in INDEXED_COLUMNS:
+            return column
+        params.append(f'$."{column}"')
+        return "TRIM(COALESCE(json_extract(data, ?), ''))"
+
+    def select(
+        self,
+        sheet: str,
+        equals: Optional[Dict[str, Any]] = None,
+        empty: Iterable[str] = (),
+        present: Iterable[str] = (),
+        limit: Optional[int] = None,
+        random_order: bool = False,
+    ) -> List[Dict[str, Any]]:
+        """
+        Returns mirrored rows of `sheet` as dicts keyed by the header.
+
+        Args:
+            equals: Column -> value the column must equal.
+            empty: Columns that must be empty or missing.
+            present: Columns that must hold a non-empty value.
+            limit: Maximum number of rows to return.
+            random_order: Return rows in random order (for sampling).
+        """
+        params: List[Any] = [sheet]
+        clauses = ["sheet = ?"]
+        for column, value in (equals or {}).items():
+            clauses.append(f"{self._column_expr(column, params)} = ?")
+            params.append(str(value))
+        for column in empty:
+            clauses.append(f"{self._column_expr(column, params)} = ''")
+        for column in present:
+            clauses.append(f"{self._column_expr(column, params)} != ''")
+
+        query = f"SELECT row_number, data FROM rows WHERE {' AND '.join(clauses)}"
+        query += " ORDER BY RANDOM()" if random_order else " ORDER BY row_number"
+        if limit:
+            query += " LIMIT ?"
+            params.append(limit)
+
+        with self._lock:
+            result = self._conn.execute(query, params).fetchall()
+        return [{**json.loads(r["data"]), "_row": r["row_number"]} for r in result]
+
+    def max_id(self, sheet: str, column: str = "id") -> int:
+        """Returns the highest numeric value of an indexed id column."""
+        if column not in INDEXED_COLUMNS:
+            raise ValueError(f"Column '{column}' is not mirrored as an indexed column.")
+        with self._lock:
+            (value,) = self._conn.execute(
+                f"SELECT MAX(CAST({column} AS INTEGER)) FROM rows "
+                f"WHERE sheet = ? AND {column} != '' AND {column} NOT GLOB '*[^0-9]*'",
+                (sheet,),
+            ).fetchone()
+        return value or 0
+
+    def count(self, sheet: str) -> int:
+        """Returns the number of mirrored rows of a sheet."""
+        with self._lock:
+            (value,) = self._conn.execute(
+                "SELECT COUNT(*) FROM rows WHERE sheet = ?", (sheet,)
+            ).fetchone()
+        return value
+
+
+_mirrors: Dict[str, SheetsMirror] = {}
+_mirrors_lock = threading.Lock()
+
+
+def get_sheets_mirror(config: dict) -> Optional[SheetsMirror]:
+    """
+    Returns the process-wide mirror configured under 'mirror' in a Sheets
+    config, or None when the mirror is disabled.
+    """
+    mirror_config = config.get("mirror") or {}
+    if not mirror_config.get("enabled"):
+        return None
+    path = mirror_config.get("path", "data/sheets_mirror.sqlite3")
+    with _mirrors_lock:
+        mirror = _mirrors.get(path)
+        if mirror is None:
+            mirror = _mirrors[path] = SheetsMirror(path)
+        return mirror
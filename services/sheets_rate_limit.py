@@ -0,0 +1,194 @@
+"""
+Sheets Rate Limiting
+
+Keeps the process inside the Google Sheets per-minute quotas instead of
+tripping them. Reads and writes draw from separate token buckets, configured
+under 'quota' in `configs/google_sheets.yaml` and shared by every client of
+the process, sync and async alike. Requests rejected anyway (429 or a
+transient 5xx) are retried with jittered exponential backoff that honours the
+server's `Retry-After` header. Appends are not idempotent, so they are only
+retried on 429.
+"""
+
+import asyncio
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+from googleapiclient.errors import HttpError
+
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Default per-minute quotas of a Google Cloud project for the Sheets API.
+DEFAULT_READS_PER_MINUTE = 300
+DEFAULT_WRITES_PER_MINUTE = 300
+RETRYABLE_STATUSES = frozenset({429, 500, 502, 503, 504})
+# A 5xx can be returned after an append was applied, and retrying it would add
+# the rows twice. A 429 is only returned before anything was written.
+APPEND_RETRYABLE_STATUSES = frozenset({429})
+
+
+def retryable_statuses(kind: str) -> frozenset:
+    """Statuses worth retrying for a 'read', 'write' or 'append' request."""
+    return APPEND_RETRYABLE_STATUSES if kind == "append" else RETRYABLE_STATUSES
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket. Callers reserve a token up front and are told how
+    long to wait for it, so the same bucket serves blocking and asyncio code.
+    """
+
+    def __init__(self, rate_per_minute: float, burst: Optional[float] = None):
+        self.rate = rate_per_minute / 60.0
+        # About one second of burst keeps any rolling minute near the quota.
+        self.capacity = burst if burst is not None else max(1.0, self.rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(
+            self.capacity, self._tokens + (now - self._updated) * self.rate
+        )
+        self._updated = now
+
+    def reserve(self) -> float:
+        """Takes one token and returns the seconds to wait before using it."""
+        with self._lock:
+            self._refill()
+            self._tokens -= 1
+            # A negative balance queues the caller behind earlier reservations.
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def wait_time(self, amount: float = 1.0) -> float:
+        """
+        Returns the seconds until `amount` tokens are available, without taking
+        them. Amounts above the capacity only wait for a full bucket.
+        """
+        with self._lock:
+            self._refill()
+            missing = min(amount, self.capacity) - self._tokens
+            return 0.0 if missing <= 0 else missing / self.rate
+
+    def take(self, amount: float = 1.0) -> None:
+        """Takes `amount` tokens, or gives them back when it is negative."""
+        with self._lock:
+            self._refill()
+            self._tokens = min(self.capacity, self._tokens - amount)
+
+    def acquire(self) -> None:
+        wait = self.reserve()
+        if wait:
+            time.sleep(wait)
+
+    async def acquire_async(self) -> None:
+        wait = self.reserve()
+        if wait:
+            await asyncio.sleep(wait)
+
+
+@dataclass
+class RetryPolicy:
+    """Jittered exponential backoff for rejected Sheets requests."""
+
+    max_attempts: int = 5
+    base_delay: float = 1.0
+    max_delay: float = 64.0
+
+    def delay(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        """Seconds to wait before retry number `attempt` (starting at 1)."""
+        backoff = min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        backoff = random.uniform(backoff / 2, backoff)
+        if retry_after:
+            try:
+                return max(backoff, float(retry_after))
+            except ValueError:
+                # An HTTP date rather than seconds; fall back to the backoff.
+                pass
+        return backoff
+
+
+class SheetsRateLimiter:
+    """Read and write buckets plus the retry policy for one Sheets project."""
+
+    def __init__(
+        self,
+        reads_per_minute: float = DEFAULT_READS_PER_MINUTE,
+        writes_per_minute: float = DEFAULT_WRITES_PER_MINUTE,
+        retry: Optional[RetryPolicy] = None,
+    ):
+        writes = TokenBucket(writes_per_minute)
+        # Appends are writes; they only differ in which rejections are retried.
+        self.buckets = {
+            "read": TokenBucket(reads_per_minute),
+            "write": writes,
+            "append": writes,
+        }
+        self.retry = retry or RetryPolicy()
+
+    def execute(self, request: Any, kind: str = "read") -> Dict[str, Any]:
+        """
+        Executes a googleapiclient request within the quota, retrying rejected
+        attempts.
+
+        Raises:
+            HttpError: If the request fails with a non-retryable status or is
+                still rejected after the last attempt.
+        """
+        for attempt in range(1, self.retry.max_attempts + 1):
+            self.buckets[kind].acquire()
+            try:
+                return request.execute()
+            except HttpError as err:
+                status = err.resp.status
+                if status not in retryable_statuses(kind):
+                    raise
+                if attempt == self.retry.max_attempts:
+                    logger.error(
+                        f"Sheets {kind} still rejected with {status} after "
+                        f"{attempt} attempts."
+                    )
+                    raise
+                delay = self.retry.delay(attempt, err.resp.get("retry-after"))
+                logger.warning(
+                    f"Sheets {kind} rejected with {status}; retrying in {delay:.1f}s "
+                    f"(attempt {attempt}/{self.retry.max_attempts})."
+                )
+                time.sleep(delay)
+        raise AssertionError("unreachable")
+
+
+_limiters: Dict[str, SheetsRateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(config: dict) -> SheetsRateLimiter:
+    """
+    Returns the process-wide limiter for the spreadsheet of a Sheets config,
+    built from its 'quota' section.
+    """
+    quota = config.get("quota") or {}
+    key = config.get("spreadsheet_id", "")
+    with _limiters_lock:
+        limiter = _limiters.get(key)
+        if limiter is None:
+            limiter = _limiters[key] = SheetsRateLimiter(
+                reads_per_minute=quota.get(
+                    "reads_per_minute", DEFAULT_READS_PER_MINUTE
+                ),
+                writes_per_minute=quota.get(
+                    "writes_per_minute", DEFAULT_WRITES_PER_MINUTE
+                ),
+                retry=RetryPolicy(
+                    max_attempts=quota.get("max_attempts", RetryPolicy.max_attempts),
+                    base_delay=quota.get("base_delay_seconds", RetryPolicy.base_delay),
+                    max_delay=quota.get("max_delay_seconds", RetryPolicy.max_delay),
+                ),
+            )
+        return limiter
@@ -0,0 +1,168 @@
+"""
+Compact Sheet Rows
+
+Memory-lean alternative to one dict per sheet row. All rows of a read share a
+single `RowHeader` (interned column names plus a name -> index map), and each
+row only stores a tuple of its values. Rows are read-only mappings, so code
+written against `dict(zip(header, row))` rows (`row.get`, `row["col"]`,
+`row.keys()`, `dict(row)`) works unchanged.
+
+`ColumnProjection` builds such rows from a read of a few columns only.
+"""
+
+import sys
+from collections.abc import Mapping
+from typing import Any, Iterable, Iterator, List, Sequence
+
+from services.sheets_a1 import column_letter
+
+
+class RowHeader:
+    """Column names shared by every row of a read."""
+
+    __slots__ = ("names", "index")
+
+    def __init__(self, names: Iterable[str]):
+        self.names = tuple(sys.intern(str(name).strip()) for name in names)
+        self.index: dict[str, int] = {}
+        for i, name in enumerate(self.names):
+            # Like dict(zip(...)), a duplicated column name keeps its last value.
+            self.index[name] = i
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def row(self, values: Sequence[Any]) -> "SheetRow":
+        return SheetRow(self, tuple(values))
+
+
+class SheetRow(Mapping):
+    """
+    One sheet row with dict-like, read-only access. As with `dict(zip(...))`,
+    trailing columns the API omitted for the row are not keys of the row.
+    """
+
+    __slots__ = ("header", "values")
+
+    def __init__(self, header: RowHeader, values: tuple):
+        self.header = header
+        self.values = values
+
+    def __getitem__(self, key: str) -> Any:
+        i = self.header.index.get(key)
+        if i is None or i >= len(self.values):
+            raise KeyError(key)
+        return self.values[i]
+
+    def get(self, key: str, default: Any = None) -> Any:
+        i = self.header.index.get(key)
+        if i is None or i >= len(self.values):
+            return default
+        return self.values[i]
+
+    def __contains__(self, key: object) -> bool:
+        i = self.header.index.get(key)  # type: ignore[arg-type]
+        return i is not None and i < len(self.values)
+
+    def __iter__(self) -> Iterator[str]:
+        width = min(len(self.header.names), len(self.values))
+        seen = set()
+        for name in self.header.names[:width]:
+            if name not in seen and name in self:
+                seen.add(name)
+                yield name
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def to_dict(self) -> dict:
+        """Returns a plain dict, e.g. to hand the row to later pipeline steps."""
+        return {name: self[name] for name in self}
+
+    def __repr__(self) -> str:
+        return f"SheetRow({self.to_dict()!r})"
+
+
+def compact_rows(values: List[List[Any]]) -> List[SheetRow]:
+    """Converts raw sheet values (header first) into compact rows."""
+    if not values:
+        return []
+    header = RowHeader(values[0])
+    return [SheetRow(header, tuple(row)) for row in values[1:]]
+
+
+class ColumnProjection:
+    """
+    Plans a read of some columns of a sheet and turns the answers into rows,
+    shared by the blocking and the asyncio clients.
+
+    Only the named columns are fetched: each window of rows is one
+    `values.batchGet` of the column ranges, adjacent columns sharing a range.
+    Every row holds the projected columns plus '_row', the sheet row number.
+    """
+
+    def __init__(self, header: List[str], columns: List[str], compact: bool = False):
+        column_index: dict[str, int] = {}
+        for i, name in enumerate(header):
+            column_index.setdefault(name, i)
+        self.missing = [col for col in columns if col not in column_index]
+        self.projected = {
+            col: column_index[col] for col in columns if col in column_index
+        }
+        self.compact = compact
+        self.row_header = RowHeader([*self.projected, "_row"])
+        # Runs of adjacent projected columns, one range each.
+        self.segments: list[list[int]] = []
+        for i in sorted(set(self.projected.values())):
+            if self.segments and self.segments[-1][-1] == i - 1:
+                self.segments[-1].append(i)
+            else:
+                self.segments.append([i])
+
+    def make_row(self, values: List[Any], row_number: int) -> Any:
+        if self.compact:
+            return SheetRow(self.row_header, (*values, row_number))
+        item = dict(zip(self.projected, values))
+        item["_row"] = row_number
+        return item
+
+    def snapshot_rows(self, values: List[List[Any]]) -> Iterator[Any]:
+        """Projects the rows of whole-sheet values (header first)."""
+        for row_number, row in enumerate(values[1:], start=2):
+            yield self.make_row(
+                [row[i] if len(row) > i else "" for i in self.projected.values()],
+                row_number,
+            )
+
+    def window_ranges(self, quoted_name: str, start: int, end: int) -> List[str]:
+        """Returns the column ranges of rows `start`..`end` for a batchGet."""
+        return [
+            f"{quoted_name}!{column_letter(seg[0])}{start}:"
+            f"{column_letter(seg[-1])}{end}"
+            for seg in self.segments
+        ]
+
+    def window_rows(self, value_ranges: List[dict], start: int) -> List[Any]:
+        """
+        Turns the COLUMNS-major answer of `window_ranges` into rows. Columns
+        drop their trailing empty cells, so the longest one sets the row count.
+        """
+        column_values: dict[int, list] = {}
+        for seg, value_range in zip(self.segments, value_ranges):
+            seg_values = value_range.get("values", [])
+            for offset, i in enumerate(seg):
+                column_values[i] = (
+                    seg_values[offset] if offset < len(seg_values) else []
+                )
+
+        rows_in_window = max((len(v) for v in column_values.values()), default=0)
+        return [
+            self.make_row(
+                [
+                    column_values[i][offset] if offset < len(column_values[i]) else ""
+                    for i in self.projected.values()
+                ],
+                start + offset,
+            )
+            for offset in range(rows_in_window)
+        ]
@@ -0,0 +1,91 @@
+"""
+Google Sheets Service Registry
+
+Process-wide, thread-safe registry for Google Sheets API services.
+
+- The Sheets discovery document is loaded and parsed once per process.
+- Credentials are resolved once per config key and shared by every client.
+- Each thread gets its own keep-alive HTTP transport, since httplib2
+  connections must not be shared between threads.
+"""
+
+import json
+import threading
+from typing import Any, Callable, Dict
+
+import httplib2
+from google_auth_httplib2 import AuthorizedHttp
+from googleapiclient.discovery import build_from_document
+from googleapiclient.discovery_cache import get_static_doc
+
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+HTTP_TIMEOUT_SECONDS = 60
+
+
+class SheetsServiceRegistry:
+    """Shares discovery, credentials and HTTP connections across Sheets clients."""
+
+    def __init__(self, api_name: str = "sheets", api_version: str = "v4"):
+        self._api_name = api_name
+        self._api_version = api_version
+        self._lock = threading.Lock()
+        self._discovery_doc: Dict[str, Any] | None = None
+        self._credentials: Dict[str, Any] = {}
+        self._local = threading.local()
+
+    def _get_discovery_doc(self) -> Dict[str, Any]:
+        """Returns the bundled discovery document, parsing it only once."""
+        if self._discovery_doc is None:
+            doc = get_static_doc(self._api_name, self._api_version)
+            if doc is None:
+                raise RuntimeError(
+                    f"No discovery document bundled for {self._api_name} {self._api_version}."
+                )
+            self._discovery_doc = json.loads(doc)
+        return self._discovery_doc
+
+    def get_credentials(self, key: str, factory: Callable[[], Any]) -> Any:
+        """
+        Returns the credentials registered under `key`, creating them with
+        `factory` on first use. Failed lookups (None) are not cached so that a
+        later call can retry the auth flow.
+        """
+        with self._lock:
+            creds = self._credentials.get(key)
+            if creds is None:
+                creds = factory()
+                if creds is not None:
+                    self._credentials[key] = creds
+            return creds
+
+    def get_service(self, key: str, creds: Any) -> Any:
+        """Returns this thread's Sheets service for `key`, building it once."""
+        services = getattr(self._local, "services", None)
+        if services is None:
+            services = self._local.services = {}
+
+        entry = services.get(key)
+        if entry is not None and entry[0] is creds:
+            return entry[1]
+
+        with self._lock:
+            doc = self._get_discovery_doc()
+        http = AuthorizedHttp(creds, http=httplib2.Http(timeout=HTTP_TIMEOUT_SECONDS))
+        service = build_from_document(doc, http=http)
+        services[key] = (creds, service)
+        logger.debug(
+            f"Built Sheets service for '{key}' on thread {threading.get_ident()}."
+        )
+        return service
+
+    def reset(self) -> None:
+        """Drops cached credentials and this thread's services."""
+        with self._lock:
+            self._credentials.clear()
+        self._local = threading.local()
+
+
+sheets_registry = SheetsServiceRegistry()
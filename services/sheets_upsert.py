@@ -0,0 +1,95 @@
+"""
+Sheet Upsert Planning
+
+Transport-independent part of an upsert: resolving rows against a cached
+snapshot, deciding which cells to update and which rows to append, and
+applying the written values back to the snapshot. Shared by the blocking and
+the asyncio Sheets clients.
+"""
+
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from services.sheets_cache import SheetSnapshot
+
+
+@dataclass
+class UpsertPlan:
+    """Writes needed to upsert a batch of rows into one sheet."""
+
+    # Written cells per row number: {row_number: {column_index: value}}.
+    cell_updates: Dict[int, Dict[int, Any]] = field(default_factory=dict)
+    # Rows to insert, keyed by filter value so duplicates are merged.
+    new_rows: Dict[str, List[Any]] = field(default_factory=dict)
+
+    @property
+    def updated_rows(self) -> List[int]:
+        return list(self.cell_updates)
+
+    @property
+    def is_empty(self) -> bool:
+        return not self.cell_updates and not self.new_rows
+
+
+def initial_rows(rows: List[dict]) -> List[List[Any]]:
+    """Header plus rows for an empty sheet, with columns in first-seen order."""
+    header = list(dict.fromkeys(k for row in rows for k in row))
+    return [header, *([row.get(col) for col in header] for row in rows)]
+
+
+def plan_upsert(
+    snapshot: SheetSnapshot, filter_key: str, rows: List[dict]
+) -> UpsertPlan:
+    """
+    Resolves each row by its `filter_key` value through the snapshot index.
+    Existing rows become cell updates (the key column itself is not rewritten);
+    the rest become new rows laid out by the sheet header.
+
+    Raises:
+        KeyError: If `filter_key` is not a column of the sheet.
+    """
+    column_index = snapshot.column_index()
+    filter_col_index = column_index.get(filter_key)
+    if filter_col_index is None:
+        raise KeyError(filter_key)
+
+    plan = UpsertPlan()
+    width = len(snapshot.header)
+    for row_data in rows:
+        filter_value = str(row_data[filter_key])
+        row_number = snapshot.find_row(filter_key, filter_value)
+
+        if row_number is not None:
+            # --- UPDATE PATH ---
+            for col_name, value in row_data.items():
+                col_index = column_index.get(col_name)
+                if col_index is not None and col_name != filter_key:
+                    plan.cell_updates.setdefault(row_number, {})[col_index] = value
+        else:
+            # --- INSERT PATH ---
+            new_row = plan.new_rows.setdefault(filter_value, [None] * width)
+            # Place filter value in its column
+            new_row[filter_col_index] = row_data[filter_key]
+            for col_name, value in row_data.items():
+                col_index = column_index.get(col_name)
+                if col_index is not None:
+                    new_row[col_index] = value
+    return plan
+
+
+def apply_upsert(
+    snapshot: SheetSnapshot, plan: UpsertPlan, appended_at: Optional[int]
+) -> List[int]:
+    """
+    Applies a completed upsert to the cached snapshot and its indexes.
+
+    Returns:
+        The row numbers that were written.
+    """
+    for row_number, cells in plan.cell_updates.items():
+        snapshot.update_cells(row_number, cells)
+    written_rows = plan.updated_rows
+    if plan.new_rows and appended_at is not None:
+        snapshot.append_rows(appended_at, list(plan.new_rows.values()))
+        written_rows += range(appended_at, appended_at + len(plan.new_rows))
+    return written_rows
@@ -0,0 +1,148 @@
+"""
+Topic Pool
+
+Serves topics from a plain-text topics file (one topic per line, '#' for
+comments) without repeats. The parsed file is cached per process and only
+re-read when its modification time or size changes. A persisted rotation
+ledger holds a shuffled permutation of the topics plus a cursor: every pick
+advances the cursor, so no topic repeats until the whole pool has been used,
+after which a new permutation is drawn.
+
+When the topics file changes mid-cycle, topics already used in the cycle stay
+used and the remaining ones (including new topics) are reshuffled.
+"""
+
+import fcntl
+import hashlib
+import json
+import os
+import random
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+class TopicPool:
+    """Cached topics file plus its no-repeat rotation ledger."""
+
+    def __init__(self, topics_file: str, ledger_file: str):
+        self.topics_file = Path(topics_file)
+        self.ledger_file = Path(ledger_file)
+        self._lock = threading.Lock()
+        self._file_key: Optional[Tuple[int, int]] = None
+        self._topics: List[str] = []
+        self._fingerprint = ""
+
+    def topics(self) -> List[str]:
+        """Returns the topics of the file, re-parsing it only when it changed."""
+        stat = self.topics_file.stat()
+        file_key = (stat.st_mtime_ns, stat.st_size)
+        if file_key != self._file_key:
+            topics = []
+            with self.topics_file.open("r", encoding="utf-8") as file:
+                for line in file:
+                    line = line.strip()
+                    # Skip empty lines and comments
+                    if line and not line.startswith("#"):
+                        topics.append(line)
+            # Duplicated lines would otherwise be picked twice per cycle.
+            self._topics = list(dict.fromkeys(topics))
+            self._fingerprint = hashlib.sha1(
+                "\n".join(self._topics).encode("utf-8")
+            ).hexdigest()
+            self._file_key = file_key
+            logger.info(f"Loaded {len(self._topics)} topics from {self.topics_file}.")
+        return self._topics
+
+    def _load_ledger(self) -> Dict:
+        try:
+            with self.ledger_file.open(encoding="utf-8") as ledger:
+                return json.load(ledger)
+        except (OSError, ValueError):
+            return {"order": [], "cursor": 0}
+
+    def _save_ledger(self, ledger: Dict) -> None:
+        tmp_path = self.ledger_file.with_suffix(".tmp")
+        with tmp_path.open("w", encoding="utf-8") as ledger_file:
+            json.dump(ledger, ledger_file, ensure_ascii=False)
+        os.replace(tmp_path, self.ledger_file)
+
+    def _reconcile(self, ledger: Dict, topics: List[str]) -> Dict:
+        """Aligns the ledger with the current topics, keeping the used ones used."""
+        order = ledger.get("order", [])
+        cursor = min(ledger.get("cursor", 0), len(order))
+        if ledger.get("fingerprint") == self._fingerprint:
+            return {"order": order, "cursor": cursor}
+
+        current = set(topics)
+        used = [topic for topic in order[:cursor] if topic in current]
+        used_set = set(used)
+        remaining = [topic for topic in topics if topic not in used_set]
+        random.shuffle(remaining)
+        logger.info(
+            f"Topics file changed; {len(used)} topics used in this cycle, "
+            f"{len(remaining)} left."
+        )
+        return {"order": used + remaining, "cursor": len(used)}
+
+    def next_topic(self) -> Tuple[str, int, int]:
+        """
+        Returns the next topic of the rotation, the number of topics left in
+        the cycle after it, and the size of the pool.
+
+        Raises:
+            ValueError: If the topics file has no topics.
+        """
+        with self._lock:
+            topics = self.topics()
+            if not topics:
+                raise ValueError("No topics found in topics file")
+
+            self.ledger_file.parent.mkdir(parents=True, exist_ok=True)
+            lock_path = self.ledger_file.with_suffix(".lock")
+            # The file lock serialises runs that share the ledger.
+            with open(lock_path, "w") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    ledger = self._reconcile(self._load_ledger(), topics)
+                    order, cursor = ledger["order"], ledger["cursor"]
+                    if cursor >= len(order):
+                        last = order[-1] if order else None
+                        order = list(topics)
+                        random.shuffle(order)
+                        # Do not open a new cycle with the topic that closed the last.
+                        if len(order) > 1 and order[0] == last:
+                            order[0], order[-1] = order[-1], order[0]
+                        cursor = 0
+                        logger.info("Topic pool exhausted; starting a new rotation.")
+
+                    topic = order[cursor]
+                    self._save_ledger(
+                        {
+                            "fingerprint": self._fingerprint,
+                            "order": order,
+                            "cursor": cursor + 1,
+                        }
+                    )
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+            return topic, len(order) - cursor - 1, len(topics)
+
+
+_pools: Dict[Tuple[str, str], TopicPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_topic_pool(topics_file: str, ledger_file: str) -> TopicPool:
+    """Returns the process-wide pool of a topics file."""
+    with _pools_lock:
+        pool = _pools.get((topics_file, ledger_file))
+        if pool is None:
+            pool = _pools[(topics_file, ledger_file)] = TopicPool(
+                topics_file, ledger_file
+            )
+        return pool
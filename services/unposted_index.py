@@ -0,0 +1,189 @@
+"""
+Unposted Row Index
+
+Keeps the keys and row numbers of the sheet rows that have not been used yet
+(an empty status column, e.g. Topics rows without 'created'), so a random
+unposted topic is drawn in O(1) instead of filtering the whole sheet on every
+run. Rows are held in a list plus a key -> position map: sampling picks a
+random position, and removal swaps the last entry into the freed slot.
+
+The index is built from a narrow scan of the key and status columns, kept per
+process, and persisted to a JSON file so later runs start from it. It is
+rebuilt once it is 'max_age_seconds' old, which is how rows added to the sheet
+by hand get picked up. Callers discard a key when they mark its row as used,
+and should re-check a sampled row against the sheet, since it may have been
+edited since the index was built.
+"""
+
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+DEFAULT_INDEX_PATH = "data/unposted_index.json"
+DEFAULT_MAX_AGE_SECONDS = 3600
+
+
+class UnpostedRowIndex:
+    """Set of unposted rows (key -> row number) with O(1) sampling and removal."""
+
+    def __init__(
+        self,
+        rows: Optional[Dict[str, int]] = None,
+        built_at: Optional[float] = None,
+    ):
+        self.built_at = built_at if built_at is not None else time.time()
+        self._keys: List[str] = []
+        self._positions: Dict[str, int] = {}
+        self._rows: Dict[str, int] = {}
+        for key, row_number in (rows or {}).items():
+            self.add(key, row_number)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._positions
+
+    def add(self, key: str, row_number: int) -> None:
+        if key not in self._positions:
+            self._positions[key] = len(self._keys)
+            self._keys.append(key)
+        self._rows[key] = row_number
+
+    def discard(self, key: str) -> bool:
+        """Removes `key` if present. Returns True if it was removed."""
+        position = self._positions.pop(key, None)
+        if position is None:
+            return False
+        last = self._keys.pop()
+        if last != key:
+            self._keys[position] = last
+            self._positions[last] = position
+        del self._rows[key]
+        return True
+
+    def sample(self, rng: random.Random | None = None) -> Optional[Tuple[str, int]]:
+        """Returns a uniformly random (key, row number), or None when empty."""
+        if not self._keys:
+            return None
+        key = self._keys[(rng or random).randrange(len(self._keys))]
+        return key, self._rows[key]
+
+    def to_json(self) -> dict:
+        return {"built_at": self.built_at, "rows": self._rows}
+
+    @classmethod
+    def from_json(cls, payload: dict) -> "UnpostedRowIndex":
+        return cls(payload["rows"], payload["built_at"])
+
+
+class UnpostedIndexStore:
+    """Builds, caches and persists the unposted index of one sheet."""
+
+    def __init__(
+        self,
+        client,
+        sheet: str,
+        key_column: str,
+        status_column: str,
+    ):
+        self.client = client
+        self.sheet = sheet
+        self.key_column = key_column
+        self.status_column = status_column
+        index_config = client.config.get("unposted_index") or {}
+        path = Path(index_config.get("path", DEFAULT_INDEX_PATH))
+        self.path = path.with_name(f"{path.stem}.{sheet}{path.suffix}")
+        self.max_age = index_config.get("max_age_seconds", DEFAULT_MAX_AGE_SECONDS)
+        self._lock = threading.Lock()
+        self._index: Optional[UnpostedRowIndex] = None
+
+    def _is_current(self, index: UnpostedRowIndex) -> bool:
+        return time.time() - index.built_at < self.max_age
+
+    def _load_file(self) -> Optional[UnpostedRowIndex]:
+        try:
+            with self.path.open(encoding="utf-8") as index_file:
+                payload = json.load(index_file)
+        except (OSError, ValueError):
+            return None
+        if payload.get("spreadsheet_id") != self.client.config["spreadsheet_id"]:
+            return None
+        try:
+            return UnpostedRowIndex.from_json(payload)
+        except (KeyError, TypeError):
+            return None
+
+    def _build(self) -> UnpostedRowIndex:
+        index = UnpostedRowIndex()
+        for row in self.client.read_columns_iter(
+            [self.key_column, self.status_column], range_name=self.sheet, compact=True
+        ):
+            key = str(row.get(self.key_column, "")).strip()
+            if key and not str(row.get(self.status_column, "")).strip():
+                index.add(key, row["_row"])
+        logger.info(f"Built unposted index of '{self.sheet}' with {len(index)} rows.")
+        return index
+
+    def _save(self, index: UnpostedRowIndex) -> None:
+        payload = {"spreadsheet_id": self.client.config["spreadsheet_id"]}
+        payload.update(index.to_json())
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as index_file:
+                json.dump(payload, index_file)
+            os.replace(tmp_path, self.path)
+        except OSError as err:
+            logger.warning(f"Could not persist the unposted index: {err}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def get(self) -> UnpostedRowIndex:
+        """Returns a current index, loading or rebuilding it when needed."""
+        with self._lock:
+            if self._index is not None and self._is_current(self._index):
+                return self._index
+            index = self._load_file()
+            if index is None or not self._is_current(index):
+                index = self._build()
+                self._save(index)
+            self._index = index
+            return index
+
+    def discard(self, key: str) -> None:
+        """Drops a row that was just marked as used, in memory and on disk."""
+        with self._lock:
+            index = self._index if self._index is not None else self._load_file()
+            if index is not None and index.discard(str(key)):
+                self._save(index)
+
+
+_stores: Dict[Tuple[str, str], UnpostedIndexStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_unposted_index(
+    client,
+    sheet: str = "Topics",
+    key_column: str = "id_topic",
+    status_column: str = "created",
+) -> UnpostedIndexStore:
+    """Returns the process-wide unposted index store of a sheet."""
+    cache_key = (client.config["spreadsheet_id"], sheet)
+    with _stores_lock:
+        store = _stores.get(cache_key)
+        if store is None:
+            store = _stores[cache_key] = UnpostedIndexStore(
+                client, sheet, key_column, status_column
+            )
+        return store
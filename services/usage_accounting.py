@@ -0,0 +1,433 @@
+"""
+Usage Accounting
+
+Records what every LLM and image call of a pipeline run costs: prompt and
+completion tokens, generated images, latency (and time to first token for
+streamed calls) and the estimated price, per step. A step is the
+'usage_step' metadata of the chain that made the call (e.g.
+'generate_post.reel'), so the totals show which prompt burns the budget.
+
+Wrap a run in `track_usage("<pipeline>")`: chat model calls made inside it are
+captured by a LangChain callback handler, image calls report themselves with
+`record_image_usage`. When the block exits, the run and its calls are saved to
+a local SQLite store ('configs/usage.yaml'); `UsageStore.step_summary()`
+aggregates them across runs.
+
+Token counts come from the provider's usage report. When it has none (e.g. a
+streamed call), they are counted with tiktoken and flagged as estimated. Cache
+hits are recorded with their tokens but no cost.
+"""
+
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatGeneration, LLMResult
+from langchain_core.tracers.context import register_configure_hook
+
+from utils.config_loader import load_config
+from utils.logger import setup_logger
+from utils.tokens import count_message_tokens, count_tokens
+
+logger = setup_logger(__name__)
+
+DEFAULT_USAGE_PATH = "data/usage.sqlite3"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS usage_runs (
+    run_id TEXT PRIMARY KEY,
+    pipeline TEXT NOT NULL,
+    started_at REAL NOT NULL,
+    finished_at REAL,
+    status TEXT NOT NULL,
+    prompt_tokens INTEGER NOT NULL,
+    completion_tokens INTEGER NOT NULL,
+    images INTEGER NOT NULL,
+    cost_usd REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS usage_calls (
+    run_id TEXT NOT NULL,
+    step TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    model TEXT NOT NULL,
+    prompt_tokens INTEGER NOT NULL,
+    completion_tokens INTEGER NOT NULL,
+    images INTEGER NOT NULL,
+    latency_seconds REAL NOT NULL,
+    first_token_seconds REAL,
+    cost_usd REAL NOT NULL,
+    estimated INTEGER NOT NULL,
+    cached INTEGER NOT NULL,
+    error TEXT,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_usage_calls_run ON usage_calls (run_id);
+"""
+
+
+@dataclass
+class UsageRecord:
+    """Usage of one LLM or image call."""
+
+    step: str
+    kind: str
+    model: str
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    images: int = 0
+    latency_seconds: float = 0.0
+    first_token_seconds: Optional[float] = None
+    cost_usd: float = 0.0
+    estimated: bool = False
+    cached: bool = False
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+
+
+class Pricing:
+    """Estimated prices from the 'chat_pricing' and 'image_pricing' settings."""
+
+    def __init__(self, config: dict):
+        self.chat = config.get("chat_pricing") or {}
+        self.image = config.get("image_pricing") or {}
+
+    @staticmethod
+    def _lookup(table: dict, model: str) -> Optional[Any]:
+        # Dated model names ('gpt-4o-mini-2024-07-18') use their family's price.
+        matches = [name for name in table if model.startswith(name)]
+        return table[max(matches, key=len)] if matches else None
+
+    def chat_cost(self, model: str, prompt_tokens: int, completion_tokens: int):
+        price = self._lookup(self.chat, model)
+        if not price:
+            return 0.0
+        return (
+            prompt_tokens * price.get("input", 0)
+            + completion_tokens * price.get("output", 0)
+        ) / 1_000_000
+
+    def image_cost(self, model: str, quality: Optional[str], images: int) -> float:
+        price = self._lookup(self.image, model)
+        if not price:
+            return 0.0
+        return images * price.get(quality or "default", price.get("default", 0))
+
+
+class UsageRun:
+    """The calls of one pipeline run."""
+
+    def __init__(self, pipeline: str, pricing: Pricing):
+        self.run_id = uuid.uuid4().hex
+        self.pipeline = pipeline
+        self.pricing = pricing
+        self.started_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.status = "running"
+        self.records: List[UsageRecord] = []
+        self._lock = threading.Lock()
+
+    def add(self, record: UsageRecord) -> None:
+        with self._lock:
+            self.records.append(record)
+
+    def totals(self) -> Dict[str, Any]:
+        with self._lock:
+            records = list(self.records)
+        return {
+            "calls": len(records),
+            "prompt_tokens": sum(r.prompt_tokens for r in records),
+            "completion_tokens": sum(r.completion_tokens for r in records),
+            "images": sum(r.images for r in records),
+            "cost_usd": round(sum(r.cost_usd for r in records), 6),
+        }
+
+    def by_step(self) -> Dict[str, Dict[str, Any]]:
+        steps: Dict[str, Dict[str, Any]] = {}
+        with self._lock:
+            records = list(self.records)
+        for record in records:
+            step = steps.setdefault(
+                record.step,
+                {"calls": 0, "tokens": 0, "images": 0, "seconds": 0.0, "cost": 0.0},
+            )
+            step["calls"] += 1
+            step["tokens"] += record.prompt_tokens + record.completion_tokens
+            step["images"] += record.images
+            step["seconds"] += record.latency_seconds
+            step["cost"] += record.cost_usd
+        return steps
+
+
+class UsageCallbackHandler(BaseCallbackHandler):
+    """Records the chat model calls of a run."""
+
+    def __init__(self, run: UsageRun):
+        self.run = run
+        self._pending: Dict[UUID, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def on_chat_model_start(
+        self,
+        serialized: Dict[str, Any],
+        messages: List[List[BaseMessage]],
+        *,
+        run_id: UUID,
+        metadata: Optional[Dict[str, Any]] = None,
+        **kwargs: Any,
+    ) -> None:
+        metadata = metadata or {}
+        params = kwargs.get("invocation_params") or {}
+        model = (
+            params.get("model")
+            or params.get("model_name")
+            or metadata.get("ls_model_name")
+            or "unknown"
+        )
+        with self._lock:
+            self._pending[run_id] = {
+                "step": metadata.get("usage_step") or kwargs.get("name") or model,
+                "model": model,
+                "messages": messages[0] if messages else [],
+                "started": time.monotonic(),
+                "first_token": None,
+            }
+
+    def on_llm_new_token(self, token: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        with self._lock:
+            pending = self._pending.get(run_id)
+            if pending and pending["first_token"] is None:
+                pending["first_token"] = time.monotonic() - pending["started"]
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any):
+        with self._lock:
+            pending = self._pending.pop(run_id, None)
+        if pending is None:
+            return
+        model = pending["model"]
+        record = UsageRecord(
+            step=pending["step"],
+            kind="chat",
+            model=model,
+            latency_seconds=time.monotonic() - pending["started"],
+            first_token_seconds=pending["first_token"],
+        )
+
+        generations = [g for batch in response.generations for g in batch]
+        usage = None
+        for generation in generations:
+            if isinstance(generation, ChatGeneration):
+                usage = generation.message.usage_metadata or usage
+        if usage:
+            record.prompt_tokens = usage.get("input_tokens", 0)
+            record.completion_tokens = usage.get("output_tokens", 0)
+            # LangChain zeroes the cost of the usage it replays from the cache.
+            record.cached = usage.get("total_cost") == 0
+        else:
+            token_usage = (response.llm_output or {}).get("token_usage") or {}
+            record.prompt_tokens = token_usage.get("prompt_tokens", 0)
+            record.completion_tokens = token_usage.get("completion_tokens", 0)
+        if not record.prompt_tokens and not record.completion_tokens:
+            record.prompt_tokens = count_message_tokens(model, pending["messages"])
+            record.completion_tokens = sum(
+                count_tokens(model, generation.text) for generation in generations
+            )
+            record.estimated = True
+
+        if not record.cached:
+            record.cost_usd = self.run.pricing.chat_cost(
+                model, record.prompt_tokens, record.completion_tokens
+            )
+        self.run.add(record)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any):
+        with self._lock:
+            pending = self._pending.pop(run_id, None)
+        if pending is None:
+            return
+        self.run.add(
+            UsageRecord(
+                step=pending["step"],
+                kind="chat",
+                model=pending["model"],
+                latency_seconds=time.monotonic() - pending["started"],
+                error=str(error),
+            )
+        )
+
+
+class UsageStore:
+    """SQLite store of the runs and their calls."""
+
+    def __init__(self, path: str = DEFAULT_USAGE_PATH):
+        if path != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(_SCHEMA)
+
+    def save(self, run: UsageRun) -> None:
+        totals = run.totals()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO usage_runs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    run.run_id,
+                    run.pipeline,
+                    run.started_at,
+                    run.finished_at,
+                    run.status,
+                    totals["prompt_tokens"],
+                    totals["completion_tokens"],
+                    totals["images"],
+                    totals["cost_usd"],
+                ),
+            )
+            self._conn.executemany(
+                "INSERT INTO usage_calls VALUES "
+                "(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        run.run_id,
+                        record.step,
+                        record.kind,
+                        record.model,
+                        record.prompt_tokens,
+                        record.completion_tokens,
+                        record.images,
+                        record.latency_seconds,
+                        record.first_token_seconds,
+                        record.cost_usd,
+                        int(record.estimated),
+                        int(record.cached),
+                        record.error,
+                        record.created_at,
+                    )
+                    for record in run.records
+                ],
+            )
+
+    def step_summary(self, since: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Returns the usage per step and model, most expensive first."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT step, model, COUNT(*), SUM(prompt_tokens), "
+                "SUM(completion_tokens), SUM(images), AVG(latency_seconds), "
+                "SUM(cost_usd) FROM usage_calls WHERE created_at >= ? "
+                "GROUP BY step, model ORDER BY SUM(cost_usd) DESC",
+                (since or 0,),
+            ).fetchall()
+        keys = (
+            "step",
+            "model",
+            "calls",
+            "prompt_tokens",
+            "completion_tokens",
+            "images",
+            "avg_latency_seconds",
+            "cost_usd",
+        )
+        return [dict(zip(keys, row)) for row in rows]
+
+
+_handler: ContextVar[Optional[UsageCallbackHandler]] = ContextVar(
+    "usage_handler", default=None
+)
+# Every chain run inside `track_usage` gets the handler of its run.
+register_configure_hook(_handler, inheritable=True)
+
+_store: Optional[UsageStore] = None
+_store_lock = threading.Lock()
+
+
+def get_usage_store() -> Optional[UsageStore]:
+    """
+    Returns the process-wide usage store configured in 'configs/usage.yaml',
+    or None when accounting is disabled.
+    """
+    global _store
+    config = load_config("usage")
+    if not config.get("enabled"):
+        return None
+    with _store_lock:
+        if _store is None:
+            _store = UsageStore(config.get("path", DEFAULT_USAGE_PATH))
+        return _store
+
+
+@contextmanager
+def track_usage(pipeline: str) -> Iterator[Optional[UsageRun]]:
+    """
+    Accounts the LLM and image calls made inside the block to a new run of
+    `pipeline`, and saves the run when the block exits. Yields None when
+    accounting is disabled.
+    """
+    store = get_usage_store()
+    if store is None:
+        yield None
+        return
+
+    run = UsageRun(pipeline, Pricing(load_config("usage")))
+    token = _handler.set(UsageCallbackHandler(run))
+    try:
+        yield run
+        run.status = "success"
+    except BaseException:
+        run.status = "error"
+        raise
+    finally:
+        _handler.reset(token)
+        run.finished_at = time.time()
+        try:
+            store.save(run)
+        except sqlite3.Error as err:
+            logger.warning(f"Could not save the usage of run {run.run_id}: {err}")
+        totals = run.totals()
+        logger.info(
+            f"Usage of {pipeline}: {totals['calls']} calls, "
+            f"{totals['prompt_tokens']} prompt + {totals['completion_tokens']} "
+            f"completion tokens, {totals['images']} images, "
+            f"~${totals['cost_usd']:.4f}."
+        )
+        for step, usage in run.by_step().items():
+            logger.info(
+                f"   - {step}: {usage['calls']} calls, {usage['tokens']} tokens, "
+                f"{usage['images']} images, {usage['seconds']:.1f}s, "
+                f"~${usage['cost']:.4f}"
+            )
+
+
+def record_image_usage(
+    step: str,
+    model: str,
+    latency_seconds: float,
+    images: int = 1,
+    quality: Optional[str] = None,
+    error: Optional[str] = None,
+) -> None:
+    """Accounts an image generation call to the current run, if any."""
+    handler = _handler.get()
+    if handler is None:
+        return
+    run = handler.run
+    run.add(
+        UsageRecord(
+            step=step,
+            kind="image",
+            model=model,
+            images=images if error is None else 0,
+            latency_seconds=latency_seconds,
+            cost_usd=(
+                run.pricing.image_cost(model, quality, images) if error is None else 0
+            ),
+            error=error,
+        )
+    )
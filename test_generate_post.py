@@ -0,0 +1,120 @@
+"""
+Test script for combined generation of reel, post and carousel.
+
+Replaces the combined chain and the dedicated format chains with canned
+answers and checks that, in combined mode, only the formats that fail
+validation are regenerated with their own chain, in the blocking and the
+async paths, and that an unparsable combined answer regenerates them all.
+
+Usage:
+    pipenv run python test_generate_post.py
+    pipenv run pytest test_generate_post.py
+"""
+
+import asyncio
+
+from langchain_core.exceptions import OutputParserException
+from langchain_core.runnables import RunnableLambda
+
+import chains.generate_post as generate_post
+
+TOPIC = {"topic": "Testing", "category": "dev", "level": "easy", "objective": "x"}
+
+
+def _content(label: str) -> dict:
+    return {field: f"{label} {field}" for field in generate_post.CONTENT_FIELDS}
+
+
+class Patched:
+    """Replaces attributes and dict items for the duration of a `with` block."""
+
+    def __init__(self, attributes=(), items=()):
+        self.attributes = attributes
+        self.items = items
+        self.saved = []
+
+    def __enter__(self):
+        for target, name, value in self.attributes:
+            self.saved.append((setattr, target, name, getattr(target, name)))
+            setattr(target, name, value)
+        for target, key, value in self.items:
+            self.saved.append((dict.__setitem__, target, key, target[key]))
+            target[key] = value
+        return self
+
+    def __exit__(self, *exc_info):
+        for restore, target, name, value in reversed(self.saved):
+            restore(target, name, value)
+
+
+def _combined_mode(combined_answer):
+    """Combined mode with a canned combined answer and recording format chains."""
+    regenerated = []
+
+    def combined(data):
+        if isinstance(combined_answer, Exception):
+            raise combined_answer
+        return combined_answer
+
+    def format_chain(content_type):
+        def generate(data):
+            regenerated.append(content_type)
+            return _content(f"dedicated {content_type}")
+
+        return RunnableLambda(generate)
+
+    patched = Patched(
+        attributes=[
+            (generate_post, "COMBINED_MODE", True),
+            (generate_post, "generate_combined_chain", RunnableLambda(combined)),
+        ],
+        items=[
+            (generate_post.FORMAT_CHAINS, ct, format_chain(ct))
+            for ct in generate_post.CONTENT_TYPES
+        ],
+    )
+    return patched, regenerated
+
+
+def test_only_invalid_formats_are_regenerated():
+    answer = {
+        "reel": _content("combined reel"),
+        "post": {**_content("combined post"), "hashtags": "  "},
+        "carousel": _content("combined carousel"),
+    }
+    patched, regenerated = _combined_mode(answer)
+    with patched:
+        result = generate_post.generate_all_content_chain.invoke(TOPIC)
+
+    assert regenerated == ["post"]
+    assert result["topic"] == "Testing"
+    assert result["reel"] == _content("combined reel")
+    assert result["post"] == _content("dedicated post")
+    assert result["carousel"] == _content("combined carousel")
+
+
+def test_async_path_regenerates_missing_formats():
+    answer = {"reel": _content("combined reel"), "carousel": "not an object"}
+    patched, regenerated = _combined_mode(answer)
+    with patched:
+        result = asyncio.run(generate_post.generate_all_content_chain.ainvoke(TOPIC))
+
+    assert sorted(regenerated) == ["carousel", "post"]
+    assert result["reel"] == _content("combined reel")
+    assert result["carousel"] == _content("dedicated carousel")
+
+
+def test_unparsable_combined_answer_regenerates_every_format():
+    patched, regenerated = _combined_mode(OutputParserException("not JSON"))
+    with patched:
+        result = generate_post.generate_all_content_chain.invoke(TOPIC)
+
+    assert sorted(regenerated) == sorted(generate_post.CONTENT_TYPES)
+    assert result["reel"] == _content("dedicated reel")
+
+
+if __name__ == "__main__":
+    test_only_invalid_formats_are_regenerated()
+    test_async_path_regenerates_missing_formats()
+    test_unparsable_combined_answer_regenerates_every_format()
+    print("All combined generation tests passed.")
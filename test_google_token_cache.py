@@ -0,0 +1,117 @@
+"""
+Test script for the persisted Google access-token cache.
+
+Saves the token of refresh-token credentials to a temporary file and checks
+that it is restored into fresh credentials for the same refresh token and
+scopes only, that a token about to expire is not restored, and that
+`ensure_valid` refreshes only when no cached token is usable.
+
+Usage:
+    pipenv run python test_google_token_cache.py
+    pipenv run pytest test_google_token_cache.py
+"""
+
+import os
+import stat
+import tempfile
+from datetime import timedelta
+from pathlib import Path
+
+from google.oauth2.credentials import Credentials
+
+from services.google_token_cache import GoogleTokenCache, utc_now
+
+SCOPES = ["https://www.googleapis.com/auth/spreadsheets"]
+
+
+def _creds(refresh_token: str = "refresh", scopes=SCOPES, token=None, expiry=None):
+    creds = Credentials(
+        token=token,
+        refresh_token=refresh_token,
+        client_id="client",
+        client_secret="secret",
+        token_uri="https://oauth2.googleapis.com/token",
+        scopes=scopes,
+    )
+    creds.expiry = expiry
+    return creds
+
+
+def _cache(tmp_dir: str) -> GoogleTokenCache:
+    return GoogleTokenCache(
+        str(Path(tmp_dir) / "token.json"), refresh_margin_seconds=300
+    )
+
+
+def test_saved_token_is_restored_for_the_same_credentials():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cache = _cache(tmp_dir)
+        expiry = utc_now() + timedelta(hours=1)
+        cache.save(_creds(token="access", expiry=expiry))
+        assert stat.S_IMODE(os.stat(cache.path).st_mode) == 0o600
+
+        creds = _creds()
+        assert cache.restore(creds)
+        assert creds.token == "access"
+        assert creds.expiry == expiry
+        assert creds.valid
+
+
+def test_token_of_other_credentials_is_not_restored():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cache = _cache(tmp_dir)
+        cache.save(_creds(token="access", expiry=utc_now() + timedelta(hours=1)))
+
+        for other in (
+            _creds(refresh_token="rotated"),
+            _creds(scopes=SCOPES + ["https://www.googleapis.com/auth/drive"]),
+        ):
+            assert not cache.restore(other)
+            assert other.token is None
+
+
+def test_token_about_to_expire_is_not_restored():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cache = _cache(tmp_dir)
+        cache.save(_creds(token="access", expiry=utc_now() + timedelta(minutes=4)))
+        assert not cache.restore(_creds())
+
+
+def test_missing_or_corrupt_cache_is_ignored():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cache = _cache(tmp_dir)
+        assert not cache.restore(_creds())
+        cache.path.write_text("{not json", encoding="utf-8")
+        assert not cache.restore(_creds())
+
+
+def test_ensure_valid_refreshes_only_without_a_usable_token():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cache = _cache(tmp_dir)
+        refreshed = []
+
+        def refresh(creds):
+            refreshed.append(creds)
+            creds.token = "fresh"
+            creds.expiry = utc_now() + timedelta(hours=1)
+            cache.save(creds)
+
+        cache.refresh = refresh
+
+        cache.ensure_valid(_creds())
+        assert len(refreshed) == 1
+
+        # The next process starts with the token saved by the refresh.
+        creds = _creds()
+        cache.ensure_valid(creds)
+        assert len(refreshed) == 1
+        assert creds.token == "fresh"
+
+
+if __name__ == "__main__":
+    test_saved_token_is_restored_for_the_same_credentials()
+    test_token_of_other_credentials_is_not_restored()
+    test_token_about_to_expire_is_not_restored()
+    test_missing_or_corrupt_cache_is_ignored()
+    test_ensure_valid_refreshes_only_without_a_usable_token()
+    print("All Google token cache tests passed.")
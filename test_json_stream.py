@@ -0,0 +1,146 @@
+"""
+Test script for incremental JSON parsing of streamed LLM output.
+
+Feeds documents to `JsonFieldStream` in whole and one character at a time, and
+checks the members it emits and the value it ends with: escaped strings,
+nested and empty containers, and fenced output. Also checks that the streamed
+social post pipeline starts the image again when the streamed post is
+replaced after validation.
+
+Usage:
+    pipenv run python test_json_stream.py
+    pipenv run pytest test_json_stream.py
+"""
+
+import json
+import threading
+
+import pipelines.generate_social_post_pipeline as pipeline
+from utils.json_stream import JsonFieldStream
+
+
+class Patched:
+    """Replaces attributes for the duration of a `with` block."""
+
+    def __init__(self, *patches):
+        self.patches = patches
+        self.saved = []
+
+    def __enter__(self):
+        for target, name, value in self.patches:
+            self.saved.append((target, name, getattr(target, name)))
+            setattr(target, name, value)
+        return self
+
+    def __exit__(self, *exc_info):
+        for target, name, value in reversed(self.saved):
+            setattr(target, name, value)
+
+
+def _parse(text: str, chunk_size: int):
+    stream = JsonFieldStream()
+    members = []
+    for start in range(0, len(text), chunk_size):
+        members.extend(stream.feed(text[start : start + chunk_size]))
+    return stream, members
+
+
+def _check(text: str, expected_members: list, expected_value):
+    for chunk_size in (1, 3, len(text)):
+        stream, members = _parse(text, chunk_size)
+        assert stream.done, f"Not done with chunks of {chunk_size}"
+        assert members == expected_members, (chunk_size, members)
+        assert stream.value == expected_value
+
+
+def test_escaped_strings():
+    document = {"title": 'Say "hi"', "path": "C:\\tmp\\", "emoji": "\u00e9 \u2713"}
+    text = json.dumps(document)
+    _check(
+        text,
+        [(("title",), 'Say "hi"'), (("path",), "C:\\tmp\\"), (("emoji",), "é ✓")],
+        document,
+    )
+    # Braces and brackets inside strings do not open containers.
+    _check(
+        '{"a": "{[}]", "b": 1}', [(("a",), "{[}]"), (("b",), 1)], {"a": "{[}]", "b": 1}
+    )
+
+
+def test_nested_containers_emit_inner_members_first():
+    text = '{"post": {"content": "text", "tags": ["a", 2, true]}, "n": null}'
+    _check(
+        text,
+        [
+            (("post", "content"), "text"),
+            (("post", "tags", 0), "a"),
+            (("post", "tags", 1), 2),
+            (("post", "tags", 2), True),
+            (("post", "tags"), ["a", 2, True]),
+            (("post",), {"content": "text", "tags": ["a", 2, True]}),
+            (("n",), None),
+        ],
+        json.loads(text),
+    )
+
+
+def test_empty_containers():
+    _check("{}", [], {})
+    _check("[]", [], [])
+    _check(
+        '{"a": {}, "b": [], "c": [[]]}',
+        [(("a",), {}), (("b",), []), (("c", 0), []), (("c",), [[]])],
+        {"a": {}, "b": [], "c": [[]]},
+    )
+
+
+def test_fenced_output_is_skipped():
+    text = 'Here it is:\n```json\n{"title": "T", "score": -1.5e2}\n```\nDone.'
+    _check(
+        text, [(("title",), "T"), (("score",), -150.0)], {"title": "T", "score": -150.0}
+    )
+
+
+def test_incomplete_document_is_not_done():
+    stream, members = _parse('{"title": "T", "body": "unfinis', 4)
+    assert members == [(("title",), "T")]
+    assert not stream.done and stream.value is None
+
+
+def test_streamed_image_follows_a_replaced_post():
+    started = []
+    lock = threading.Lock()
+
+    def generate_content(data, on_field):
+        # The combined answer streams a post that then fails validation, and
+        # the dedicated post chain streams the one that replaces it.
+        on_field("post", "content", "rejected post")
+        on_field("post", "content", "final post")
+        return {**data, "post": {"content": "final post"}}
+
+    def generate_image(data):
+        with lock:
+            started.append(data["content"])
+        return {"image_prompt": data["content"]}
+
+    class ImageChain:
+        invoke = staticmethod(generate_image)
+
+    with Patched(
+        (pipeline, "generate_all_content_streaming", generate_content),
+        (pipeline, "generate_image_chain", ImageChain),
+    ):
+        result = pipeline._stream_content_and_image({"topic": "t"})
+
+    assert result["image_data_output"] == {"image_prompt": "final post"}
+    assert started[-1] == "final post"
+
+
+if __name__ == "__main__":
+    test_escaped_strings()
+    test_nested_containers_emit_inner_members_first()
+    test_empty_containers()
+    test_fenced_output_is_skipped()
+    test_incomplete_document_is_not_done()
+    test_streamed_image_follows_a_replaced_post()
+    print("All JSON stream tests passed.")
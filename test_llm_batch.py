@@ -0,0 +1,167 @@
+"""
+Test script for generating post content through a batch job.
+
+Submits the rendered content requests of a topic to the local batch backend,
+answers them with canned responses and checks that the answers are parsed
+into content, that a failed or unparsable answer is regenerated with its
+format chain, and the status reported by the local backend.
+
+Usage:
+    pipenv run python test_llm_batch.py
+    pipenv run pytest test_llm_batch.py
+"""
+
+import json
+import tempfile
+
+from langchain_core.runnables import RunnableLambda
+
+import chains.generate_post as generate_post
+from services.llm_batch import LocalBatchBackend, wait_for_batch
+
+TOPIC = {"topic": "Testing", "category": "dev", "level": "easy", "objective": "x"}
+
+
+def _content(label: str) -> dict:
+    return {field: f"{label} {field}" for field in generate_post.CONTENT_FIELDS}
+
+
+class Patched:
+    """Replaces dict items for the duration of a `with` block."""
+
+    def __init__(self, *items):
+        self.items = items
+        self.saved = []
+
+    def __enter__(self):
+        for target, key, value in self.items:
+            self.saved.append((target, key, target[key]))
+            target[key] = value
+        return self
+
+    def __exit__(self, *exc_info):
+        for target, key, value in reversed(self.saved):
+            target[key] = value
+
+
+def _recording_format_chains(regenerated: list) -> Patched:
+    def format_chain(content_type):
+        def generate(data):
+            regenerated.append(content_type)
+            return _content(f"dedicated {content_type}")
+
+        return RunnableLambda(generate)
+
+    return Patched(
+        *[
+            (generate_post.FORMAT_CHAINS, ct, format_chain(ct))
+            for ct in generate_post.CONTENT_TYPES
+        ]
+    )
+
+
+def _run_batch(backend: LocalBatchBackend) -> dict:
+    bodies = generate_post.render_batch_requests(TOPIC)
+    batch_id = backend.submit(
+        [{"custom_id": name, "body": body} for name, body in bodies.items()]
+    )
+    results = wait_for_batch(backend, batch_id, poll_interval_seconds=0)
+    return {name: results.get(name) for name in bodies}
+
+
+def test_batch_answers_become_content():
+    answers = iter(
+        [
+            json.dumps(_content("batch reel")),
+            "```json\n" + json.dumps(_content("batch post")) + "\n```",
+            "not JSON at all",
+        ]
+    )
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        backend = LocalBatchBackend(tmp_dir, responder=lambda body: next(answers))
+        responses = _run_batch(backend)
+
+    assert list(responses) == list(generate_post.CONTENT_TYPES)
+    content, failed = generate_post.parse_batch_content(responses)
+    assert content == {
+        "reel": _content("batch reel"),
+        "post": _content("batch post"),
+    }
+    assert failed == ["carousel"]
+
+    regenerated = []
+    with _recording_format_chains(regenerated):
+        result = generate_post.complete_content(TOPIC, content, failed)
+
+    assert regenerated == ["carousel"]
+    assert result["topic"] == "Testing"
+    assert result["reel"] == _content("batch reel")
+    assert result["carousel"] == _content("dedicated carousel")
+
+
+def test_failed_requests_are_regenerated():
+    responses = {"reel": json.dumps(_content("batch reel")), "post": None}
+    content, failed = generate_post.parse_batch_content(responses)
+    assert failed == ["post", "carousel"]
+
+    regenerated = []
+    with _recording_format_chains(regenerated):
+        result = generate_post.complete_content(TOPIC, content, failed)
+
+    assert sorted(regenerated) == ["carousel", "post"]
+    assert result["post"] == _content("dedicated post")
+
+
+def test_complete_content_without_failures_makes_no_calls():
+    content = {ct: _content(ct) for ct in generate_post.CONTENT_TYPES}
+    regenerated = []
+    with _recording_format_chains(regenerated):
+        result = generate_post.complete_content(TOPIC, content, [])
+    assert regenerated == []
+    assert result == {**TOPIC, **content}
+
+
+def test_combined_batch_answer_is_split_per_format():
+    combined = {
+        "reel": _content("batch reel"),
+        "post": {"content": "incomplete"},
+        "carousel": _content("batch carousel"),
+    }
+    content, failed = generate_post.parse_batch_content(
+        {"combined": json.dumps(combined)}
+    )
+    assert sorted(content) == ["carousel", "reel"]
+    assert failed == ["post"]
+
+    content, failed = generate_post.parse_batch_content({"combined": None})
+    assert content == {}
+    assert sorted(failed) == sorted(generate_post.CONTENT_TYPES)
+
+
+def test_local_backend_status_and_failed_entries():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        backend = LocalBatchBackend(tmp_dir)
+        assert backend.status("batch_missing") == "failed"
+
+        batch_id = backend.submit([{"custom_id": "reel", "body": {}}])
+        assert backend.status(batch_id) == "in_progress"
+
+        output = {
+            "custom_id": "reel",
+            "response": {"status_code": 500, "body": {"error": "boom"}},
+            "error": None,
+        }
+        backend._path(batch_id, "output").write_text(
+            json.dumps(output) + "\n", encoding="utf-8"
+        )
+        assert backend.status(batch_id) == "completed"
+        assert backend.results(batch_id) == {"reel": None}
+
+
+if __name__ == "__main__":
+    test_batch_answers_become_content()
+    test_failed_requests_are_regenerated()
+    test_complete_content_without_failures_makes_no_calls()
+    test_combined_batch_answer_is_split_per_format()
+    test_local_backend_status_and_failed_entries()
+    print("All batch generation tests passed.")
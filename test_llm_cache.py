@@ -0,0 +1,96 @@
+"""
+Test script for the persistent LLM response cache.
+
+Stores generations in an in-memory `SQLiteLLMCache` and checks that they are
+replayed only for the same prompt, model and cache scope, that they expire
+after the TTL, that the least recently used entries are evicted once the cache
+outgrows its size budget, and that a bypassed run skips lookups but still
+refreshes the cached answer.
+
+Usage:
+    pipenv run python test_llm_cache.py
+    pipenv run pytest test_llm_cache.py
+"""
+
+import time
+
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration
+
+from services.llm_cache import (
+    SQLiteLLMCache,
+    _serialize,
+    bypass_llm_cache,
+    llm_cache_scope,
+)
+
+LLM_STRING = "model=gpt-4o-mini,temperature=0.7"
+
+
+def _answer(text: str) -> list:
+    return [ChatGeneration(message=AIMessage(text))]
+
+
+def _text(generations) -> str | None:
+    return generations[0].message.content if generations else None
+
+
+def test_cached_answer_is_replayed_for_the_same_call_only():
+    cache = SQLiteLLMCache(":memory:")
+    with llm_cache_scope(topic="1"):
+        cache.update("prompt", LLM_STRING, _answer("first"))
+        assert _text(cache.lookup("prompt", LLM_STRING)) == "first"
+        assert cache.lookup("other prompt", LLM_STRING) is None
+        assert cache.lookup("prompt", "model=gpt-4o") is None
+    with llm_cache_scope(topic="2"):
+        assert cache.lookup("prompt", LLM_STRING) is None
+
+
+def test_entries_expire_after_the_ttl():
+    cache = SQLiteLLMCache(":memory:", ttl_seconds=60)
+    cache.update("prompt", LLM_STRING, _answer("old"))
+    assert _text(cache.lookup("prompt", LLM_STRING)) == "old"
+
+    with cache._conn:
+        cache._conn.execute("UPDATE llm_cache SET created_at = created_at - 61")
+    assert cache.lookup("prompt", LLM_STRING) is None
+    (count,) = cache._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()
+    assert count == 0
+
+
+def test_least_recently_used_entries_are_evicted_over_budget():
+    entry_size = len(_serialize(_answer("aaaa")))
+    # Room for about two entries.
+    cache = SQLiteLLMCache(":memory:", max_size_mb=entry_size * 5 / 2 / 1024 / 1024)
+
+    cache.update("a", LLM_STRING, _answer("a" * 4))
+    time.sleep(0.01)
+    cache.update("b", LLM_STRING, _answer("b" * 4))
+    time.sleep(0.01)
+    # Reading 'a' makes 'b' the least recently used entry.
+    assert cache.lookup("a", LLM_STRING) is not None
+    time.sleep(0.01)
+    cache.update("c", LLM_STRING, _answer("c" * 4))
+
+    assert cache.lookup("b", LLM_STRING) is None
+    assert _text(cache.lookup("a", LLM_STRING)) == "aaaa"
+    assert _text(cache.lookup("c", LLM_STRING)) == "cccc"
+
+
+def test_bypass_skips_lookups_but_refreshes_the_entry():
+    cache = SQLiteLLMCache(":memory:")
+    cache.update("prompt", LLM_STRING, _answer("stale"))
+
+    with bypass_llm_cache():
+        assert cache.lookup("prompt", LLM_STRING) is None
+        cache.update("prompt", LLM_STRING, _answer("fresh"))
+    with bypass_llm_cache(False):
+        assert _text(cache.lookup("prompt", LLM_STRING)) == "fresh"
+
+
+if __name__ == "__main__":
+    test_cached_answer_is_replayed_for_the_same_call_only()
+    test_entries_expire_after_the_ttl()
+    test_least_recently_used_entries_are_evicted_over_budget()
+    test_bypass_skips_lookups_but_refreshes_the_entry()
+    print("All LLM cache tests passed.")
@@ -0,0 +1,117 @@
+"""
+Test script for the registry of prompt templates, chat models and chains.
+
+Checks that an entry is built once and shared by later lookups, that editing
+one of its prompt files rebuilds it on the next lookup, and that chat models
+are shared per model parameters.
+
+Usage:
+    pipenv run python test_llm_registry.py
+    pipenv run pytest test_llm_registry.py
+"""
+
+import os
+import tempfile
+import uuid
+from pathlib import Path
+
+from services import llm_registry
+
+
+def _key(name: str):
+    # Unique keys keep the entries of one test out of the others.
+    return (name, uuid.uuid4().hex)
+
+
+def _touch(path: Path, text: str) -> None:
+    """Rewrites a file with a modification time that is certain to differ."""
+    stat = os.stat(path)
+    path.write_text(text, encoding="utf-8")
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+def test_entry_is_built_once():
+    builds = []
+    key = _key("entry")
+
+    def build():
+        builds.append(1)
+        return object()
+
+    first = llm_registry.get_cached(key, build)
+    assert llm_registry.get_cached(key, build) is first
+    assert len(builds) == 1
+
+
+def test_entry_is_rebuilt_when_its_file_changes():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = Path(tmp_dir) / "prompt.txt"
+        path.write_text("Write about {topic}.", encoding="utf-8")
+        builds = []
+        key = _key("file")
+
+        def build():
+            builds.append(path.read_text(encoding="utf-8"))
+            return object()
+
+        first = llm_registry.get_cached(key, build, [str(path)])
+        assert llm_registry.get_cached(key, build, [str(path)]) is first
+
+        _touch(path, "Write a short text about {topic}.")
+        second = llm_registry.get_cached(key, build, [str(path)])
+        assert second is not first
+        assert builds == ["Write about {topic}.", "Write a short text about {topic}."]
+
+
+def test_missing_prompt_file_raises():
+    try:
+        llm_registry.get_cached(_key("missing"), object, ["/nonexistent/prompt.txt"])
+    except FileNotFoundError:
+        pass
+    else:
+        raise AssertionError("A missing prompt file was not reported.")
+
+
+def test_prompt_templates_follow_their_files():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        user = Path(tmp_dir) / "user.txt"
+        system = Path(tmp_dir) / "system.txt"
+        user.write_text("About {topic}.", encoding="utf-8")
+        system.write_text("You write posts.", encoding="utf-8")
+
+        template = llm_registry.get_prompt_template(str(user))
+        assert llm_registry.get_prompt_template(str(user)) is template
+        assert template.format(topic="tests") == "About tests."
+
+        chat = llm_registry.get_chat_prompt(str(user), str(system))
+        assert llm_registry.get_chat_prompt(str(user), str(system)) is chat
+        assert llm_registry.get_chat_prompt(str(user)) is not chat
+
+        # Editing the system prompt rebuilds the chat prompt but not the
+        # template made of the user prompt alone.
+        _touch(system, "You write short posts.")
+        rebuilt = llm_registry.get_chat_prompt(str(user), str(system))
+        assert rebuilt is not chat
+        messages = rebuilt.format_messages(topic="tests")
+        assert [m.content for m in messages] == [
+            "You write short posts.",
+            "About tests.",
+        ]
+        assert llm_registry.get_prompt_template(str(user)) is template
+
+
+def test_chat_models_are_shared_per_parameters():
+    os.environ.setdefault("OPENAI_API_KEY", "sk-test")
+    model = llm_registry.get_chat_model("gpt-4o-mini", 0.7)
+    assert llm_registry.get_chat_model("gpt-4o-mini", 0.7) is model
+    assert llm_registry.get_chat_model("gpt-4o-mini", 0.2) is not model
+    assert llm_registry.get_chat_model("gpt-4o-mini", 0.7, max_tokens=50) is not model
+
+
+if __name__ == "__main__":
+    test_entry_is_built_once()
+    test_entry_is_rebuilt_when_its_file_changes()
+    test_missing_prompt_file_raises()
+    test_prompt_templates_follow_their_files()
+    test_chat_models_are_shared_per_parameters()
+    print("All LLM registry tests passed.")
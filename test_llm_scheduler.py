@@ -0,0 +1,148 @@
+"""
+Test script for the LLM scheduler.
+
+Drives a scheduler with a generous request limit and a token limit, and checks
+that scheduled chat models turn the retries of the OpenAI SDK off and retry
+through admission instead, that streamed calls settle their reservation even
+when the caller stops early, and that an asyncio caller cancelled right after
+its admission gives its tokens back.
+
+Usage:
+    pipenv run python test_llm_scheduler.py
+    pipenv run pytest test_llm_scheduler.py
+"""
+
+import asyncio
+import time
+
+import httpx
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_openai import ChatOpenAI
+from openai import RateLimitError
+
+import services.llm_scheduler as llm_scheduler
+from services.llm_scheduler import LLMScheduler, ScheduledChatOpenAI
+
+MODEL = "test-model"
+
+
+class RecordingScheduler(LLMScheduler):
+    """Scheduler that records the reservations it settles."""
+
+    def __init__(self):
+        super().__init__(MODEL, requests_per_minute=6000, tokens_per_minute=60000)
+        self.settled = []
+
+    def settle(self, estimated, actual):
+        self.settled.append((estimated, actual))
+        super().settle(estimated, actual)
+
+
+class Patched:
+    """Replaces attributes for the duration of a `with` block."""
+
+    def __init__(self, *patches):
+        self.patches = patches
+        self.saved = []
+
+    def __enter__(self):
+        for target, name, value in self.patches:
+            self.saved.append((target, name, getattr(target, name)))
+            setattr(target, name, value)
+        return self
+
+    def __exit__(self, *exc_info):
+        for target, name, value in reversed(self.saved):
+            setattr(target, name, value)
+
+
+def _scheduled(scheduler):
+    return Patched((llm_scheduler, "_schedulers", {MODEL: scheduler}))
+
+
+def _rate_limit_error() -> RateLimitError:
+    request = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+    response = httpx.Response(429, headers={"retry-after": "0"}, request=request)
+    return RateLimitError("Rate limited", response=response, body=None)
+
+
+def test_scheduled_model_retries_through_admission():
+    scheduler = RecordingScheduler()
+    calls = []
+
+    def generate(self, messages, stop=None, run_manager=None, **kwargs):
+        calls.append(time.monotonic())
+        if len(calls) == 1:
+            raise _rate_limit_error()
+        return ChatResult(generations=[ChatGeneration(message=AIMessage("done"))])
+
+    with _scheduled(scheduler), Patched((ChatOpenAI, "_generate", generate)):
+        model = ScheduledChatOpenAI(model=MODEL, api_key="test")
+        assert model.max_retries == 0
+        result = model._generate([HumanMessage("hello")])
+
+    assert result.generations[0].message.content == "done"
+    assert len(calls) == 2
+    # Only the admitted attempt that succeeded is settled.
+    assert len(scheduler.settled) == 1
+
+
+def test_unscheduled_model_keeps_the_sdk_retries():
+    with _scheduled(None):
+        model = ScheduledChatOpenAI(model=MODEL, api_key="test")
+    assert model.max_retries != 0
+
+
+def test_stream_settles_when_the_caller_stops_early():
+    scheduler = RecordingScheduler()
+
+    def stream(self, messages, stop=None, run_manager=None, **kwargs):
+        for text in ["one ", "two ", "three"]:
+            yield ChatGenerationChunk(message=AIMessageChunk(text))
+
+    with _scheduled(scheduler), Patched((ChatOpenAI, "_stream", stream)):
+        model = ScheduledChatOpenAI(model=MODEL, api_key="test", max_tokens=500)
+        chunks = model._stream([HumanMessage("hello")])
+        next(chunks)
+        assert not scheduler.settled
+        chunks.close()
+
+    [(estimated, actual)] = scheduler.settled
+    # The unused completion budget is given back.
+    assert estimated - actual >= 490
+
+
+def test_cancelled_admission_gives_its_tokens_back():
+    scheduler = LLMScheduler(MODEL, requests_per_minute=60, tokens_per_minute=6000)
+    full_requests = scheduler.requests.capacity
+    full_tokens = scheduler.tokens.capacity
+
+    async def cancel_after_admission():
+        task = asyncio.ensure_future(scheduler.admit_async(400))
+        await asyncio.sleep(0)
+        # Block the loop until the dispatcher has admitted the waiter, so the
+        # cancellation lands before the waiter could resume.
+        deadline = time.monotonic() + 5
+        while scheduler.tokens._tokens > full_tokens - 400:
+            assert time.monotonic() < deadline, "The waiter was never admitted."
+            time.sleep(0.01)
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        else:
+            raise AssertionError("The admission was not cancelled.")
+
+    asyncio.run(cancel_after_admission())
+    assert scheduler.tokens._tokens > full_tokens - 1
+    assert scheduler.requests._tokens > full_requests - 0.5
+
+
+if __name__ == "__main__":
+    test_scheduled_model_retries_through_admission()
+    test_unscheduled_model_keeps_the_sdk_retries()
+    test_stream_settles_when_the_caller_stops_early()
+    test_cancelled_admission_gives_its_tokens_back()
+    print("All LLM scheduler tests passed.")
@@ -0,0 +1,110 @@
+"""
+Test script for saving generated content to the sheets.
+
+Checks that a topic is only released (dropped from the unposted index and its
+reservation) once its 'created' mark is in the sheet: not when the direct
+write fails, and only after the flush when the write is journaled.
+
+Usage:
+    pipenv run python test_save_content.py
+    pipenv run pytest test_save_content.py
+"""
+
+import tempfile
+import types
+from pathlib import Path
+
+from langchain_core.runnables import RunnableLambda
+
+import chains.save_content_chain as save_content
+import services.sheets_journal as sheets_journal
+from services.sheets_journal import SheetsWriteJournal
+
+DATA = {
+    "id_topic": "7",
+    "topic": "seventh",
+    "category": "c",
+    "content_data": {"post": {"content": "text"}},
+}
+
+
+class Patched:
+    """Swaps module attributes for the duration of a test."""
+
+    def __init__(self, module, **attributes):
+        self.module = module
+        self.attributes = attributes
+        self.saved = {}
+
+    def __enter__(self):
+        for name, value in self.attributes.items():
+            self.saved[name] = getattr(self.module, name)
+            setattr(self.module, name, value)
+
+    def __exit__(self, *exc_info):
+        for name, value in self.saved.items():
+            setattr(self.module, name, value)
+
+
+def _upsert(status: str, written: list):
+    def upsert(data: dict) -> dict:
+        written.append(data)
+        return {**data, "upsert_status": status}
+
+    return RunnableLambda(upsert)
+
+
+def _chains(topic_status: str, journal, released: list, written: list) -> Patched:
+    return Patched(
+        save_content,
+        get_write_journal=lambda: journal,
+        get_sheets_client=lambda: types.SimpleNamespace(
+            config={}, read_ranges=lambda ranges: {}, has_id_counter=lambda s: True
+        ),
+        _release_topics=released.extend,
+        upsert_sheet_chain=_upsert(topic_status, written),
+        upsert_rows_sheet_chain=_upsert("success", written),
+        allocate_ids_chain=RunnableLambda(lambda data: {"ids": [41]}),
+    )
+
+
+def test_a_failed_topic_update_keeps_the_topic_reserved():
+    released, written = [], []
+    with _chains("failed", None, released, written):
+        result = save_content.save_content_chain.invoke(dict(DATA))
+    assert result["save_status"] == "failed"
+    assert released == []
+    # The content is not saved for a topic that is not marked as created.
+    assert [w["range_name"] for w in written] == ["Topics"]
+
+
+def test_a_direct_save_releases_the_topic():
+    released, written = [], []
+    with _chains("success", None, released, written):
+        result = save_content.save_content_chain.invoke(dict(DATA))
+    assert result["save_status"] == "success"
+    assert released == ["7"]
+
+
+def test_a_journaled_save_releases_the_topic_after_the_flush():
+    released, written = [], []
+    client = types.SimpleNamespace(upsert_rows=lambda *a, **kw: {"status": "ok"})
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        journal = SheetsWriteJournal(
+            path=str(Path(tmp_dir) / "journal.jsonl"), flush_interval_seconds=0
+        )
+        with _chains("success", journal, released, written), Patched(
+            sheets_journal, get_sheets_client=lambda config_key: client
+        ):
+            result = save_content.save_content_chain.invoke(dict(DATA))
+            assert result["save_status"] == "queued"
+            assert released == []
+            assert journal.flush()
+    assert released == ["7"]
+
+
+if __name__ == "__main__":
+    test_a_failed_topic_update_keeps_the_topic_reserved()
+    test_a_direct_save_releases_the_topic()
+    test_a_journaled_save_releases_the_topic_after_the_flush()
+    print("All save content tests passed.")
@@ -0,0 +1,95 @@
+"""
+Test script for compact sheet rows and column projections.
+
+Checks that `SheetRow` behaves like the `dict(zip(header, row))` rows it
+replaces, including short rows and duplicated column names, that all rows of a
+read share one header, and that `ColumnProjection` groups adjacent columns
+into one range and rebuilds rows from a COLUMNS-major answer.
+
+Usage:
+    pipenv run python test_sheet_rows.py
+    pipenv run pytest test_sheet_rows.py
+"""
+
+from services.sheets_rows import ColumnProjection, RowHeader, SheetRow, compact_rows
+
+VALUES = [
+    [" id_topic ", "topic", "created", "note", "note"],
+    ["1", "first", "", "a", "last wins"],
+    ["2", "short"],
+    [],
+]
+
+
+def test_compact_rows_match_dict_rows():
+    rows = compact_rows(VALUES)
+    header = [name.strip() for name in VALUES[0]]
+    for row, values in zip(rows, VALUES[1:]):
+        expected = dict(zip(header, values))
+        assert dict(row) == expected
+        assert row.to_dict() == expected
+        assert len(row) == len(expected)
+        assert row.get("created", "-") == expected.get("created", "-")
+        assert ("created" in row) == ("created" in expected)
+    assert rows[1].get("created") is None
+    try:
+        rows[2]["id_topic"]
+    except KeyError:
+        pass
+    else:
+        raise AssertionError("A missing cell was returned.")
+
+
+def test_rows_share_one_header():
+    rows = compact_rows(VALUES)
+    assert rows[0].header is rows[1].header
+    assert compact_rows([]) == []
+    row = RowHeader(["a", "b"]).row(["1", "2"])
+    assert isinstance(row, SheetRow) and row["b"] == "2"
+
+
+def test_projection_groups_adjacent_columns():
+    header = ["id", "type", "edited", "topic", "published", "image_url"]
+    projection = ColumnProjection(
+        header, ["id", "type", "published", "image_url", "missing"]
+    )
+    assert projection.missing == ["missing"]
+    assert projection.segments == [[0, 1], [4, 5]]
+    assert projection.window_ranges("Generated", 2, 5) == [
+        "Generated!A2:B5",
+        "Generated!E2:F5",
+    ]
+
+
+def test_projection_rebuilds_rows_from_columns():
+    header = ["id", "type", "topic", "published"]
+    projection = ColumnProjection(header, ["id", "published"], compact=True)
+    # Columns drop their trailing empty cells.
+    value_ranges = [{"values": [["1", "2", "3"]]}, {"values": [["x"]]}]
+
+    rows = projection.window_rows(value_ranges, start=2)
+
+    assert [dict(row) for row in rows] == [
+        {"id": "1", "published": "x", "_row": 2},
+        {"id": "2", "published": "", "_row": 3},
+        {"id": "3", "published": "", "_row": 4},
+    ]
+    assert projection.window_rows([{}, {}], start=2) == []
+
+
+def test_projection_of_a_snapshot():
+    projection = ColumnProjection(["id", "type", "topic"], ["topic", "id"])
+    rows = list(projection.snapshot_rows([["id", "type", "topic"], ["1"], []]))
+    assert rows == [
+        {"topic": "", "id": "1", "_row": 2},
+        {"topic": "", "id": "", "_row": 3},
+    ]
+
+
+if __name__ == "__main__":
+    test_compact_rows_match_dict_rows()
+    test_rows_share_one_header()
+    test_projection_groups_adjacent_columns()
+    test_projection_rebuilds_rows_from_columns()
+    test_projection_of_a_snapshot()
+    print("All compact sheet row tests passed.")
@@ -0,0 +1,79 @@
+"""
+Test script for the A1 notation helpers.
+
+Checks column letters beyond column Z, sheet name quoting, and that row writes
+are planned as one range per run of adjacent columns, without ever covering a
+cell that is not being written.
+
+Usage:
+    pipenv run python test_sheets_a1.py
+    pipenv run pytest test_sheets_a1.py
+"""
+
+from services.sheets_a1 import (
+    column_index,
+    column_letter,
+    plan_row_writes,
+    quote_sheet_name,
+    row_range,
+)
+
+
+def test_column_letters_round_trip_beyond_z():
+    cases = {0: "A", 25: "Z", 26: "AA", 27: "AB", 51: "AZ", 52: "BA", 701: "ZZ"}
+    cases[702] = "AAA"
+    for index, letters in cases.items():
+        assert column_letter(index) == letters
+        assert column_index(letters) == index
+    assert column_index("ab") == 27
+
+
+def test_invalid_columns_are_rejected():
+    for call in (lambda: column_letter(-1), lambda: column_index("A1")):
+        try:
+            call()
+        except ValueError:
+            pass
+        else:
+            raise AssertionError("An invalid column was accepted.")
+
+
+def test_sheet_names_are_quoted_when_needed():
+    assert quote_sheet_name("Generated") == "Generated"
+    assert quote_sheet_name("My Topics") == "'My Topics'"
+    assert quote_sheet_name("Bob's") == "'Bob''s'"
+    assert row_range("My Topics", 7, 2, 2) == "'My Topics'!C7"
+    assert row_range("Topics", 7, 25, 27) == "Topics!Z7:AB7"
+
+
+def test_adjacent_cells_share_one_range():
+    data = plan_row_writes("Generated", {5: {2: "c", 0: "a", 1: "b"}})
+    assert data == [{"range": "Generated!A5:C5", "values": [["a", "b", "c"]]}]
+
+
+def test_gaps_split_a_row_and_rows_are_ordered():
+    data = plan_row_writes(
+        "Generated",
+        {9: {26: "aa"}, 3: {0: "a", 1: "b", 3: "d", 27: "ab", 28: "ac"}},
+    )
+    assert data == [
+        {"range": "Generated!A3:B3", "values": [["a", "b"]]},
+        {"range": "Generated!D3", "values": [["d"]]},
+        {"range": "Generated!AB3:AC3", "values": [["ab", "ac"]]},
+        {"range": "Generated!AA9", "values": [["aa"]]},
+    ]
+
+
+def test_no_updates_plan_no_writes():
+    assert plan_row_writes("Generated", {}) == []
+    assert plan_row_writes("Generated", {4: {}}) == []
+
+
+if __name__ == "__main__":
+    test_column_letters_round_trip_beyond_z()
+    test_invalid_columns_are_rejected()
+    test_sheet_names_are_quoted_when_needed()
+    test_adjacent_cells_share_one_range()
+    test_gaps_split_a_row_and_rows_are_ordered()
+    test_no_updates_plan_no_writes()
+    print("All A1 notation tests passed.")
@@ -0,0 +1,96 @@
+"""
+Test script for multi-range reads through `values.batchGet`.
+
+Serves ranges from memory in place of the Sheets API and checks that ranges
+missing from the snapshot cache are fetched together in one request, that
+cached ranges are served without one, and that a single row is read with its
+header in one round-trip.
+
+Usage:
+    pipenv run python test_sheets_batch_get.py
+    pipenv run pytest test_sheets_batch_get.py
+"""
+
+import uuid
+
+import httplib2
+from googleapiclient.errors import HttpError
+
+from services.sheets_client import GoogleSheetsClient
+
+RANGES = {
+    "Topics": [["id_topic", "topic"], ["1", "first"]],
+    "Generated": [["id", "type"], ["7", "POST"]],
+    "Generated!1:1": [["id", "type"]],
+    "Generated!2:2": [["7", "POST"]],
+}
+
+
+class FakeBatchGet:
+    """Answers `values.batchGet` from RANGES and records every request."""
+
+    def __init__(self, fail: bool = False):
+        self.requests = []
+        self.fail = fail
+
+    def __call__(self, ranges, **params):
+        self.requests.append(list(ranges))
+        if self.fail:
+            raise HttpError(httplib2.Response({"status": 500}), b"")
+        return [{"values": RANGES[r]} if RANGES[r] else {} for r in ranges]
+
+
+def _offline_client(batch_get: FakeBatchGet) -> GoogleSheetsClient:
+    """A client that reads through `batch_get` instead of the Sheets API."""
+    client = GoogleSheetsClient.__new__(GoogleSheetsClient)
+    # A fresh id per client, so no snapshot of another test is served.
+    client.config = {"spreadsheet_id": f"test-{uuid.uuid4().hex}"}
+    client.creds = object()
+    client.mirror = None
+    client._batch_get = batch_get
+    return client
+
+
+def test_missing_ranges_are_fetched_in_one_request():
+    batch_get = FakeBatchGet()
+    client = _offline_client(batch_get)
+
+    values = client.read_ranges(["Topics", "Generated", "Topics"])
+
+    assert values == {"Topics": RANGES["Topics"], "Generated": RANGES["Generated"]}
+    assert batch_get.requests == [["Topics", "Generated"]]
+
+
+def test_cached_ranges_are_not_fetched_again():
+    batch_get = FakeBatchGet()
+    client = _offline_client(batch_get)
+    client.read_ranges(["Topics"])
+
+    values = client.read_ranges(["Topics", "Generated"])
+
+    assert values["Topics"] == RANGES["Topics"]
+    assert batch_get.requests == [["Topics"], ["Generated"]]
+    client.read_ranges(["Topics", "Generated"])
+    assert len(batch_get.requests) == 2
+
+
+def test_read_row_fetches_the_header_and_row_together():
+    batch_get = FakeBatchGet()
+    client = _offline_client(batch_get)
+
+    assert client.read_row(2, range_name="Generated") == {"id": "7", "type": "POST"}
+    assert batch_get.requests == [["Generated!1:1", "Generated!2:2"]]
+
+
+def test_failed_reads_return_none():
+    client = _offline_client(FakeBatchGet(fail=True))
+    assert client.read_ranges(["Topics"]) is None
+    assert client.read_row(2, range_name="Generated") is None
+
+
+if __name__ == "__main__":
+    test_missing_ranges_are_fetched_in_one_request()
+    test_cached_ranges_are_not_fetched_again()
+    test_read_row_fetches_the_header_and_row_together()
+    test_failed_reads_return_none()
+    print("All batchGet read tests passed.")
@@ -0,0 +1,151 @@
+"""
+Test script for the process-wide sheet snapshot cache.
+
+Drives `SheetSnapshotCache` with a fake clock and counting fetchers, and checks
+that snapshots are served from memory while fresh, revalidated against the
+change marker once expired, re-downloaded when the marker moved, and dropped
+by `invalidate`.
+
+Usage:
+    pipenv run python test_sheets_cache.py
+    pipenv run pytest test_sheets_cache.py
+"""
+
+from services.sheets_cache import SheetSnapshotCache
+
+SPREADSHEET = "test-spreadsheet"
+VALUES = [["id", "topic"], ["1", "a"], ["2", "b"]]
+
+
+class FakeClock:
+    """Monotonic clock moved forward by hand."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class CountingFetch:
+    """Returns fixed values and counts how often the range is downloaded."""
+
+    def __init__(self, values=VALUES):
+        self.values = values
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return [list(row) for row in self.values]
+
+
+def test_fresh_snapshot_is_served_from_memory():
+    clock = FakeClock()
+    cache = SheetSnapshotCache(clock=clock)
+    fetch = CountingFetch()
+
+    first = cache.get(SPREADSHEET, "Topics", fetch, max_age=30)
+    clock.now += 29
+    second = cache.get(SPREADSHEET, "Topics", fetch, max_age=30)
+
+    assert fetch.calls == 1
+    assert second is first
+    assert second.find_row("id", "2") == 3
+
+
+def test_expired_snapshot_without_marker_is_downloaded_again():
+    clock = FakeClock()
+    cache = SheetSnapshotCache(clock=clock)
+    fetch = CountingFetch()
+
+    cache.get(SPREADSHEET, "Topics", fetch, max_age=30)
+    clock.now += 30
+    cache.get(SPREADSHEET, "Topics", fetch, max_age=30)
+
+    assert fetch.calls == 2
+
+
+def test_expired_snapshot_is_revalidated_by_an_unchanged_marker():
+    clock = FakeClock()
+    cache = SheetSnapshotCache(clock=clock)
+    fetch = CountingFetch()
+    marker = {"value": "rev-1"}
+
+    first = cache.get(SPREADSHEET, "Topics", fetch, lambda: marker["value"], 30)
+    clock.now += 60
+    second = cache.get(SPREADSHEET, "Topics", fetch, lambda: marker["value"], 30)
+    assert fetch.calls == 1
+    assert second is first
+
+    # Revalidation restarts the max age, so the next read skips the marker.
+    clock.now += 10
+    cache.get(SPREADSHEET, "Topics", fetch, lambda: 1 / 0, 30)
+
+    marker["value"] = "rev-2"
+    clock.now += 60
+    third = cache.get(SPREADSHEET, "Topics", fetch, lambda: marker["value"], 30)
+    assert fetch.calls == 2
+    assert third is not first
+    assert third.marker == "rev-2"
+
+
+def test_put_stores_values_read_outside_get():
+    clock = FakeClock()
+    cache = SheetSnapshotCache(clock=clock)
+    fetch = CountingFetch()
+
+    cache.put(SPREADSHEET, "Topics", [list(row) for row in VALUES])
+    snapshot = cache.get(SPREADSHEET, "Topics", fetch, max_age=30)
+    assert fetch.calls == 0
+    assert snapshot.values == VALUES
+
+    cached, missing = cache.peek_many(
+        SPREADSHEET, ["Topics", "Generated", "Topics"], max_age=30
+    )
+    assert cached == {"Topics": VALUES}
+    assert missing == ["Generated"]
+
+    clock.now += 30
+    assert cache.peek(SPREADSHEET, "Topics", max_age=30) is None
+
+
+def test_invalidate_drops_the_snapshots_of_a_sheet():
+    cache = SheetSnapshotCache(clock=FakeClock())
+    for range_name in ["Topics", "'Topics'!1:1", "Generated"]:
+        cache.put(SPREADSHEET, range_name, VALUES)
+    cache.put("other-spreadsheet", "Topics", VALUES)
+
+    cache.invalidate(SPREADSHEET, "Topics", keep="'Topics'!1:1")
+    assert cache.peek(SPREADSHEET, "Topics") is None
+    assert cache.peek(SPREADSHEET, "'Topics'!1:1") is not None
+    assert cache.peek(SPREADSHEET, "Generated") is not None
+    assert cache.peek("other-spreadsheet", "Topics") is not None
+
+    cache.invalidate(SPREADSHEET)
+    assert cache.peek(SPREADSHEET, "'Topics'!1:1") is None
+    assert cache.peek(SPREADSHEET, "Generated") is None
+    assert cache.peek("other-spreadsheet", "Topics") is not None
+
+
+def test_writes_keep_the_key_index_current():
+    cache = SheetSnapshotCache(clock=FakeClock())
+    snapshot = cache.put(SPREADSHEET, "Topics", [list(row) for row in VALUES])
+    assert snapshot.find_row("id", "1") == 2
+
+    snapshot.update_cells(2, {0: "7"})
+    snapshot.append_rows(5, [["8", "c"]])
+
+    assert snapshot.find_row("id", "1") is None
+    assert snapshot.find_row("id", "7") == 2
+    assert snapshot.find_row("id", "8") == 5
+    assert snapshot.values[3] == []
+
+
+if __name__ == "__main__":
+    test_fresh_snapshot_is_served_from_memory()
+    test_expired_snapshot_without_marker_is_downloaded_again()
+    test_expired_snapshot_is_revalidated_by_an_unchanged_marker()
+    test_put_stores_values_read_outside_get()
+    test_invalidate_drops_the_snapshots_of_a_sheet()
+    test_writes_keep_the_key_index_current()
+    print("All sheet snapshot cache tests passed.")
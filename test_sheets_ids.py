@@ -0,0 +1,142 @@
+"""
+Test script for the id allocator of the 'Generated' sheet.
+
+Runs two allocators, standing in for two worker processes, against an
+in-memory claim sheet that serialises appends the way Google Sheets does, and
+checks that their ids never overlap, including when both set up the claim
+sheet at the same time. Also runs concurrent allocations of one client on a
+sheet without a claim sheet, as concurrent batch saves do.
+
+Usage:
+    pipenv run python test_sheets_ids.py
+    pipenv run pytest test_sheets_ids.py
+"""
+
+import threading
+import uuid
+
+from services.sheets_cache import SheetSnapshot
+from services.sheets_client import GoogleSheetsClient
+from services.sheets_ids import IdAllocator, SheetCounterBackend
+
+
+class FakeClaimSheet:
+    """A claim sheet whose appends land below each other, like `values.append`."""
+
+    def __init__(self, sheet_name: str = "GeneratedIds"):
+        self.sheet_name = sheet_name
+        self.rows: list[list] = []
+        self._lock = threading.Lock()
+
+    def get_values(self, range_name: str) -> list:
+        assert range_name == f"{self.sheet_name}!A1:B1"
+        with self._lock:
+            return [list(self.rows[0])] if self.rows else []
+
+    def append_values(self, range_name: str, values: list) -> dict:
+        assert range_name == f"{self.sheet_name}!A:B"
+        with self._lock:
+            first = len(self.rows) + 1
+            self.rows.extend(list(row) for row in values)
+            last = len(self.rows)
+        return {
+            "updates": {
+                "updatedRange": f"{self.sheet_name}!A{first}:B{last}",
+                "updatedRows": len(values),
+            }
+        }
+
+
+def _allocator(sheet: FakeClaimSheet, seed: int, get_values=None) -> IdAllocator:
+    backend = SheetCounterBackend(
+        get_values or sheet.get_values, sheet.append_values, sheet.sheet_name
+    )
+    return IdAllocator(backend, seed=lambda: seed)
+
+
+def test_interleaved_allocators_never_share_ids():
+    sheet = FakeClaimSheet()
+    # Both workers read the empty claim sheet before either sets it up.
+    setup_barrier = threading.Barrier(2)
+    first_read = {"done": set()}
+
+    def racing_get_values(range_name: str) -> list:
+        worker = threading.current_thread().name
+        if worker not in first_read["done"]:
+            first_read["done"].add(worker)
+            values = sheet.get_values(range_name)
+            setup_barrier.wait(timeout=5)
+            return values
+        return sheet.get_values(range_name)
+
+    # The workers saw different highest ids; only the first base counts.
+    allocators = [
+        _allocator(sheet, 10, racing_get_values),
+        _allocator(sheet, 12, racing_get_values),
+    ]
+    claim_barrier = threading.Barrier(2)
+    allocated: list[list[int]] = [[], []]
+
+    def work(index: int) -> None:
+        for count in (1, 3, 2, 3):
+            claim_barrier.wait(timeout=5)
+            allocated[index].extend(allocators[index].allocate(count))
+
+    threads = [
+        threading.Thread(target=work, args=(i,), name=f"worker-{i}") for i in (0, 1)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    ids = allocated[0] + allocated[1]
+    assert len(ids) == 18
+    assert len(set(ids)) == len(ids), f"Duplicated ids: {sorted(ids)}"
+    base = int(sheet.rows[0][1])
+    assert min(ids) > base >= 10
+
+
+def test_blocks_are_contiguous_and_follow_the_base():
+    sheet = FakeClaimSheet()
+    allocator = _allocator(sheet, 41)
+    assert allocator.allocate(3) == [42, 43, 44]
+    assert allocator.allocate(1) == [45]
+    # A second process reads the base instead of seeding it again.
+    assert _allocator(sheet, 0).allocate(2) == [46, 47]
+
+
+def test_concurrent_saves_without_a_claim_sheet_never_share_ids():
+    client = GoogleSheetsClient.__new__(GoogleSheetsClient)
+    client.config = {"spreadsheet_id": f"test-{uuid.uuid4().hex}", "id_counters": {}}
+    client.creds = object()
+    client.mirror = None
+    client._allocators = {}
+    client._allocators_lock = threading.Lock()
+    # The saves have not reached the sheet yet, so every one sees id 7 last.
+    client._read_snapshot = lambda sheet_name: SheetSnapshot(
+        values=[["id", "topic"], ["7", "seventh"]], marker=None, fetched_at=0.0
+    )
+
+    barrier = threading.Barrier(4)
+    allocated: list[list[int]] = [[] for _ in range(4)]
+
+    def save(index: int) -> None:
+        barrier.wait(timeout=5)
+        allocated[index].extend(client.allocate_ids("Generated", 3))
+
+    threads = [threading.Thread(target=save, args=(i,)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    ids = [row_id for block in allocated for row_id in block]
+    assert sorted(ids) == list(range(8, 20)), f"Duplicated ids: {sorted(ids)}"
+
+
+if __name__ == "__main__":
+    test_interleaved_allocators_never_share_ids()
+    test_blocks_are_contiguous_and_follow_the_base()
+    test_concurrent_saves_without_a_claim_sheet_never_share_ids()
+    print("All id allocator tests passed.")
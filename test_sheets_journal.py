@@ -0,0 +1,115 @@
+"""
+Test script for the write-behind journal of sheet updates.
+
+Flushes the journal against an in-memory client whose first write raises, and
+checks that the rows of the failed flush stay in the journal file and are
+written by the next flush. Also runs two journals, standing in for two
+processes, against one journal file, and checks that every row is written
+exactly once and none is erased by the other journal's flush.
+
+Usage:
+    pipenv run python test_sheets_journal.py
+    pipenv run pytest test_sheets_journal.py
+"""
+
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import services.sheets_journal as sheets_journal
+from services.sheets_journal import SheetsWriteJournal
+
+
+class FlakyClient:
+    """Raises on the first `upsert_rows` call, then records the rows written."""
+
+    def __init__(self):
+        self.calls = 0
+        self.written: list[dict] = []
+
+    def upsert_rows(self, filter_key, rows, range_name=None):
+        self.calls += 1
+        if self.calls == 1:
+            raise ConnectionError("connection reset")
+        self.written.extend(rows)
+        return {"status": "success"}
+
+
+def test_a_raised_write_keeps_the_rows_pending():
+    client = FlakyClient()
+    get_sheets_client = sheets_journal.get_sheets_client
+    sheets_journal.get_sheets_client = lambda config_key: client
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = Path(tmp_dir) / "journal.jsonl"
+            journal = SheetsWriteJournal(path=str(path), flush_interval_seconds=0)
+            journal.enqueue("Topics", "id_topic", [{"id_topic": "7", "created": "x"}])
+
+            assert journal.flush() is False
+            assert journal.pending_count() == 1
+            # A new process replays the rows that were not written.
+            assert SheetsWriteJournal(path=str(path)).pending_count() == 1
+
+            assert journal.flush() is True
+            assert client.written == [{"id_topic": "7", "created": "x"}]
+            assert journal.pending_count() == 0
+            assert path.read_text(encoding="utf-8") == ""
+    finally:
+        sheets_journal.get_sheets_client = get_sheets_client
+
+
+class RecordingClient:
+    """Records every row written, slowly enough for flushes to overlap."""
+
+    def __init__(self):
+        self.written: list[dict] = []
+        self._lock = threading.Lock()
+
+    def upsert_rows(self, filter_key, rows, range_name=None):
+        time.sleep(0.05)
+        with self._lock:
+            self.written.extend(rows)
+        return {"status": "success"}
+
+
+def test_two_journals_on_one_file_write_every_row_once():
+    client = RecordingClient()
+    get_sheets_client = sheets_journal.get_sheets_client
+    sheets_journal.get_sheets_client = lambda config_key: client
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = str(Path(tmp_dir) / "journal.jsonl")
+            journals = [
+                SheetsWriteJournal(path=path, flush_interval_seconds=0)
+                for _ in range(2)
+            ]
+            journals[0].enqueue("Generated", "id", [{"id": "1"}, {"id": "2"}])
+            journals[1].enqueue("Generated", "id", [{"id": "3"}])
+            assert journals[1].pending_count() == 3
+
+            def enqueue_and_flush(index: int) -> None:
+                journals[index].enqueue("Generated", "id", [{"id": f"1{index}"}])
+                journals[index].flush()
+
+            threads = [
+                threading.Thread(target=enqueue_and_flush, args=(i,)) for i in (0, 1)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            # Rows enqueued by one journal are flushed by whichever flushes next.
+            assert journals[0].flush() and journals[1].flush()
+
+            ids = sorted(row["id"] for row in client.written)
+            assert ids == ["1", "10", "11", "2", "3"], f"Written: {ids}"
+            assert journals[0].pending_count() == journals[1].pending_count() == 0
+    finally:
+        sheets_journal.get_sheets_client = get_sheets_client
+
+
+if __name__ == "__main__":
+    test_a_raised_write_keeps_the_rows_pending()
+    test_two_journals_on_one_file_write_every_row_once()
+    print("All write journal tests passed.")
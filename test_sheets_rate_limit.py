@@ -0,0 +1,69 @@
+"""
+Test script for retrying rejected Sheets requests.
+
+Executes fake requests that fail with a 503 and checks that reads and updates
+are retried while appends, which may already have been applied, are not.
+
+Usage:
+    pipenv run python test_sheets_rate_limit.py
+    pipenv run pytest test_sheets_rate_limit.py
+"""
+
+import httplib2
+from googleapiclient.errors import HttpError
+
+from services.sheets_rate_limit import RetryPolicy, SheetsRateLimiter
+
+
+class FailingRequest:
+    """A request that is rejected with `status` a number of times, then succeeds."""
+
+    def __init__(self, status: int, failures: int):
+        self.status = status
+        self.failures = failures
+        self.calls = 0
+
+    def execute(self) -> dict:
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise HttpError(httplib2.Response({"status": self.status}), b"")
+        return {"ok": True}
+
+
+def _limiter() -> SheetsRateLimiter:
+    return SheetsRateLimiter(
+        reads_per_minute=6000,
+        writes_per_minute=6000,
+        retry=RetryPolicy(max_attempts=3, base_delay=0.001, max_delay=0.001),
+    )
+
+
+def test_reads_and_updates_are_retried_on_5xx():
+    for kind in ("read", "write"):
+        request = FailingRequest(503, failures=2)
+        assert _limiter().execute(request, kind) == {"ok": True}
+        assert request.calls == 3
+
+
+def test_appends_are_not_retried_on_5xx():
+    request = FailingRequest(503, failures=1)
+    try:
+        _limiter().execute(request, "append")
+    except HttpError as err:
+        assert err.resp.status == 503
+    else:
+        raise AssertionError("The append was retried.")
+    assert request.calls == 1
+
+
+def test_appends_are_retried_on_429():
+    request = FailingRequest(429, failures=1)
+    assert _limiter().execute(request, "append") == {"ok": True}
+    assert request.calls == 2
+
+
+if __name__ == "__main__":
+    test_reads_and_updates_are_retried_on_5xx()
+    test_appends_are_not_retried_on_5xx()
+    test_appends_are_retried_on_429()
+    print("All Sheets retry tests passed.")
@@ -0,0 +1,67 @@
+"""
+Test script for the process-wide Google Sheets service registry.
+
+Builds services from the bundled discovery document with static credentials,
+without calling the API, and checks that credentials are resolved once per
+config key, that each thread reuses its own service, and that a service is
+rebuilt when its credentials change.
+
+Usage:
+    pipenv run python test_sheets_service.py
+    pipenv run pytest test_sheets_service.py
+"""
+
+import threading
+
+from google.oauth2.credentials import Credentials
+
+from services.sheets_service import SheetsServiceRegistry
+
+
+def test_credentials_are_resolved_once_per_key():
+    registry = SheetsServiceRegistry()
+    calls = []
+
+    def factory():
+        calls.append(1)
+        return Credentials(token="token")
+
+    first = registry.get_credentials("google_sheets", factory)
+    assert registry.get_credentials("google_sheets", factory) is first
+    assert len(calls) == 1
+
+    registry.get_credentials("other_sheets", factory)
+    assert len(calls) == 2
+
+
+def test_failed_credentials_are_not_cached():
+    registry = SheetsServiceRegistry()
+    assert registry.get_credentials("google_sheets", lambda: None) is None
+    creds = Credentials(token="token")
+    assert registry.get_credentials("google_sheets", lambda: creds) is creds
+
+
+def test_services_are_shared_per_thread_and_rebuilt_for_new_credentials():
+    registry = SheetsServiceRegistry()
+    creds = Credentials(token="token")
+
+    service = registry.get_service("google_sheets", creds)
+    assert registry.get_service("google_sheets", creds) is service
+
+    other_thread = []
+    thread = threading.Thread(
+        target=lambda: other_thread.append(registry.get_service("google_sheets", creds))
+    )
+    thread.start()
+    thread.join()
+    assert other_thread[0] is not service
+
+    rotated = registry.get_service("google_sheets", Credentials(token="rotated"))
+    assert rotated is not service
+
+
+if __name__ == "__main__":
+    test_credentials_are_resolved_once_per_key()
+    test_failed_credentials_are_not_cached()
+    test_services_are_shared_per_thread_and_rebuilt_for_new_credentials()
+    print("All Sheets service registry tests passed.")
@@ -0,0 +1,169 @@
+"""
+Test script for streaming sheets in row windows.
+
+Serves a sheet from memory with the trimming of `values.get` and
+`values.batchGet` (trailing empty rows or cells are dropped) and checks that
+rows after a blank gap are still streamed when the gap straddles a window
+boundary, and that the selection chains report a sheet that fails mid-stream
+the way they report an unreadable sheet.
+
+Usage:
+    pipenv run python test_sheets_streaming.py
+    pipenv run pytest test_sheets_streaming.py
+"""
+
+import re
+import uuid
+
+import httplib2
+from googleapiclient.errors import HttpError
+
+import chains.get_content_chain as get_content_chain
+from chains.select_topic import _select_topic_logic
+from services.sheets_client import GoogleSheetsClient
+
+HEADER = ["id_topic", "topic", "created"]
+
+
+class FakeSheet:
+    """Grid of one sheet, read with the semantics of `values.get`."""
+
+    def __init__(self, rows: list[list[str]]):
+        self.rows = rows
+
+    def _slice(self, range_name: str) -> list[list[str]]:
+        match = re.fullmatch(r"Topics!(\d+):(\d+)", range_name)
+        assert match, f"Unexpected range {range_name}"
+        start, end = int(match.group(1)), int(match.group(2))
+        rows = self.rows[start - 1 : end]
+        # Trailing empty rows are not returned.
+        while rows and not any(rows[-1]):
+            rows = rows[:-1]
+        return [list(row) for row in rows]
+
+    def get_values(self, range_name: str) -> list[list[str]]:
+        return self._slice(range_name)
+
+    def batch_get(self, ranges: list[str], majorDimension: str) -> list[dict]:
+        assert majorDimension == "COLUMNS"
+        value_ranges = []
+        for range_name in ranges:
+            match = re.fullmatch(r"Topics!([A-Z])(\d+):([A-Z])(\d+)", range_name)
+            assert match, f"Unexpected range {range_name}"
+            first, last = ord(match.group(1)) - 65, ord(match.group(3)) - 65
+            rows = self._slice(f"Topics!{match.group(2)}:{match.group(4)}")
+            columns = []
+            for i in range(first, last + 1):
+                column = [row[i] if i < len(row) else "" for row in rows]
+                # Trailing empty cells of a column are not returned.
+                while column and not column[-1]:
+                    column.pop()
+                columns.append(column)
+            while columns and not columns[-1]:
+                columns.pop()
+            value_ranges.append({"values": columns} if columns else {})
+        return value_ranges
+
+    def row_count(self, sheet_name: str) -> int:
+        return len(self.rows)
+
+
+def _offline_client(sheet: FakeSheet, window_rows: int) -> GoogleSheetsClient:
+    """A client that reads `sheet` instead of calling the Sheets API."""
+    client = GoogleSheetsClient.__new__(GoogleSheetsClient)
+    client.config = {
+        # A fresh id per client, so no cached snapshot is ever served.
+        "spreadsheet_id": f"test-{uuid.uuid4().hex}",
+        "range_name": "Topics",
+        "read_window_rows": window_rows,
+    }
+    client.creds = object()
+    client.mirror = None
+    client._get_values = sheet.get_values
+    client._batch_get = sheet.batch_get
+    client._row_count = sheet.row_count
+    return client
+
+
+def _sheet_with_gap() -> FakeSheet:
+    # Windows of 3 data rows cover rows 2-4, 5-7 and 8-10; the blank rows 4-5
+    # end the first window early and open the second one.
+    rows = [
+        HEADER,
+        ["1", "first", ""],
+        ["2", "second", ""],
+        [],
+        [],
+        ["5", "after the gap", ""],
+        ["6", "last", ""],
+        [],
+        [],
+    ]
+    return FakeSheet(rows)
+
+
+def test_read_sheet_iter_streams_past_a_gap_at_a_window_boundary():
+    client = _offline_client(_sheet_with_gap(), window_rows=3)
+    ids = [row.get("id_topic") for row in client.read_sheet_iter("Topics")]
+    assert [i for i in ids if i] == ["1", "2", "5", "6"]
+
+
+def test_read_columns_iter_streams_past_a_gap_at_a_window_boundary():
+    client = _offline_client(_sheet_with_gap(), window_rows=3)
+    rows = client.read_columns_iter(["id_topic", "created"], range_name="Topics")
+    assert [(row["id_topic"], row["_row"]) for row in rows if row["id_topic"]] == [
+        ("1", 2),
+        ("2", 3),
+        ("5", 6),
+        ("6", 7),
+    ]
+
+
+def _failing_after(sheet: FakeSheet, reads: int):
+    """Wraps `sheet.get_values` so every read after the first `reads` fails."""
+    calls = 0
+
+    def get_values(range_name: str) -> list[list[str]]:
+        nonlocal calls
+        calls += 1
+        if calls > reads:
+            raise HttpError(httplib2.Response({"status": 500}), b"")
+        return sheet.get_values(range_name)
+
+    return get_values
+
+
+def test_select_topic_reports_a_sheet_failing_mid_stream():
+    client = _offline_client(_sheet_with_gap(), window_rows=3)
+    # The header and the first window are read, the second window fails.
+    client._get_values = _failing_after(_sheet_with_gap(), reads=2)
+    try:
+        _select_topic_logic({"sheet_data": client.read_sheet_iter("Topics")})
+    except ValueError as err:
+        assert "No data read" in str(err)
+    else:
+        raise AssertionError("The failed read was not reported.")
+
+
+def test_get_content_returns_nothing_when_the_sheet_fails():
+    class FailingClient:
+        mirror = None
+
+        def read_columns_iter(self, columns, range_name=None, compact=False):
+            raise HttpError(httplib2.Response({"status": 500}), b"")
+            yield
+
+    get_sheets_client = get_content_chain.get_sheets_client
+    get_content_chain.get_sheets_client = FailingClient
+    try:
+        assert get_content_chain.get_content_to_publish({}) == {}
+    finally:
+        get_content_chain.get_sheets_client = get_sheets_client
+
+
+if __name__ == "__main__":
+    test_read_sheet_iter_streams_past_a_gap_at_a_window_boundary()
+    test_read_columns_iter_streams_past_a_gap_at_a_window_boundary()
+    test_select_topic_reports_a_sheet_failing_mid_stream()
+    test_get_content_returns_nothing_when_the_sheet_fails()
+    print("All sheet streaming tests passed.")
@@ -0,0 +1,126 @@
+"""
+Test script for batched upsert planning.
+
+Plans upserts of several rows against a cached sheet snapshot and checks which
+cells are updated and which rows are appended, then applies the completed
+writes back to the snapshot. Also checks the key index the plans look rows up
+in: built once per column, first occurrence winning, and kept current by
+writes.
+
+Usage:
+    pipenv run python test_sheets_upsert.py
+    pipenv run pytest test_sheets_upsert.py
+"""
+
+import time
+
+from services.sheets_cache import SheetSnapshot
+from services.sheets_upsert import apply_upsert, initial_rows, plan_upsert
+
+HEADER = ["id", "topic", "created", "published"]
+
+
+def _snapshot() -> SheetSnapshot:
+    values = [
+        list(HEADER),
+        ["1", "first", "", ""],
+        ["2", "second", "x", ""],
+    ]
+    return SheetSnapshot(values, None, time.monotonic())
+
+
+def test_plan_splits_updates_and_new_rows():
+    plan = plan_upsert(
+        _snapshot(),
+        "id",
+        [
+            {"id": "2", "published": "x", "unknown": "ignored"},
+            {"id": 3, "topic": "third"},
+            {"id": "1", "created": "x"},
+        ],
+    )
+    # The key column is not rewritten, and unknown columns are dropped.
+    assert plan.cell_updates == {3: {3: "x"}, 2: {2: "x"}}
+    assert plan.new_rows == {"3": [3, "third", None, None]}
+    assert not plan.is_empty
+
+
+def test_plan_merges_duplicate_new_rows():
+    plan = plan_upsert(
+        _snapshot(),
+        "id",
+        [{"id": "4", "topic": "fourth"}, {"id": "4", "created": "x"}],
+    )
+    assert plan.cell_updates == {}
+    assert plan.new_rows == {"4": ["4", "fourth", "x", None]}
+
+
+def test_plan_rejects_an_unknown_filter_key():
+    try:
+        plan_upsert(_snapshot(), "id_topic", [{"id_topic": "1"}])
+    except KeyError as err:
+        assert err.args == ("id_topic",)
+    else:
+        raise AssertionError("An unknown filter key was accepted.")
+
+
+def test_apply_writes_the_plan_into_the_snapshot():
+    snapshot = _snapshot()
+    plan = plan_upsert(
+        snapshot,
+        "id",
+        [{"id": "1", "created": "x"}, {"id": "3", "topic": "third"}],
+    )
+
+    written = apply_upsert(snapshot, plan, appended_at=4)
+
+    assert written == [2, 4]
+    assert snapshot.values[1] == ["1", "first", "x", ""]
+    assert snapshot.values[3] == ["3", "third", "", ""]
+    assert snapshot.find_row("id", "3") == 4
+
+
+def test_apply_skips_new_rows_without_an_append_position():
+    snapshot = _snapshot()
+    plan = plan_upsert(snapshot, "id", [{"id": "3", "topic": "third"}])
+    assert apply_upsert(snapshot, plan, appended_at=None) == []
+    assert len(snapshot.values) == 3
+
+
+def test_initial_rows_lay_out_columns_in_first_seen_order():
+    rows = initial_rows([{"id": "1", "topic": "a"}, {"id": "2", "created": "x"}])
+    assert rows == [["id", "topic", "created"], ["1", "a", None], ["2", None, "x"]]
+
+
+def test_key_index_is_built_once_and_follows_writes():
+    snapshot = _snapshot()
+    snapshot.values.append(["1", "duplicate", "", ""])
+
+    index = snapshot.key_index("id")
+    assert snapshot.key_index("id") is index
+    # The first row holding a key wins, as the sheet scan it replaces did.
+    assert index == {"1": 2, "2": 3}
+
+    snapshot.update_cells(3, {0: "5"})
+    snapshot.append_rows(5, [["6", "sixth"]])
+    assert snapshot.find_row("id", "2") is None
+    assert snapshot.find_row("id", "5") == 3
+    assert snapshot.find_row("id", 6) == 5
+
+    try:
+        snapshot.key_index("missing")
+    except KeyError:
+        pass
+    else:
+        raise AssertionError("An index was built for a missing column.")
+
+
+if __name__ == "__main__":
+    test_plan_splits_updates_and_new_rows()
+    test_plan_merges_duplicate_new_rows()
+    test_plan_rejects_an_unknown_filter_key()
+    test_apply_writes_the_plan_into_the_snapshot()
+    test_apply_skips_new_rows_without_an_append_position()
+    test_initial_rows_lay_out_columns_in_first_seen_order()
+    test_key_index_is_built_once_and_follows_writes()
+    print("All sheet upsert tests passed.")
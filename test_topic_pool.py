@@ -0,0 +1,79 @@
+"""
+Test script for the Telegram topic pool and its rotation ledger.
+
+Draws topics from a temporary topics file and checks that no topic repeats
+within a cycle, that a new cycle does not open with the topic that closed the
+last one, that the ledger is shared by pools of the same files, and that
+editing the topics file mid-cycle keeps the topics already used.
+
+Usage:
+    pipenv run python test_topic_pool.py
+    pipenv run pytest test_topic_pool.py
+"""
+
+import tempfile
+from pathlib import Path
+
+from services.topic_pool import TopicPool
+
+
+def _pool(tmp_dir: str, lines: list[str]) -> TopicPool:
+    topics_file = Path(tmp_dir) / "topics.txt"
+    topics_file.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    return TopicPool(str(topics_file), str(Path(tmp_dir) / "ledger.json"))
+
+
+def test_topics_skip_comments_blanks_and_duplicates():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        pool = _pool(tmp_dir, ["# header", "a", "", "  b  ", "a", "c"])
+        assert pool.topics() == ["a", "b", "c"]
+
+
+def test_no_topic_repeats_within_a_cycle():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        pool = _pool(tmp_dir, ["a", "b", "c", "d"])
+        for _ in range(5):
+            cycle = [pool.next_topic() for _ in range(4)]
+            assert sorted(topic for topic, _, _ in cycle) == ["a", "b", "c", "d"]
+            assert [left for _, left, _ in cycle] == [3, 2, 1, 0]
+            assert all(size == 4 for _, _, size in cycle)
+            # The next cycle never opens with the topic that closed this one.
+            assert pool.next_topic()[0] != cycle[-1][0]
+            for _ in range(3):
+                pool.next_topic()
+
+
+def test_ledger_is_shared_between_pools():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        first = _pool(tmp_dir, ["a", "b", "c"])
+        second = TopicPool(str(first.topics_file), str(first.ledger_file))
+        drawn = [first.next_topic()[0], second.next_topic()[0], first.next_topic()[0]]
+        assert sorted(drawn) == ["a", "b", "c"]
+
+
+def test_changed_file_keeps_the_used_topics_of_the_cycle():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        pool = _pool(tmp_dir, ["a", "b", "c", "d"])
+        used = {pool.next_topic()[0], pool.next_topic()[0]}
+
+        # Drop one unused topic and add two new ones.
+        unused = sorted({"a", "b", "c", "d"} - used)
+        lines = sorted(used) + unused[1:] + ["e", "f"]
+        pool.topics_file.write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+        rest = [pool.next_topic() for _ in range(4)]
+        assert not used & {topic for topic, _, _ in rest[:3]}
+        assert sorted(topic for topic, _, _ in rest[:3]) == sorted(
+            [unused[1], "e", "f"]
+        )
+        assert rest[2][1] == 0
+        # The fourth draw opens a new cycle over the edited file.
+        assert rest[3][2] == 5
+
+
+if __name__ == "__main__":
+    test_topics_skip_comments_blanks_and_duplicates()
+    test_no_topic_repeats_within_a_cycle()
+    test_ledger_is_shared_between_pools()
+    test_changed_file_keeps_the_used_topics_of_the_cycle()
+    print("All topic pool tests passed.")
@@ -0,0 +1,91 @@
+"""
+Test script for topic reservations shared by batch and single-topic runs.
+
+Reserves topics with a batch selection, then draws single topics through the
+unposted-topic index, the sheet scan and the sheets mirror, and checks that a
+reserved topic is never drawn by any of them.
+
+Usage:
+    pipenv run python test_topic_reservations.py
+    pipenv run pytest test_topic_reservations.py
+"""
+
+import random
+import tempfile
+import uuid
+from pathlib import Path
+
+import chains.select_topic as select_topic
+
+TOPICS = [
+    {"id_topic": str(i), "topic": f"topic {i}", "category": "c", "created": ""}
+    for i in range(1, 7)
+]
+
+
+class FakeTopicsClient:
+    """Serves the Topics sheet from memory through the reads of the client."""
+
+    def __init__(self, tmp_dir: str, mirror=None):
+        self.config = {
+            "spreadsheet_id": f"test-{uuid.uuid4().hex}",
+            "range_name": "Topics",
+            "reservations": {"path": str(Path(tmp_dir) / "reservations.json")},
+            "unposted_index": {"path": str(Path(tmp_dir) / "unposted_index.json")},
+        }
+        self.mirror = mirror
+
+    def read_sheet_iter(self, range_name, compact=False):
+        return (dict(row) for row in TOPICS)
+
+    def read_columns_iter(self, columns, range_name=None, compact=False):
+        for row_number, row in enumerate(TOPICS, start=2):
+            yield {**{c: row[c] for c in columns}, "_row": row_number}
+
+    def read_row(self, row_number, range_name=None):
+        return dict(TOPICS[row_number - 2])
+
+
+class FakeMirror:
+    """Mirror of the Topics sheet with the filtering of `SheetsMirror.select`."""
+
+    def count(self, sheet):
+        return len(TOPICS)
+
+    def select(self, sheet, empty=(), limit=None, random_order=False, **kwargs):
+        rows = [dict(row) for row in TOPICS if not any(row[c] for c in empty)]
+        if random_order:
+            random.shuffle(rows)
+        return rows[:limit] if limit else rows
+
+
+def _draws_after_a_batch(client) -> tuple[set, set]:
+    get_sheets_client = select_topic.get_sheets_client
+    select_topic.get_sheets_client = lambda: client
+    try:
+        batch = select_topic._select_topics_logic({"count": 5})
+        reserved = {topic["id_topic"] for topic in batch["topics"]}
+        drawn = {select_topic._select_topic_logic({})["id_topic"] for _ in range(20)}
+    finally:
+        select_topic.get_sheets_client = get_sheets_client
+    return reserved, drawn
+
+
+def test_single_selection_skips_batch_reservations():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        reserved, drawn = _draws_after_a_batch(FakeTopicsClient(tmp_dir))
+    assert len(reserved) == 5
+    assert drawn == {t["id_topic"] for t in TOPICS} - reserved
+
+
+def test_mirror_selection_skips_batch_reservations():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        client = FakeTopicsClient(tmp_dir, mirror=FakeMirror())
+        reserved, drawn = _draws_after_a_batch(client)
+    assert drawn == {t["id_topic"] for t in TOPICS} - reserved
+
+
+if __name__ == "__main__":
+    test_single_selection_skips_batch_reservations()
+    test_mirror_selection_skips_batch_reservations()
+    print("All topic reservation tests passed.")
@@ -0,0 +1,114 @@
+"""
+Test script for the unposted-topic index.
+
+Builds the index of an in-memory Topics sheet and checks sampling and removal,
+that the index is persisted and reused by later stores, that a discarded topic
+stays out of the persisted index, and that an index past its max age, or one
+built for another spreadsheet, is rebuilt from the sheet.
+
+Usage:
+    pipenv run python test_unposted_index.py
+    pipenv run pytest test_unposted_index.py
+"""
+
+import json
+import random
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+from services.unposted_index import UnpostedIndexStore, UnpostedRowIndex
+
+TOPICS = [
+    {"id_topic": "1", "created": ""},
+    {"id_topic": "2", "created": "2024-01-01"},
+    {"id_topic": "3", "created": ""},
+    {"id_topic": "", "created": ""},
+    {"id_topic": "5", "created": ""},
+]
+
+
+class FakeTopicsClient:
+    """Serves the key and status columns of the Topics sheet from memory."""
+
+    def __init__(self, tmp_dir: str, spreadsheet_id: str | None = None):
+        self.config = {
+            "spreadsheet_id": spreadsheet_id or f"test-{uuid.uuid4().hex}",
+            "unposted_index": {"path": str(Path(tmp_dir) / "unposted_index.json")},
+        }
+        self.scans = 0
+
+    def read_columns_iter(self, columns, range_name=None, compact=False):
+        self.scans += 1
+        for row_number, row in enumerate(TOPICS, start=2):
+            yield {**{c: row[c] for c in columns}, "_row": row_number}
+
+
+def test_sample_and_discard():
+    index = UnpostedRowIndex({"1": 2, "3": 4, "5": 6})
+    rng = random.Random(7)
+    drawn = {index.sample(rng) for _ in range(50)}
+    assert drawn == {("1", 2), ("3", 4), ("5", 6)}
+
+    assert index.discard("1")
+    assert not index.discard("1")
+    assert "1" not in index and len(index) == 2
+    assert {index.sample(rng) for _ in range(50)} == {("3", 4), ("5", 6)}
+
+    index.discard("3")
+    index.discard("5")
+    assert index.sample(rng) is None
+
+
+def test_index_round_trips_through_json():
+    index = UnpostedRowIndex({"1": 2, "3": 4}, built_at=123.0)
+    restored = UnpostedRowIndex.from_json(json.loads(json.dumps(index.to_json())))
+    assert restored.built_at == 123.0
+    assert restored.to_json()["rows"] == {"1": 2, "3": 4}
+
+
+def test_index_is_built_from_unposted_rows_and_persisted():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        client = FakeTopicsClient(tmp_dir)
+        store = UnpostedIndexStore(client, "Topics", "id_topic", "created")
+
+        index = store.get()
+        assert index.to_json()["rows"] == {"1": 2, "3": 4, "5": 6}
+        assert store.get() is index
+        assert store.path.name == "unposted_index.Topics.json"
+
+        store.discard("3")
+        # A later process loads the persisted index without scanning the sheet.
+        later = UnpostedIndexStore(client, "Topics", "id_topic", "created")
+        assert later.get().to_json()["rows"] == {"1": 2, "5": 6}
+        assert client.scans == 1
+
+
+def test_stale_or_foreign_index_is_rebuilt():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        client = FakeTopicsClient(tmp_dir)
+        store = UnpostedIndexStore(client, "Topics", "id_topic", "created")
+        store.get()
+        store.discard("1")
+
+        old = UnpostedIndexStore(client, "Topics", "id_topic", "created")
+        old.max_age = 60
+        payload = json.loads(old.path.read_text(encoding="utf-8"))
+        payload["built_at"] = time.time() - 61
+        old.path.write_text(json.dumps(payload), encoding="utf-8")
+        assert "1" in old.get()
+        assert client.scans == 2
+
+        other = FakeTopicsClient(tmp_dir)
+        foreign = UnpostedIndexStore(other, "Topics", "id_topic", "created")
+        foreign.get()
+        assert other.scans == 1
+
+
+if __name__ == "__main__":
+    test_sample_and_discard()
+    test_index_round_trips_through_json()
+    test_index_is_built_from_unposted_rows_and_persisted()
+    test_stale_or_foreign_index_is_rebuilt()
+    print("All unposted index tests passed.")
@@ -0,0 +1,175 @@
+"""
+Test script for token, image and cost accounting.
+
+Runs a fake chat model and reports image calls inside `track_usage`, with an
+in-memory usage store, and checks the tokens, estimated costs and steps of the
+recorded calls, the run totals saved to the store and the per-step summary.
+
+Usage:
+    pipenv run python test_usage_accounting.py
+    pipenv run pytest test_usage_accounting.py
+"""
+
+from typing import Any, List, Optional
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+from services import usage_accounting
+from services.usage_accounting import (
+    Pricing,
+    UsageStore,
+    record_image_usage,
+    track_usage,
+)
+
+PRICING = Pricing(
+    {
+        "chat_pricing": {
+            "gpt-4o": {"input": 2.50, "output": 10.00},
+            "gpt-4o-mini": {"input": 0.15, "output": 0.60},
+        },
+        "image_pricing": {"dall-e-3": {"standard": 0.04, "hd": 0.08, "default": 0.04}},
+    }
+)
+
+
+class FakeChatModel(BaseChatModel):
+    """Answers every call with the same text and, optionally, its usage."""
+
+    model_name: str = "gpt-4o-mini"
+    usage: Optional[dict] = None
+    fail: bool = False
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    def _generate(
+        self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs: Any
+    ) -> ChatResult:
+        if self.fail:
+            raise RuntimeError("provider down")
+        message = AIMessage(content="A short answer.", usage_metadata=self.usage)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+
+def _usage(input_tokens: int, output_tokens: int) -> dict:
+    return {
+        "input_tokens": input_tokens,
+        "output_tokens": output_tokens,
+        "total_tokens": input_tokens + output_tokens,
+    }
+
+
+class InMemoryUsage:
+    """Saves the runs of `track_usage` to an in-memory store."""
+
+    def __enter__(self):
+        self.saved = usage_accounting._store
+        usage_accounting._store = UsageStore(":memory:")
+        return usage_accounting._store
+
+    def __exit__(self, *exc_info):
+        usage_accounting._store = self.saved
+
+
+def test_pricing_uses_the_longest_matching_prefix():
+    assert PRICING.chat_cost("gpt-4o-mini-2024-07-18", 1_000_000, 0) == 0.15
+    assert PRICING.chat_cost("gpt-4o-2024-08-06", 0, 1_000_000) == 10.0
+    assert PRICING.chat_cost("unknown-model", 1000, 1000) == 0.0
+    assert PRICING.image_cost("dall-e-3", "hd", 2) == 0.16
+    assert PRICING.image_cost("dall-e-3", None, 1) == 0.04
+
+
+def test_chat_and_image_calls_are_recorded_per_step():
+    model = FakeChatModel(usage=_usage(1000, 200))
+    with InMemoryUsage() as store:
+        with track_usage("test_pipeline") as run:
+            run.pricing = PRICING
+            model.with_config(metadata={"usage_step": "generate_post.reel"}).invoke(
+                "Write a reel."
+            )
+            model.with_config(metadata={"usage_step": "generate_post.post"}).invoke(
+                "Write a post."
+            )
+            record_image_usage("generate_image", "dall-e-3", 4.0, quality="hd")
+            record_image_usage("generate_image", "dall-e-3", 1.0, error="rejected")
+
+        chat = [record for record in run.records if record.kind == "chat"]
+        assert sorted(record.step for record in chat) == [
+            "generate_post.post",
+            "generate_post.reel",
+        ]
+        for record in chat:
+            assert record.model == "gpt-4o-mini"
+            assert (record.prompt_tokens, record.completion_tokens) == (1000, 200)
+            assert abs(record.cost_usd - (1000 * 0.15 + 200 * 0.60) / 1e6) < 1e-12
+            assert not record.estimated
+
+        failed_image = run.records[-1]
+        assert failed_image.images == 0 and failed_image.cost_usd == 0
+        assert run.status == "success"
+        assert run.totals() == {
+            "calls": 4,
+            "prompt_tokens": 2000,
+            "completion_tokens": 400,
+            "images": 1,
+            "cost_usd": round(2 * 0.00027 + 0.08, 6),
+        }
+
+        summary = {row["step"]: row for row in store.step_summary()}
+        assert summary["generate_image"]["cost_usd"] == 0.08
+        assert summary["generate_image"]["calls"] == 2
+        assert summary["generate_post.reel"]["prompt_tokens"] == 1000
+        # The most expensive step comes first.
+        assert store.step_summary()[0]["step"] == "generate_image"
+
+
+def test_missing_usage_is_estimated():
+    with InMemoryUsage():
+        with track_usage("test_pipeline") as run:
+            run.pricing = PRICING
+            FakeChatModel().invoke("Write a carousel.")
+
+    (record,) = run.records
+    assert record.estimated
+    assert record.prompt_tokens > 0 and record.completion_tokens > 0
+    assert record.cost_usd > 0
+
+
+def test_failed_calls_and_runs_are_recorded():
+    with InMemoryUsage() as store:
+        try:
+            with track_usage("test_pipeline") as run:
+                FakeChatModel(fail=True).invoke("Write a reel.")
+        except RuntimeError:
+            pass
+        else:
+            raise AssertionError("The failing call did not raise.")
+
+        (record,) = run.records
+        assert record.error == "provider down"
+        assert record.cost_usd == 0
+        assert run.status == "error"
+        status = store._conn.execute(
+            "SELECT status FROM usage_runs WHERE run_id = ?", (run.run_id,)
+        ).fetchone()
+        assert status == ("error",)
+
+
+def test_calls_outside_a_run_are_not_recorded():
+    with InMemoryUsage() as store:
+        FakeChatModel(usage=_usage(10, 10)).invoke("Write a reel.")
+        record_image_usage("generate_image", "dall-e-3", 1.0)
+        assert store.step_summary() == []
+
+
+if __name__ == "__main__":
+    test_pricing_uses_the_longest_matching_prefix()
+    test_chat_and_image_calls_are_recorded_per_step()
+    test_missing_usage_is_estimated()
+    test_failed_calls_and_runs_are_recorded()
+    test_calls_outside_a_run_are_not_recorded()
+    print("All usage accounting tests passed.")
@@ -3,13 +3,15 @@ Google Sheets Tool
 - Allows saving post and image data to a Google Sheet.
 """
 
+import asyncio
 import csv
 from datetime import datetime
 from io import StringIO
 
 from langchain_core.runnables import RunnableLambda
 
-from services.sheets_client import GoogleSheetsClient
+from services.async_sheets_client import get_async_sheets_client
+from services.sheets_client import get_sheets_client
 from utils.logger import setup_logger
 
 logger = setup_logger(__name__)
@@ -52,15 +54,34 @@ def _save_to_sheet_logic(data: dict) -> dict:
 
 def _read_from_sheet_logic(data: dict) -> dict:
     """
-    Reads all rows from a Google Sheet.
+    Reads all rows from a Google Sheet. With 'compact' set in data the rows are
+    `SheetRow` mappings instead of dicts.
     """
     logger.info("--- 📥 Reading from Google Sheets ---")
 
     # In a real implementation, you would connect to the Google Sheets API here.
     # For this simulation, we'll read from a local CSV file.
-    client = GoogleSheetsClient()
-    sheet_data = client.read_sheet(range_name=data.get("range_name"))
+    client = get_sheets_client()
+    sheet_data = client.read_sheet(
+        range_name=data.get("range_name"), compact=data.get("compact", False)
+    )
+    return _read_result(sheet_data)
+
+
+async def _aread_from_sheet_logic(data: dict) -> dict:
+    """
+    Async version of `_read_from_sheet_logic`, used by `ainvoke`.
+    """
+    logger.info("--- 📥 Reading from Google Sheets ---")
 
+    client = get_async_sheets_client()
+    sheet_data = await client.read_sheet(
+        range_name=data.get("range_name"), compact=data.get("compact", False)
+    )
+    return _read_result(sheet_data)
+
+
+def _read_result(sheet_data) -> dict:
     if sheet_data is not None:
         logger.info(f"Read {len(sheet_data)} rows from the sheet.")
         return {"sheet_data": sheet_data, "read_status": "success"}
@@ -73,33 +94,21 @@ def _read_from_sheet_logic(data: dict) -> dict:
         }
 
 
-def _upsert_sheet_logic(data: dict) -> dict:
-    """
-    Receives filter criteria and data to upsert into a Google Sheet.
-    Expected keys in data: 'filter_key', 'filter_value', 'row_data'.
-    An optional 'range_name' can be provided.
-    """
-    logger.info("--- ✍️ Upserting to Google Sheets ---")
-
+def _upsert_args(data: dict) -> tuple:
     filter_key = data.get("filter_key")
     filter_value = data.get("filter_value")
     row_data = data.get("row_data")
-    range_name = data.get("range_name")
 
     if not all([filter_key, filter_value, row_data]):
         raise ValueError(
             "Missing 'filter_key', 'filter_value', or 'row_data' in input."
         )
+    return filter_key, str(filter_value), row_data
 
-    # Assert to help the linter understand the types are now guaranteed
-    assert filter_key is not None
-    assert row_data is not None
-
-    client = GoogleSheetsClient()
-    result = client.upsert_row(
-        filter_key, str(filter_value), row_data, range_name=range_name
-    )
 
+def _upsert_result(data: dict, result) -> dict:
+    filter_key = data.get("filter_key")
+    filter_value = data.get("filter_value")
     if result:
         logger.info(
             f"   ✅ Successfully upserted row for '{filter_key}={filter_value}'."
@@ -117,8 +126,134 @@ def _upsert_sheet_logic(data: dict) -> dict:
     return data
 
 
+def _upsert_sheet_logic(data: dict) -> dict:
+    """
+    Receives filter criteria and data to upsert into a Google Sheet.
+    Expected keys in data: 'filter_key', 'filter_value', 'row_data'.
+    An optional 'range_name' can be provided.
+    """
+    logger.info("--- ✍️ Upserting to Google Sheets ---")
+
+    filter_key, filter_value, row_data = _upsert_args(data)
+    client = get_sheets_client()
+    result = client.upsert_row(
+        filter_key, filter_value, row_data, range_name=data.get("range_name")
+    )
+    return _upsert_result(data, result)
+
+
+async def _aupsert_sheet_logic(data: dict) -> dict:
+    """
+    Async version of `_upsert_sheet_logic`, used by `ainvoke`.
+    """
+    logger.info("--- ✍️ Upserting to Google Sheets ---")
+
+    filter_key, filter_value, row_data = _upsert_args(data)
+    client = get_async_sheets_client()
+    result = await client.upsert_row(
+        filter_key, filter_value, row_data, range_name=data.get("range_name")
+    )
+    return _upsert_result(data, result)
+
+
+def _upsert_rows_args(data: dict) -> tuple:
+    filter_key = data.get("filter_key")
+    rows = data.get("rows")
+
+    if not filter_key or not rows:
+        raise ValueError("Missing 'filter_key' or 'rows' in input.")
+    return filter_key, rows
+
+
+def _upsert_rows_result(data: dict, result) -> dict:
+    filter_key, rows = data["filter_key"], data["rows"]
+    if result:
+        logger.info(f"   ✅ Successfully upserted {len(rows)} rows by '{filter_key}'.")
+        data["upsert_status"] = "success"
+    else:
+        logger.error(f"   ❌ Failed to upsert {len(rows)} rows by '{filter_key}'.")
+        data["upsert_status"] = "failed"
+
+    logger.info("--- Batch upserting to Google Sheets Finished ---")
+
+    return data
+
+
+def _upsert_rows_sheet_logic(data: dict) -> dict:
+    """
+    Upserts several rows into a Google Sheet with a single read.
+    Expected keys in data: 'filter_key' and 'rows', a list of row dicts that
+    each contain the filter key. An optional 'range_name' can be provided.
+    """
+    logger.info("--- ✍️ Batch upserting to Google Sheets ---")
+
+    filter_key, rows = _upsert_rows_args(data)
+    client = get_sheets_client()
+    result = client.upsert_rows(filter_key, rows, range_name=data.get("range_name"))
+    return _upsert_rows_result(data, result)
+
+
+async def _aupsert_rows_sheet_logic(data: dict) -> dict:
+    """
+    Async version of `_upsert_rows_sheet_logic`, used by `ainvoke`.
+    """
+    logger.info("--- ✍️ Batch upserting to Google Sheets ---")
+
+    filter_key, rows = _upsert_rows_args(data)
+    client = get_async_sheets_client()
+    result = await client.upsert_rows(
+        filter_key, rows, range_name=data.get("range_name")
+    )
+    return _upsert_rows_result(data, result)
+
+
+def _allocate_ids_logic(data: dict) -> dict:
+    """
+    Reserves consecutive ids for new rows of a Google Sheet.
+    Expected keys in data: 'range_name' and 'count'. An optional 'id_key'
+    names the id column (defaults to 'id').
+    """
+    range_name = data.get("range_name")
+    count = data.get("count")
+
+    if not range_name or not count:
+        raise ValueError("Missing 'range_name' or 'count' in input.")
+
+    client = get_sheets_client()
+    ids = client.allocate_ids(range_name, count, id_key=data.get("id_key", "id"))
+
+    if ids:
+        logger.info(f"Allocated ids {ids[0]}-{ids[-1]} for '{range_name}'.")
+        return {"ids": ids, "allocate_status": "success"}
+    else:
+        logger.error(f"Failed to allocate ids for '{range_name}'.")
+        return {
+            "ids": [],
+            "allocate_status": "error",
+            "error_message": "Failed to allocate ids from Google Sheets.",
+        }
+
+
+async def _aallocate_ids_logic(data: dict) -> dict:
+    """
+    Async version of `_allocate_ids_logic`, used by `ainvoke`. Ids come from
+    the process-wide allocator of the blocking client, so sync and async
+    saves never hand out the same ids; its small requests run in a thread.
+    """
+    return await asyncio.to_thread(_allocate_ids_logic, data)
+
+
 save_to_sheet_chain = RunnableLambda(_save_to_sheet_logic)
 
-read_from_sheet_chain = RunnableLambda(_read_from_sheet_logic)
+# The async variants serve `ainvoke`/`abatch` without blocking the event loop.
+read_from_sheet_chain = RunnableLambda(
+    _read_from_sheet_logic, afunc=_aread_from_sheet_logic
+)
+
+upsert_sheet_chain = RunnableLambda(_upsert_sheet_logic, afunc=_aupsert_sheet_logic)
+
+upsert_rows_sheet_chain = RunnableLambda(
+    _upsert_rows_sheet_logic, afunc=_aupsert_rows_sheet_logic
+)
 
-upsert_sheet_chain = RunnableLambda(_upsert_sheet_logic)
+allocate_ids_chain = RunnableLambda(_allocate_ids_logic, afunc=_aallocate_ids_logic)
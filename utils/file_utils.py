@@ -2,8 +2,55 @@
 File utility functions.
 """
 
+import fcntl
+import json
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator
+
 
 def load_prompt_template(file_path: str) -> str:
     """Loads a prompt template or any text file."""
     with open(file_path, "r", encoding="utf-8") as f:
         return f.read()
+
+
+@contextmanager
+def exclusive_lock(lock_path: Path, thread_lock: threading.Lock) -> Iterator[None]:
+    """
+    Holds `thread_lock` and an exclusive `flock` on `lock_path`, serialising
+    the threads of this process and every other process using the same file.
+    """
+    lock_path.parent.mkdir(parents=True, exist_ok=True)
+    with thread_lock, open(lock_path, "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+@contextmanager
+def locked_json_store(
+    path: Path, thread_lock: threading.Lock
+) -> Iterator[Dict[str, Any]]:
+    """
+    Yields the JSON object stored at `path` under an `exclusive_lock` on its
+    '.lock' file, or an empty dict if it is missing or unreadable. Changes
+    made to the dict are written back atomically when the block exits without
+    an exception.
+    """
+    with exclusive_lock(path.with_suffix(".lock"), thread_lock):
+        try:
+            with path.open(encoding="utf-8") as store_file:
+                stored = json.load(store_file)
+        except (OSError, ValueError):
+            stored = {}
+        yield stored
+
+        tmp_path = path.with_suffix(".tmp")
+        with tmp_path.open("w", encoding="utf-8") as store_file:
+            json.dump(stored, store_file, ensure_ascii=False)
+        os.replace(tmp_path, path)
@@ -0,0 +1,115 @@
+"""
+Incremental JSON parsing for streamed LLM output.
+"""
+
+import json
+from typing import Any, List, Optional, Tuple
+
+Path = Tuple[Any, ...]
+
+
+class _Frame:
+    """An open object or array, with the member currently being read."""
+
+    __slots__ = ("is_object", "state", "key", "start")
+
+    def __init__(self, is_object: bool):
+        self.is_object = is_object
+        # 'key' -> 'colon' -> 'value' -> 'string'/'primitive'/'nested' -> 'comma'
+        self.state = "key" if is_object else "value"
+        self.key: Any = None if is_object else 0
+        self.start = 0
+
+
+class JsonFieldStream:
+    """
+    Parses a JSON document fed in chunks and emits every member of an object
+    (and item of an array) as soon as its value is complete, with its path
+    from the root, e.g. (('title',), 'Hola') or (('post', 'content'), '...').
+
+    Text before the root value, such as a ```json fence, is skipped, as is
+    anything after it. Members are emitted exactly once, in document order.
+    """
+
+    def __init__(self):
+        self._text = ""
+        self._pos = 0
+        self._stack: List[_Frame] = []
+        self._root_start = 0
+        self._in_string = False
+        self._escape = False
+        self.done = False
+        self.value: Optional[Any] = None
+
+    def feed(self, chunk: str) -> List[Tuple[Path, Any]]:
+        """Adds a chunk of text and returns the members it completed."""
+        self._text += chunk
+        emitted: List[Tuple[Path, Any]] = []
+        text = self._text
+        for i in range(self._pos, len(text)):
+            if self.done:
+                break
+            c = text[i]
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    frame = self._stack[-1]
+                    if frame.state == "key":
+                        frame.key = json.loads(text[frame.start : i + 1])
+                        frame.state = "colon"
+                    else:
+                        emitted.append(self._close_member(i + 1))
+                continue
+
+            if not self._stack:
+                if c in "{[":
+                    self._root_start = i
+                    self._stack.append(_Frame(c == "{"))
+                continue
+
+            frame = self._stack[-1]
+            if frame.state == "primitive" and (c.isspace() or c in ",}]"):
+                emitted.append(self._close_member(i))
+            if c.isspace():
+                continue
+
+            if c == '"':
+                if frame.state == "value":
+                    frame.state = "string"
+                frame.start = i
+                self._in_string = True
+            elif c in "{[":
+                frame.start = i
+                frame.state = "nested"
+                self._stack.append(_Frame(c == "{"))
+            elif c in "}]":
+                self._stack.pop()
+                if self._stack:
+                    emitted.append(self._close_member(i + 1))
+                else:
+                    self.value = json.loads(text[self._root_start : i + 1])
+                    self.done = True
+            elif c == ":":
+                frame.state = "value"
+            elif c == ",":
+                if frame.is_object:
+                    frame.state = "key"
+                else:
+                    frame.state = "value"
+                    frame.key += 1
+            elif frame.state == "value":
+                frame.start = i
+                frame.state = "primitive"
+        self._pos = len(text)
+        return emitted
+
+    def _close_member(self, end: int) -> Tuple[Path, Any]:
+        frame = self._stack[-1]
+        value = json.loads(self._text[frame.start : end])
+        frame.state = "comma"
+        return tuple(f.key for f in self._stack), value
@@ -0,0 +1,89 @@
+"""
+Sampling utility functions.
+"""
+
+import random
+from typing import AsyncIterable, Dict, Iterable, List, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+def reservoir_sample(
+    items: Iterable[T], k: int = 1, rng: random.Random | None = None
+) -> Tuple[List[T], int]:
+    """
+    Draws up to `k` items uniformly at random from an iterable in one pass,
+    keeping only the sample in memory.
+
+    Returns:
+        The sampled items and the total number of items seen.
+    """
+    randrange = rng.randrange if rng else random.randrange
+    sample: List[T] = []
+    seen = 0
+    for item in items:
+        seen += 1
+        if len(sample) < k:
+            sample.append(item)
+        else:
+            j = randrange(seen)
+            if j < k:
+                sample[j] = item
+    return sample, seen
+
+
+async def areservoir_sample(
+    items: AsyncIterable[T], k: int = 1, rng: random.Random | None = None
+) -> Tuple[List[T], int]:
+    """Async version of `reservoir_sample` for async iterables."""
+    randrange = rng.randrange if rng else random.randrange
+    sample: List[T] = []
+    seen = 0
+    async for item in items:
+        seen += 1
+        if len(sample) < k:
+            sample.append(item)
+        else:
+            j = randrange(seen)
+            if j < k:
+                sample[j] = item
+    return sample, seen
+
+
+def weighted_group_sample(
+    groups: Dict[str, List[T]],
+    k: int,
+    weights: Dict[str, float] | None = None,
+    rng: random.Random | None = None,
+) -> List[T]:
+    """
+    Draws up to `k` distinct items across groups, in proportion to the group
+    weights (1.0 when not given). Each draw goes to the group furthest below
+    its weighted share of the sample so far, ties broken at random, and takes
+    a uniformly random item of that group. Groups that run out drop out and
+    their share goes to the others.
+    """
+    rng = rng or random.Random()
+    pools = {name: list(items) for name, items in groups.items() if items}
+    weights = weights or {}
+    picked = {name: 0 for name in pools}
+    sample: List[T] = []
+    while len(sample) < k and pools:
+        names = list(pools)
+        rng.shuffle(names)
+        group_weights = {n: max(0.0, float(weights.get(n, 1.0))) for n in names}
+        total = sum(group_weights.values())
+        if not total:
+            break
+        name = max(
+            names,
+            key=lambda n: group_weights[n] / total * (len(sample) + 1) - picked[n],
+        )
+        pool = pools[name]
+        i = rng.randrange(len(pool))
+        pool[i], pool[-1] = pool[-1], pool[i]
+        sample.append(pool.pop())
+        picked[name] += 1
+        if not pool:
+            del pools[name]
+    return sample
@@ -0,0 +1,42 @@
+"""
+Token counting utility functions.
+"""
+
+from functools import lru_cache
+from typing import Iterable
+
+import tiktoken
+from langchain_core.messages import BaseMessage
+
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+@lru_cache(maxsize=None)
+def _encoding(model: str):
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("o200k_base")
+    except Exception as err:
+        # The encodings are downloaded on first use and may be unreachable.
+        logger.warning(f"Could not load a tiktoken encoding for {model}: {err}")
+        return None
+
+
+def count_tokens(model: str, text: str) -> int:
+    """Counts the tokens of `text` for `model`, or estimates them offline."""
+    encoding = _encoding(model)
+    if encoding is None:
+        return len(text) // 4  # About four characters per token
+    return len(encoding.encode(text))
+
+
+def count_message_tokens(model: str, messages: Iterable[BaseMessage]) -> int:
+    """Counts prompt tokens the way OpenAI bills chat messages."""
+    tokens = 3  # Every reply is primed with the assistant role
+    for message in messages:
+        tokens += 4 + count_tokens(model, str(message.content))
+    return tokens